@@ -0,0 +1,74 @@
+"""
+In-memory VCS and LLM backends with configurable latency.
+"""
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from branchwise.integrations.base import PullRequestDetails, VCSClient
+from branchwise.llm.client import LLMClient, ReviewComment
+
+_NUMBERED_LINE_RE = re.compile(r"^(\d+): [+ ]", re.MULTILINE)
+
+
+class FakeVCSClient(VCSClient):
+    """Serves pull requests from memory and records what would be posted."""
+
+    def __init__(self, pull_requests: Dict[Tuple[str, int], PullRequestDetails], latency: float = 0.0):
+        self.pull_requests = pull_requests
+        self.latency = latency
+        self.posted: List[Tuple[str, int, str]] = []
+        self._lock = threading.Lock()
+
+    def get_pr_details(self, repo_name: str, pr_number: int) -> PullRequestDetails:
+        time.sleep(self.latency)
+        return self.pull_requests[(repo_name, pr_number)]
+
+    def post_comment(self, repo_name: str, pr_number: int, body: str):
+        time.sleep(self.latency)
+        with self._lock:
+            self.posted.append((repo_name, pr_number, body))
+
+    def post_review_comment(self, repo_name: str, pr_number: int, body: str, commit_id: str, path: str, line: int):
+        self.post_comment(repo_name, pr_number, body)
+
+
+class FakeLLMClient(LLMClient):
+    """
+    Sleeps for `latency` seconds per request, then reports up to
+    `comments_per_file` issues on the annotated lines of each diff.
+    """
+
+    def __init__(self, latency: float = 0.0, comments_per_file: int = 1):
+        self.latency = latency
+        self.comments_per_file = comments_per_file
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def analyze_diff(self, file_name: str, diff_content: str, context: Optional[str] = None) -> List[ReviewComment]:
+        self._request()
+        return self._comments(file_name, diff_content)
+
+    def analyze_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> List[ReviewComment]:
+        self._request()
+        comments = []
+        for file_name, diff_content in diffs:
+            comments.extend(self._comments(file_name, diff_content))
+        return comments
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+
+    def _comments(self, file_name: str, diff_content: str) -> List[ReviewComment]:
+        lines = _NUMBERED_LINE_RE.findall(diff_content)[:self.comments_per_file]
+        return [
+            ReviewComment(file_path=file_name, line_number=int(line), content="Synthetic issue", type="bug", severity="minor")
+            for line in lines
+        ]
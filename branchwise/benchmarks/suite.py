@@ -0,0 +1,224 @@
+"""
+Offline benchmark suite.
+
+Runs the hot paths of a review against synthetic pull requests and
+in-memory backends, and returns machine-readable results so that runs can
+be compared across commits:
+
+    branchwise benchmark --output bench.json
+"""
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Callable, List, Optional
+
+from pydantic import BaseModel
+
+from branchwise.benchmarks.fakes import FakeLLMClient, FakeVCSClient
+from branchwise.benchmarks.synthetic import make_llm_response, make_patch, make_pr
+from branchwise.config import Settings
+from branchwise.core.analyzer import Analyzer
+from branchwise.llm.client import _OpenAIReviewer
+from branchwise.utils.diff_parser import DiffParser
+
+SCHEMA_VERSION = 1
+
+
+class BenchmarkConfig(BaseModel):
+    """Shape of the synthetic workload."""
+    files: int = 50
+    hunks_per_file: int = 5
+    lines_per_hunk: int = 20
+    parse_hunks: int = 500  # Hunks in the single large patch given to the parser
+    response_comments: int = 50  # Comments in the LLM response given to the parser
+    comments_per_file: int = 2
+    llm_latency: float = 0.0  # Seconds per fake LLM request
+    vcs_latency: float = 0.0  # Seconds per fake VCS call
+    max_workers: int = 4
+    repeat: int = 5
+    seed: int = 0
+
+
+class BenchmarkResult(BaseModel):
+    name: str
+    params: dict
+    repeat: int
+    min_s: float
+    median_s: float
+    mean_s: float
+    peak_memory_kb: Optional[float] = None
+    throughput: dict = {}
+
+
+def _timings(fn: Callable[[], object], repeat: int) -> dict:
+    fn()  # Warm up caches and lazy imports outside the measurement
+    samples = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "repeat": len(samples),
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+    }
+
+
+def _peak_memory_kb(fn: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def _settings(config: BenchmarkConfig) -> Settings:
+    settings = Settings(_env_file=None)
+    settings.cache.enabled = False
+    settings.rules.incremental = False
+    settings.rules.max_workers = config.max_workers
+    settings.rules.ignore_files = []
+    settings.rules.max_comments = 0  # Every file is reviewed, so runs do the same work
+    return settings
+
+
+def bench_diff_parse(config: BenchmarkConfig) -> BenchmarkResult:
+    patch = make_patch(config.parse_hunks, config.lines_per_hunk, seed=config.seed)
+    lines = patch.count("\n") + 1
+    timings = _timings(lambda: DiffParser.parse(patch), config.repeat)
+    return BenchmarkResult(
+        name="diff_parser.parse",
+        params={"hunks": config.parse_hunks, "lines_per_hunk": config.lines_per_hunk, "bytes": len(patch)},
+        peak_memory_kb=_peak_memory_kb(lambda: DiffParser.parse(patch)),
+        throughput={"lines_per_s": lines / timings["median_s"]},
+        **timings,
+    )
+
+
+def bench_prompt_building(config: BenchmarkConfig) -> BenchmarkResult:
+    settings = _settings(config)
+    pr = make_pr(config.files, config.hunks_per_file, config.lines_per_hunk, seed=config.seed)
+    analyzer = Analyzer(settings, FakeLLMClient(comments_per_file=0))
+    reviewer = _OpenAIReviewer(settings)
+    rules = analyzer.path_rules
+
+    def build():
+        prepared = [item for item in (analyzer._prepare_file(file, None, rules) for file in pr.files) if item]
+        prompts = []
+        for request in analyzer.planner.plan(analyzer._review_order(prepared, rules)):
+            if len(request.segments) == 1:
+                segment = request.segments[0]
+                prompts.append(reviewer._construct_prompt(segment.filename, segment.diff, None))
+            else:
+                prompts.append(reviewer._construct_batch_prompt([(s.filename, s.diff) for s in request.segments]))
+        return prompts
+
+    requests = len(build())
+    timings = _timings(build, config.repeat)
+    return BenchmarkResult(
+        name="analyzer.build_prompts",
+        params={
+            "files": config.files,
+            "hunks_per_file": config.hunks_per_file,
+            "lines_per_hunk": config.lines_per_hunk,
+            "llm_requests": requests,
+        },
+        peak_memory_kb=_peak_memory_kb(build),
+        throughput={"files_per_s": config.files / timings["median_s"]},
+        **timings,
+    )
+
+
+def bench_response_parse(config: BenchmarkConfig) -> BenchmarkResult:
+    reviewer = _OpenAIReviewer(_settings(config))
+    file_paths = [f"src/module_{index:04d}.py" for index in range(8)]
+    response = make_llm_response(config.response_comments, file_paths, reviewer.settings.llm.output_format)
+    timings = _timings(lambda: reviewer._parse_response(response, file_paths[0], file_paths), config.repeat)
+    return BenchmarkResult(
+        name="openai_client.parse_response",
+        params={
+            "comments": config.response_comments,
+            "bytes": len(response),
+            "format": reviewer.settings.llm.output_format,
+        },
+        throughput={"comments_per_s": config.response_comments / timings["median_s"]},
+        **timings,
+    )
+
+
+def bench_analyze_pr(config: BenchmarkConfig) -> BenchmarkResult:
+    pr = make_pr(config.files, config.hunks_per_file, config.lines_per_hunk, seed=config.seed)
+    vcs = FakeVCSClient({("bench/repo", pr.number): pr}, latency=config.vcs_latency)
+    llm = FakeLLMClient(latency=config.llm_latency, comments_per_file=config.comments_per_file)
+    analyzer = Analyzer(_settings(config), llm)
+
+    def review():
+        return analyzer.analyze_pr(vcs.get_pr_details("bench/repo", pr.number))
+
+    timings = _timings(review, config.repeat)
+    requests_per_run = llm.requests // (timings["repeat"] + 1)
+    return BenchmarkResult(
+        name="analyzer.analyze_pr",
+        params={
+            "files": config.files,
+            "hunks_per_file": config.hunks_per_file,
+            "lines_per_hunk": config.lines_per_hunk,
+            "llm_latency": config.llm_latency,
+            "vcs_latency": config.vcs_latency,
+            "max_workers": config.max_workers,
+            "llm_requests": requests_per_run,
+        },
+        peak_memory_kb=_peak_memory_kb(review),
+        throughput={"files_per_s": config.files / timings["median_s"]},
+        **timings,
+    )
+
+
+BENCHMARKS = {
+    "diff_parser.parse": bench_diff_parse,
+    "analyzer.build_prompts": bench_prompt_building,
+    "openai_client.parse_response": bench_response_parse,
+    "analyzer.analyze_pr": bench_analyze_pr,
+}
+
+
+def _version() -> str:
+    try:
+        return metadata.version("branchwise")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def run_suite(config: BenchmarkConfig, only: Optional[List[str]] = None) -> dict:
+    """Run the benchmarks (optionally those whose name contains one of `only`)."""
+    # Per-request progress logging would dominate the timings
+    logger = logging.getLogger("branchwise")
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        results = [
+            bench(config).model_dump()
+            for name, bench in BENCHMARKS.items()
+            if not only or any(pattern in name for pattern in only)
+        ]
+    finally:
+        logger.setLevel(level)
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "branchwise": _version(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "config": config.model_dump(),
+        "results": results,
+    }
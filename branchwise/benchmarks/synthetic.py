@@ -0,0 +1,95 @@
+"""
+Deterministic synthetic pull requests for benchmarks.
+"""
+import json
+import random
+from typing import List, Optional
+
+from branchwise.integrations.base import PullRequestDetails, PullRequestFile
+
+_WORDS = ["value", "result", "items", "config", "count", "buffer", "request", "user", "index", "cache"]
+
+
+def _code_line(rng: random.Random) -> str:
+    left, right = rng.sample(_WORDS, 2)
+    return f"    {left} = process({right}, {rng.randint(0, 999)})"
+
+
+def make_patch(hunks: int, lines_per_hunk: int, seed: int = 0) -> str:
+    """
+    A unified-diff patch (hunk headers onward, as the APIs return per file).
+    Each hunk has `lines_per_hunk` lines: about half context, a quarter
+    removed and a quarter added.
+    """
+    rng = random.Random(seed)
+    out: List[str] = []
+    old_line = new_line = 1
+    for _ in range(hunks):
+        gap = rng.randint(5, 40)  # Unchanged lines between hunks
+        old_line += gap
+        new_line += gap
+        body = []
+        old_count = new_count = 0
+        for i in range(lines_per_hunk):
+            kind = i % 4
+            if kind == 1:
+                body.append("-" + _code_line(rng))
+                old_count += 1
+            elif kind == 3:
+                body.append("+" + _code_line(rng))
+                new_count += 1
+            else:
+                body.append(" " + _code_line(rng))
+                old_count += 1
+                new_count += 1
+        out.append(f"@@ -{old_line},{old_count} +{new_line},{new_count} @@ def function_{old_line}():")
+        out.extend(body)
+        old_line += old_count
+        new_line += new_count
+    return "\n".join(out)
+
+
+def make_pr(files: int, hunks_per_file: int, lines_per_hunk: int, seed: int = 0, number: int = 1) -> PullRequestDetails:
+    """A pull request of `files` modified Python files with identical shape."""
+    pr_files = [
+        PullRequestFile(
+            filename=f"src/module_{index:04d}.py",
+            status="modified",
+            patch=make_patch(hunks_per_file, lines_per_hunk, seed=seed * 100003 + index),
+            blob_url=f"https://example.com/blob/src/module_{index:04d}.py",
+        )
+        for index in range(files)
+    ]
+    return PullRequestDetails(
+        number=number,
+        title=f"Synthetic PR #{number}",
+        description="Generated for benchmarking.",
+        author="bench",
+        head_sha=f"{seed:040x}",
+        files=pr_files,
+    )
+
+
+def make_llm_response(comments: int, file_paths: Optional[List[str]] = None, output_format: str = "json") -> str:
+    """A response in the JSON or text format requested by the OpenAI clients."""
+    findings = [
+        {
+            "file": file_paths[index % len(file_paths)] if file_paths else "",
+            "line": index + 1,
+            "type": "bug",
+            "severity": "minor",
+            "content": f"Synthetic finding number {index} describing a possible issue.",
+        }
+        for index in range(comments)
+    ]
+    if output_format == "json":
+        return json.dumps({"findings": findings})
+
+    blocks = []
+    for finding in findings:
+        file_line = f"File: {finding['file']}\n" if file_paths else ""
+        blocks.append(
+            f"---\n{file_line}Line: {finding['line']}\nType: bug\nSeverity: minor\n"
+            f"Content: {finding['content']}\n---"
+        )
+    return "\n".join(blocks) if blocks else "No issues found."
@@ -16,11 +16,24 @@ class LLMSettings(BaseModel):
     provider: str = "openai"
     base_url: Optional[str] = None
     max_tokens: int = 4096
+    context_window: int = 128000
+    request_token_budget: int = 12000  # Diff tokens per request; small files are batched up to this
+    max_files_per_request: int = 8
+    max_retries: int = 4  # Retries of throttled, timed out or 5xx requests
+    backoff_base: float = 1.0  # Seconds; doubled on each retry unless Retry-After says otherwise
+    backoff_max: float = 30.0
+    output_format: str = "json"  # "json" or "text" (the legacy `---`/`Key: value` format)
+    context_lines: int = 20  # Lines of the new file shown around each hunk; 0 disables fetching context
+    context_token_budget: int = 2000  # Per file and request
+    # "json_schema", "json_object" or "none" for servers without structured output. Unset means
+    # "json_schema", or "none" with a custom `base_url`, since local servers often reject schemas.
+    response_format: Optional[str] = None
 
 
 class GitHubSettings(BaseModel):
     """Configuration for GitHub integration."""
     token: Optional[SecretStr] = None
+    graphql: bool = True  # Fetch PR metadata over GraphQL and file pages in parallel (needs a token)
 
 
 class GitLabSettings(BaseModel):
@@ -38,8 +51,41 @@ class BitbucketSettings(BaseModel):
 class RuleSettings(BaseModel):
     """Configuration for review rules."""
     max_comments: int = 10
-    ignore_files: list[str] = [".lock", ".png", ".jpg", ".md"]
-    focus_files: list[str] = [".py", ".js", ".ts", ".go", ".java"]
+    ignore_files: list[str] = [".lock", ".png", ".jpg", ".md"]  # gitignore-style patterns; ".ext" means "*.ext"
+    focus_files: list[str] = [".py", ".js", ".ts", ".go", ".java"]  # Matching files are reviewed first, in this order
+    ignore_file: bool = True  # Also read ignore patterns from .branchwiseignore at the repository root
+    max_workers: int = 4  # Files analyzed concurrently; 1 disables concurrency
+    incremental: bool = True  # Only review hunks not covered by the last reviewed head_sha
+    triage: bool = True  # Skip lockfiles, generated, minified, whitespace-only and renamed-only changes
+    max_line_length: int = 400  # Added code mostly in longer lines is treated as minified
+
+
+class RateLimitSettings(BaseModel):
+    """Pacing and retry policy for VCS API calls, shared by all reviews in a process."""
+    requests_per_second: float = 10.0
+    burst: int = 20
+    max_retries: int = 5
+    backoff_base: float = 1.0  # Seconds; doubled on each retry
+    backoff_max: float = 60.0
+    max_wait: float = 900.0  # Fail instead of waiting longer than this for a quota reset
+
+
+class CacheSettings(BaseModel):
+    """Configuration for the on-disk caches."""
+    enabled: bool = True
+    directory: Path = Path("~/.cache/branchwise").expanduser()
+    max_size_mb: int = 256
+    ttl_hours: int = 24 * 7
+    blob_max_size_mb: int = 512  # File contents fetched for hunk context
+
+
+class ServerSettings(BaseModel):
+    """Configuration for `branchwise serve`."""
+    host: str = "127.0.0.1"
+    port: int = 8080
+    workers: int = 4  # Pull requests reviewed concurrently
+    webhook_secret: Optional[SecretStr] = None  # Verifies payload signatures / tokens when set
+    max_payload_mb: int = 25
 
 
 class Settings(BaseSettings):
@@ -57,6 +103,9 @@ class Settings(BaseSettings):
     bitbucket: BitbucketSettings = BitbucketSettings()
     llm: LLMSettings = LLMSettings()
     rules: RuleSettings = RuleSettings()
+    cache: CacheSettings = CacheSettings()
+    rate_limit: RateLimitSettings = RateLimitSettings()
+    server: ServerSettings = ServerSettings()
     
     # Project specific overrides
     config_file: Optional[Path] = None
@@ -1,88 +1,801 @@
+import asyncio
 import logging
-from typing import List, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
 
 from pydantic import BaseModel
 
 from branchwise.config import Settings
-from branchwise.integrations.github import PullRequestDetails, PullRequestFile
-from branchwise.llm.client import LLMClient, ReviewComment
-from branchwise.utils.diff_parser import DiffParser
+from branchwise.core.context import ContextProvider
+from branchwise.core.review_state import HunkRecord, ReviewState, carry_forward, hunk_record
+from branchwise.core.risk import churn, risk_score
+from branchwise.core.rules import PathRules, load_path_rules_async
+from branchwise.core.triage import Triage
+from branchwise.integrations.base import AsyncVCSClient, PullRequestDetails, PullRequestFile, ThreadedVCSClient
+from branchwise.llm.client import AsyncLLMClient, LLMClient, ReviewComment
+from branchwise.utils.diff_parser import DiffParser, Hunk
+from branchwise.utils.metrics import MetricsRecorder, ReviewMetrics
+
+# Rough size of the instructions wrapped around each diff by the LLM client
+PROMPT_OVERHEAD_TOKENS = 300
+
+CommentCallback = Callable[[ReviewComment], None]
+
+SEVERITY_RANK = {"critical": 0, "major": 1, "minor": 2}
 
 
 class AnalysisResult(BaseModel):
     summary: str
-    comments: List[ReviewComment]
+    comments: List[ReviewComment]  # Findings of this run and those carried forward from earlier reviews
+    new_comments: List[ReviewComment] = []  # Findings of this run only: what gets posted
+    state: Optional[ReviewState] = None
+    failed_files: List[str] = []  # Files (or parts of them) the LLM could not analyze
+    skipped_files: Dict[str, str] = {}  # File -> why triage kept it from the LLM
+    unreviewed_files: List[str] = []  # Files (or parts of them) left out once `rules.max_comments` was reached
+    metrics: ReviewMetrics = ReviewMetrics()
+
+
+class PreparedFile(BaseModel):
+    """A file selected for review, with the part of its diff still to be analyzed."""
+    file: PullRequestFile
+    hunks: List[HunkRecord]
+    pending_hunks: List[HunkRecord]
+    pending_diffs: List[str]  # Annotated text of each pending hunk
+    carried_comments: List[ReviewComment] = []
+    skip_reason: Optional[str] = None
+    risk: float = 0.0  # Review order within a focus group, highest first
+
+    @property
+    def needs_review(self) -> bool:
+        if self.skip_reason:
+            return False
+        # Patches without hunk headers cannot be compared, so they are always reviewed
+        return bool(self.pending_hunks) or not self.hunks
+
+
+class RequestSegment(BaseModel):
+    """The part of one file's diff carried by a review request."""
+    filename: str
+    diff: str
+    hunks: List[HunkRecord] = []
+
+
+class ReviewRequest(BaseModel):
+    """One LLM call: a single file, part of an oversized file, or a batch of small files."""
+    segments: List[RequestSegment]
+
+    @property
+    def label(self) -> str:
+        return ", ".join(segment.filename for segment in self.segments)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for request planning."""
+    return len(text) // 4 + 1
+
+
+class RequestPlanner:
+    """
+    Turns prepared files into LLM requests that fit a token budget.
+
+    Small files are packed together (up to `llm.max_files_per_request`),
+    and files whose diff exceeds the budget are split on hunk boundaries.
+    Every segment also reserves `llm.context_token_budget` tokens for the
+    surrounding code a `ContextProvider` may add to it.
+    """
+
+    def __init__(self, settings: Settings):
+        llm = settings.llm
+        self.budget = max(1, min(llm.request_token_budget, llm.context_window - llm.max_tokens) - PROMPT_OVERHEAD_TOKENS)
+        self.context_tokens = max(0, llm.context_token_budget) if llm.context_lines > 0 else 0
+        # Diff tokens one segment may carry once its context is accounted for
+        self.diff_budget = max(1, self.budget - self.context_tokens)
+        self.max_files = max(1, llm.max_files_per_request)
+        self.logger = logging.getLogger(__name__)
+
+    def plan(self, files: List[PreparedFile]) -> List[ReviewRequest]:
+        requests: List[ReviewRequest] = []
+        batch: List[RequestSegment] = []
+        batch_tokens = 0
+
+        def flush():
+            nonlocal batch, batch_tokens
+            if batch:
+                requests.append(ReviewRequest(segments=batch))
+            batch, batch_tokens = [], 0
+
+        for item in files:
+            segments = self._split(item)
+            if len(segments) > 1:
+                # Oversized files go out on their own, one request per chunk of hunks
+                requests.extend(ReviewRequest(segments=[segment]) for segment in segments)
+                continue
+
+            segment = segments[0]
+            tokens = estimate_tokens(segment.diff) + self.context_tokens
+            if batch and (batch_tokens + tokens > self.budget or len(batch) >= self.max_files):
+                flush()
+            batch.append(segment)
+            batch_tokens += tokens
+
+        flush()
+        return requests
+
+    def _split(self, item: PreparedFile) -> List[RequestSegment]:
+        """Split a file's pending hunks into segments that each fit the budget."""
+        filename = item.file.filename
+        if not item.pending_hunks:
+            return [RequestSegment(filename=filename, diff="")]
+
+        segments: List[RequestSegment] = []
+        diffs: List[str] = []
+        hunks: List[HunkRecord] = []
+        tokens = 0
+        for record, diff in zip(item.pending_hunks, item.pending_diffs):
+            hunk_tokens = estimate_tokens(diff)
+            if hunk_tokens > self.diff_budget:
+                self.logger.warning(
+                    f"Hunk at line {record.new_line_start} of {filename} exceeds the request token budget"
+                )
+            if diffs and tokens + hunk_tokens > self.diff_budget:
+                segments.append(RequestSegment(filename=filename, diff="\n".join(diffs), hunks=hunks))
+                diffs, hunks, tokens = [], [], 0
+            diffs.append(diff)
+            hunks.append(record)
+            tokens += hunk_tokens
+
+        segments.append(RequestSegment(filename=filename, diff="\n".join(diffs), hunks=hunks))
+        return segments
+
+
+class RequestCancelled(Exception):
+    """
+    Raised inside a request that was stopped because the comment budget is
+    full, with the comments it had already emitted.
+    """
+
+    def __init__(self, comments: Optional[List[ReviewComment]] = None):
+        super().__init__()
+        self.comments = comments or []
+
+
+class CommentBudget:
+    """
+    Counts the new comments of one review against `rules.max_comments`
+    (0 or less means no limit); comments carried forward from earlier
+    reviews do not count, so new code is always reviewed.
+    Requests are ranked in the order they are tracked (the review order).
+    The budget is full once finished requests ranked up to some request,
+    the cutoff, have found `limit` comments. Requests ranked after the
+    cutoff are not needed: those that have not started are skipped and
+    streaming ones stop at their next comment. Higher-ranked requests
+    always finish, and the result is trimmed to the limit afterwards.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._ranks: Dict[int, int] = {}
+        self._counts: Dict[int, int] = {}
+        self._cutoff: Optional[int] = None
+        self._cancelled: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def track(self, requests: List["ReviewRequest"]):
+        """Rank requests after those tracked before them."""
+        with self._lock:
+            for request in requests:
+                self._ranks.setdefault(id(request), len(self._ranks))
+
+    def add(self, request: "ReviewRequest", count: int):
+        """Record the comments of a finished request."""
+        if self.limit <= 0:
+            return
+        with self._lock:
+            self._counts[self._ranks[id(request)]] = count
+            total = 0
+            for rank in sorted(self._counts):
+                total += self._counts[rank]
+                if total >= self.limit:
+                    self._cutoff = rank
+                    break
+
+    def is_needed(self, request: "ReviewRequest") -> bool:
+        cutoff = self._cutoff
+        return cutoff is None or self._ranks[id(request)] <= cutoff
+
+    def cancel(self, request: "ReviewRequest"):
+        with self._lock:
+            self._cancelled.add(id(request))
+
+    def was_cancelled(self, request: "ReviewRequest") -> bool:
+        return id(request) in self._cancelled
+
+
+def format_summary_comment(result: AnalysisResult) -> str:
+    """Build the body of the summary comment posted to the provider."""
+    return "### Branchwise Code Review\n\n" + result.summary
 
 
 class Analyzer:
-    def __init__(self, settings: Settings, llm_client: LLMClient):
+    def __init__(
+        self,
+        settings: Settings,
+        llm_client: Union[LLMClient, AsyncLLMClient],
+        triage: Optional[Triage] = None,
+    ):
         self.settings = settings
         self.llm_client = llm_client
+        self.planner = RequestPlanner(settings)
+        self.triage = triage or Triage.from_settings(settings)
+        self.path_rules = PathRules.from_settings(settings)
         self.logger = logging.getLogger(__name__)
 
-    def analyze_pr(self, pr_details: PullRequestDetails) -> AnalysisResult:
+    def analyze_pr(
+        self,
+        pr_details: PullRequestDetails,
+        previous_state: Optional[ReviewState] = None,
+        on_comment: Optional[CommentCallback] = None,
+        path_rules: Optional[PathRules] = None,
+        context_provider: Optional[ContextProvider] = None,
+    ) -> AnalysisResult:
         """
         Analyze the pull request and return a list of comments.
+        With a `previous_state`, only hunks not reviewed in that run are sent
+        to the LLM and earlier comments on unchanged hunks are carried forward.
+        With `on_comment`, completions are streamed and each new comment is
+        passed to it as soon as it is parsed (one call at a time, from the
+        worker threads). Comments of a request that ends up failing may
+        already have been passed on; they are not part of the result.
+        `path_rules` replaces the rules from the settings, e.g. to add the
+        repository's `.branchwiseignore`. With a `context_provider`, each
+        request also carries the code surrounding its hunks.
+        Files are reviewed in risk order, and no new requests are started
+        once `rules.max_comments` comments have been found; the files left
+        out are listed in `unreviewed_files`.
+        """
+        recorder = MetricsRecorder()
+        emit = self._emitter(on_comment, recorder)
+        rules = path_rules or self.path_rules
+        with recorder.stage("prepare"):
+            prepared = self._prepare_files(pr_details, previous_state, rules)
+        with recorder.stage("plan"):
+            requests = self.planner.plan(self._review_order(prepared, rules))
+        budget = CommentBudget(self.settings.rules.max_comments)
+        budget.track(requests)
+        with recorder.stage("llm"):
+            results = self._run_requests(requests, recorder, emit, context_provider, budget)
+        with recorder.stage("aggregate"):
+            result = self._build_result(pr_details, prepared, requests, results, budget)
+        result.metrics = recorder.metrics
+        return result
+
+    def analyze_pr_stream(
+        self,
+        pr_details: PullRequestDetails,
+        files: Iterable[PullRequestFile],
+        previous_state: Optional[ReviewState] = None,
+        on_comment: Optional[CommentCallback] = None,
+        path_rules: Optional[PathRules] = None,
+        context_provider: Optional[ContextProvider] = None,
+    ) -> AnalysisResult:
         """
+        Analyze a pull request whose files are still being fetched.
+        Files are prepared as they arrive. Files of the first focus group
+        (every file without focus rules or without a comment limit) are
+        planned in groups of `llm.max_files_per_request`, whose requests
+        start while the next files download; risk order applies within each
+        group. Other files could be outranked by a file that has not arrived
+        yet, so they are planned once the last file is in. Consumed files are
+        appended to `pr_details.files`. The other arguments behave as in
+        `analyze_pr`.
+        """
+        recorder = MetricsRecorder()
+        emit = self._emitter(on_comment, recorder)
+        rules = path_rules or self.path_rules
+        if previous_state and previous_state.head_sha == pr_details.head_sha:
+            self.logger.info(f"Commit {pr_details.head_sha} was already reviewed; reusing earlier results")
+        prepared: List[PreparedFile] = []
+        requests: List[ReviewRequest] = []
+        futures = []
+        early: List[PreparedFile] = []  # First focus group: no later file can be reviewed before these
+        late: List[PreparedFile] = []
+        budget = CommentBudget(self.settings.rules.max_comments)
+        run = partial(self._run_budgeted, budget=budget, recorder=recorder, emit=emit, context_provider=context_provider)
+        with ThreadPoolExecutor(
+            max_workers=max(1, self.settings.rules.max_workers), thread_name_prefix="branchwise-analyzer"
+        ) as executor:
+
+            def submit(group: List[PreparedFile]):
+                with recorder.stage("plan"):
+                    planned = self.planner.plan(self._review_order(group, rules))
+                requests.extend(planned)
+                budget.track(planned)
+                futures.extend(executor.submit(run, request) for request in planned)
+                group.clear()
+
+            for file in files:
+                pr_details.files.append(file)
+                if context_provider is not None:
+                    context_provider.add_file(file)
+                with recorder.stage("prepare"):
+                    item = self._prepare_file(file, previous_state, rules)
+                if item is None:
+                    continue
+                prepared.append(item)
+                if not item.needs_review:
+                    continue
+                if budget.limit <= 0 or rules.priority(file.filename) == 0:
+                    early.append(item)
+                    if len(early) >= self.planner.max_files:
+                        submit(early)
+                else:
+                    late.append(item)
+            submit(early)
+            submit(late)
+
+            with recorder.stage("llm"):
+                results = [future.result() for future in futures]
+        with recorder.stage("aggregate"):
+            result = self._build_result(pr_details, prepared, requests, results, budget)
+        result.metrics = recorder.metrics
+        return result
+
+    async def analyze_pr_async(
+        self,
+        pr_details: PullRequestDetails,
+        previous_state: Optional[ReviewState] = None,
+        on_comment: Optional[CommentCallback] = None,
+        path_rules: Optional[PathRules] = None,
+        context_provider: Optional[ContextProvider] = None,
+    ) -> AnalysisResult:
+        """
+        Analyze the pull request on the running event loop.
+        At most `rules.max_workers` requests are in flight at once.
+        The other arguments behave as in `analyze_pr`.
+        """
+        recorder = MetricsRecorder()
+        emit = self._emitter(on_comment, recorder)
+        rules = path_rules or self.path_rules
+        with recorder.stage("prepare"):
+            prepared = self._prepare_files(pr_details, previous_state, rules)
+        with recorder.stage("plan"):
+            requests = self.planner.plan(self._review_order(prepared, rules))
+        budget = CommentBudget(self.settings.rules.max_comments)
+        budget.track(requests)
+        semaphore = asyncio.Semaphore(max(1, self.settings.rules.max_workers))
+        tasks: List[asyncio.Task] = []
+
+        async def run(request: ReviewRequest) -> Optional[List[ReviewComment]]:
+            async with semaphore:
+                comments = await self._run_budgeted_async(request, budget, recorder, emit, context_provider)
+            # Lower-priority requests still waiting or in flight may not be needed any more
+            for task, other in zip(tasks, requests):
+                if task is not asyncio.current_task() and not task.done() and not budget.is_needed(other):
+                    task.cancel()
+            return comments
+
+        with recorder.stage("llm"):
+            tasks.extend(asyncio.ensure_future(run(request)) for request in requests)
+            outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        results = []
+        for request, outcome in zip(requests, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                budget.cancel(request)
+                outcome = None
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            results.append(outcome)
+        with recorder.stage("aggregate"):
+            result = self._build_result(pr_details, prepared, requests, results, budget)
+        result.metrics = recorder.metrics
+        return result
+
+    async def review_pr_async(
+        self,
+        vcs_client: AsyncVCSClient,
+        repo_name: str,
+        pr_number: int,
+        post: bool = True,
+    ) -> AnalysisResult:
+        """
+        Fetch, analyze and optionally post the review of a pull request.
+        Many reviews can be awaited concurrently from one event loop.
+        """
+        start = time.perf_counter()
+        pr_details = await vcs_client.get_pr_details(repo_name, pr_number)
+        path_rules = await load_path_rules_async(self.settings, vcs_client, repo_name, pr_details.base_ref)
+        fetch_seconds = time.perf_counter() - start
+        context_provider = None
+        if isinstance(vcs_client, ThreadedVCSClient):
+            # Context is fetched through the wrapped blocking client
+            context_provider = ContextProvider.from_settings(self.settings, vcs_client.client, repo_name, pr_details)
+        result = await self.analyze_pr_async(pr_details, path_rules=path_rules, context_provider=context_provider)
+        result.metrics.stages["fetch"] = fetch_seconds
+
+        if post and result.new_comments:
+            start = time.perf_counter()
+            await vcs_client.post_review(
+                repo_name, pr_number, format_summary_comment(result), result.new_comments, pr_details.head_sha
+            )
+            result.metrics.stages["post"] = time.perf_counter() - start
+
+        return result
+
+    @staticmethod
+    def _review_order(prepared: List[PreparedFile], rules: PathRules) -> List[PreparedFile]:
+        """Files that still need the LLM: focused files first, then riskier files first (file order otherwise)."""
+        return sorted(
+            (item for item in prepared if item.needs_review),
+            key=lambda item: (rules.priority(item.file.filename), -item.risk),
+        )
+
+    def _prepare_files(
+        self,
+        pr_details: PullRequestDetails,
+        previous_state: Optional[ReviewState],
+        rules: Optional[PathRules] = None,
+    ) -> List[PreparedFile]:
+        """Select reviewable files and work out which of their hunks still need the LLM."""
+        rules = rules or self.path_rules
+        if previous_state and previous_state.head_sha == pr_details.head_sha:
+            self.logger.info(f"Commit {pr_details.head_sha} was already reviewed; reusing earlier results")
+
+        prepared = []
+        for file in pr_details.files:
+            item = self._prepare_file(file, previous_state, rules)
+            if item is not None:
+                prepared.append(item)
+        return prepared
+
+    def _prepare_file(
+        self,
+        file: PullRequestFile,
+        previous_state: Optional[ReviewState],
+        rules: PathRules,
+    ) -> Optional[PreparedFile]:
+        """Parse and triage one file; None when it is not reviewed at all."""
+        if not self._should_analyze(file, rules):
+            return None
+
+        hunks = list(DiffParser.iter_hunks(file.patch))
+        skip_reason = self.triage.classify(file, hunks)
+        if skip_reason:
+            self.logger.info(f"Skipping {file.filename}: {skip_reason}")
+        elif not file.patch:
+            return None
+        records = [hunk_record(file.filename, hunk) for hunk in hunks]
+        pending = [
+            (hunk, record) for hunk, record in zip(hunks, records)
+            if not skip_reason and not self.triage.skip_hunk(file, hunk)
+        ]
+        carried: List[ReviewComment] = []
+
+        previous_records = previous_state.files.get(file.filename) if previous_state else None
+        if previous_records is not None and records:
+            reviewed = {record.fingerprint for record in previous_records}
+            pending = [(hunk, record) for hunk, record in pending if record.fingerprint not in reviewed]
+            previous_comments = [c for c in previous_state.comments if c.file_path == file.filename]
+            carried = carry_forward(previous_records, records, previous_comments)
+
+        return PreparedFile(
+            file=file,
+            hunks=records,
+            pending_hunks=[record for _, record in pending],
+            pending_diffs=[self._annotate_hunks([hunk]) for hunk, _ in pending],
+            carried_comments=carried,
+            skip_reason=skip_reason,
+            risk=risk_score(file.filename, churn([hunk for hunk, _ in pending])),
+        )
+
+    def _build_result(
+        self,
+        pr_details: PullRequestDetails,
+        prepared: List[PreparedFile],
+        requests: List[ReviewRequest],
+        results: List[Optional[List[ReviewComment]]],
+        budget: Optional[CommentBudget] = None,
+    ) -> AnalysisResult:
+        """
+        Aggregate comments into the final result, in file order.
+        `results` holds one entry per request; failed requests yield None and
+        cancelled ones the comments they emitted before they were stopped.
+        """
+        new_comments: Dict[str, List[ReviewComment]] = {}
+        failed_hunks: Dict[str, set] = {}
+        unreviewed_hunks: Dict[str, set] = {}
+        for request, comments in zip(requests, results):
+            cancelled = budget is not None and budget.was_cancelled(request)
+            for segment in request.segments:
+                if cancelled or comments is None:
+                    missed = unreviewed_hunks if cancelled else failed_hunks
+                    missed.setdefault(segment.filename, set()).update(h.fingerprint for h in segment.hunks)
+                new_comments.setdefault(segment.filename, []).extend(
+                    c for c in comments or [] if c.file_path == segment.filename
+                )
+
+        # The limit applies to this run's findings; carried comments were posted before
+        kept = {id(c) for c in self._limit_comments([c for item in prepared for c in new_comments.get(item.file.filename, [])])}
+        new_total = sum(len(comments) for comments in new_comments.values())
+
         all_comments = []
+        posted_comments = []
+        carried_total = 0
         summary_points = []
-        
-        for file in pr_details.files:
-            if self._should_ignore_file(file.filename):
-                self.logger.info(f"Skipping ignored file: {file.filename}")
-                continue
-            
-            if file.status == "removed":
-                continue
-                
-            if not file.patch:
-                self.logger.warning(f"No patch available for file: {file.filename}")
-                continue
+        failed_files = []
+        unreviewed_files = []
+        skipped_files = {}
+        state = ReviewState(head_sha=pr_details.head_sha)
 
-            self.logger.info(f"Analyzing file: {file.filename}")
-            file_comments = self._analyze_file(file)
+        for item in prepared:
+            filename = item.file.filename
+            file_new = [c for c in new_comments.get(filename, []) if id(c) in kept]
+            file_comments = sorted(item.carried_comments + file_new, key=lambda c: c.line_number)
             all_comments.extend(file_comments)
-            
-            if file_comments:
-                summary_points.append(f"- {file.filename}: {len(file_comments)} issues found.")
+            posted_comments.extend(sorted(file_new, key=lambda c: c.line_number))
+            carried_total += len(item.carried_comments)
+
+            # Hunks of failed and cancelled requests stay unreviewed so the next run retries them
+            missed = failed_hunks.get(filename, set()) | unreviewed_hunks.get(filename, set())
+            state.files[filename] = [record for record in item.hunks if record.fingerprint not in missed]
 
+            if item.skip_reason:
+                skipped_files[filename] = item.skip_reason
+                summary_points.append(f"- {filename}: skipped ({item.skip_reason}).")
+            elif filename in failed_hunks:
+                failed_files.append(filename)
+                summary_points.append(f"- {filename}: could not be analyzed.")
+            elif filename in unreviewed_hunks:
+                unreviewed_files.append(filename)
+                if file_new:
+                    summary_points.append(f"- {filename}: {len(file_new)} issues found before the comment limit was reached.")
+                else:
+                    summary_points.append(f"- {filename}: not reviewed (comment limit reached).")
+            elif file_new:
+                summary_points.append(f"- {filename}: {len(file_new)} issues found.")
+
+        state.comments = all_comments
+        if len(kept) < new_total:
+            summary_points.append(f"Only the {len(kept)} most severe of {new_total} new findings are included.")
+        if carried_total:
+            summary_points.append(f"{carried_total} findings from earlier reviews still apply.")
         summary = "\n".join(summary_points) if summary_points else "No significant issues found."
-        
+
         return AnalysisResult(
             summary=summary,
-            comments=all_comments
+            comments=all_comments,
+            new_comments=posted_comments,
+            state=state,
+            failed_files=failed_files,
+            skipped_files=skipped_files,
+            unreviewed_files=unreviewed_files,
         )
 
-    def _analyze_file(self, file: PullRequestFile) -> List[ReviewComment]:
-        """
-        Analyze a single file diff using LLM.
-        """
-        # Parse diff to get context if needed, but for simplicity pass raw patch to LLM with line numbers annotated?
-        # Actually LLMs are good at raw diffs if formatted well.
-        # But to be precise about line numbers for comments, we need to map diff lines to file lines.
-        
-        # Simpler approach: Ask LLM to return line number relative to the file.
-        # But LLM only sees the diff snippet. It needs to know the starting line number of the hunk.
-        
-        # Let's use the DiffParser to structure the input better for the LLM.
-        diff_changes = DiffParser.parse(file.patch)
-        
-        # Construct a more detailed prompt with line numbers
+    def _limit_comments(self, comments: List[ReviewComment]) -> List[ReviewComment]:
+        """The `rules.max_comments` most severe comments, in their original order."""
+        limit = self.settings.rules.max_comments
+        if limit <= 0 or len(comments) <= limit:
+            return comments
+        ranked = sorted(range(len(comments)), key=lambda i: SEVERITY_RANK.get(comments[i].severity, len(SEVERITY_RANK)))
+        return [comments[i] for i in sorted(ranked[:limit])]
+
+    def _should_analyze(self, file: PullRequestFile, rules: Optional[PathRules] = None) -> bool:
+        """Check whether a file should be sent to the LLM at all."""
+        if self._should_ignore_file(file.filename, rules):
+            self.logger.info(f"Skipping ignored file: {file.filename}")
+            return False
+
+        if file.status == "removed":
+            return False
+
+        if not file.patch and file.status not in ("renamed", "copied"):
+            self.logger.warning(f"No patch available for file: {file.filename}")
+            return False
+
+        return True
+
+    def _emitter(self, on_comment: Optional[CommentCallback], recorder: MetricsRecorder) -> Optional[CommentCallback]:
+        """Wrap a comment callback so that calls are serialized and its errors never fail a request."""
+        if on_comment is None:
+            return None
+        lock = threading.Lock()
+
+        def emit(comment: ReviewComment):
+            recorder.comment_emitted()
+            with lock:
+                try:
+                    on_comment(comment)
+                except Exception as e:
+                    self.logger.warning(f"Comment callback failed: {e}")
+
+        return emit
+
+    def _run_requests(
+        self,
+        requests: List[ReviewRequest],
+        recorder: Optional[MetricsRecorder] = None,
+        emit: Optional[CommentCallback] = None,
+        context_provider: Optional[ContextProvider] = None,
+        budget: Optional[CommentBudget] = None,
+    ) -> List[Optional[List[ReviewComment]]]:
+        """
+        Run requests, concurrently when `rules.max_workers` allows it.
+        Results are returned in the same order as `requests`.
+        """
+        recorder = recorder or MetricsRecorder()
+        if budget is None:
+            budget = CommentBudget(self.settings.rules.max_comments)
+            budget.track(requests)
+        run = partial(self._run_budgeted, budget=budget, recorder=recorder, emit=emit, context_provider=context_provider)
+        max_workers = min(self.settings.rules.max_workers, len(requests))
+        if max_workers <= 1:
+            return [run(request) for request in requests]
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="branchwise-analyzer") as executor:
+            return list(executor.map(run, requests))
+
+    def _request_contexts(
+        self,
+        request: ReviewRequest,
+        context_provider: Optional[ContextProvider],
+        recorder: MetricsRecorder,
+    ) -> List[Optional[str]]:
+        """Surrounding code for each segment; a file whose context cannot be fetched is reviewed without it."""
+        if context_provider is None:
+            return [None] * len(request.segments)
+        with recorder.stage("context"):
+            return [context_provider.context_for(s.filename, s.hunks) for s in request.segments]
+
+    def _call_llm(self, request: ReviewRequest, contexts: List[Optional[str]], stream: bool):
+        """Dispatch to the single-file or batch method (`stream_*` when streaming)."""
+        if len(request.segments) == 1:
+            segment = request.segments[0]
+            method = self.llm_client.stream_diff if stream else self.llm_client.analyze_diff
+            return method(segment.filename, segment.diff, context=contexts[0])
+        method = self.llm_client.stream_batch if stream else self.llm_client.analyze_batch
+        return method([(s.filename, s.diff) for s in request.segments], contexts=contexts)
+
+    def _run_budgeted(
+        self,
+        request: ReviewRequest,
+        budget: CommentBudget,
+        recorder: Optional[MetricsRecorder] = None,
+        emit: Optional[CommentCallback] = None,
+        context_provider: Optional[ContextProvider] = None,
+    ) -> Optional[List[ReviewComment]]:
+        """
+        Run one request unless the comment budget no longer needs it, and
+        count its comments. A stopped request returns what it had emitted.
+        """
+        try:
+            comments = self._run_request(
+                request, recorder, emit, context_provider, cancel=lambda: not budget.is_needed(request)
+            )
+        except RequestCancelled as e:
+            budget.cancel(request)
+            return e.comments
+        budget.add(request, len(comments or []))
+        return comments
+
+    async def _run_budgeted_async(
+        self,
+        request: ReviewRequest,
+        budget: CommentBudget,
+        recorder: Optional[MetricsRecorder] = None,
+        emit: Optional[CommentCallback] = None,
+        context_provider: Optional[ContextProvider] = None,
+    ) -> Optional[List[ReviewComment]]:
+        """Async counterpart of `_run_budgeted`."""
+        try:
+            comments = await self._run_request_async(
+                request, recorder, emit, context_provider, cancel=lambda: not budget.is_needed(request)
+            )
+        except RequestCancelled as e:
+            budget.cancel(request)
+            return e.comments
+        budget.add(request, len(comments or []))
+        return comments
+
+    def _run_request(
+        self,
+        request: ReviewRequest,
+        recorder: Optional[MetricsRecorder] = None,
+        emit: Optional[CommentCallback] = None,
+        context_provider: Optional[ContextProvider] = None,
+        cancel: Optional[Callable[[], bool]] = None,
+    ) -> Optional[List[ReviewComment]]:
+        """
+        Run one request, logging failures instead of aborting the whole review.
+        Raises `RequestCancelled` if `cancel()` is true before the request
+        starts or, when streaming, before its last comment has arrived.
+        """
+        if cancel is not None and cancel():
+            raise RequestCancelled()
+        self.logger.info(f"Analyzing: {request.label}")
+        recorder = recorder or MetricsRecorder()
+        contexts = self._request_contexts(request, context_provider, recorder)
+        try:
+            with recorder.llm_call([s.filename for s in request.segments]):
+                if emit is None:
+                    return self._call_llm(request, contexts, stream=False)
+                comments = []
+                for comment in self._call_llm(request, contexts, stream=True):
+                    if cancel is not None and cancel():
+                        raise RequestCancelled(comments)
+                    comments.append(comment)
+                    emit(comment)
+                return comments
+        except RequestCancelled:
+            self.logger.info(f"Stopped {request.label}: comment limit reached")
+            raise
+        except Exception as e:
+            self.logger.error(f"Error analyzing {request.label}: {e}")
+            return None
+
+    async def _run_request_async(
+        self,
+        request: ReviewRequest,
+        recorder: Optional[MetricsRecorder] = None,
+        emit: Optional[CommentCallback] = None,
+        context_provider: Optional[ContextProvider] = None,
+        cancel: Optional[Callable[[], bool]] = None,
+    ) -> Optional[List[ReviewComment]]:
+        """
+        Async counterpart of `_run_request`. A streaming request whose task is
+        cancelled once `cancel()` is true also raises `RequestCancelled`.
+        """
+        if not isinstance(self.llm_client, AsyncLLMClient):
+            # Blocking clients are kept off the event loop
+            return await asyncio.to_thread(self._run_request, request, recorder, emit, context_provider, cancel)
+
+        if cancel is not None and cancel():
+            raise RequestCancelled()
+        self.logger.info(f"Analyzing: {request.label}")
+        recorder = recorder or MetricsRecorder()
+        comments: List[ReviewComment] = []
+        # Context providers use the blocking VCS clients
+        contexts = await asyncio.to_thread(self._request_contexts, request, context_provider, recorder)
+        try:
+            with recorder.llm_call([s.filename for s in request.segments]):
+                if emit is None:
+                    return await self._call_llm(request, contexts, stream=False)
+                async for comment in self._call_llm(request, contexts, stream=True):
+                    if cancel is not None and cancel():
+                        raise RequestCancelled(comments)
+                    comments.append(comment)
+                    emit(comment)
+                return comments
+        except asyncio.CancelledError:
+            if cancel is None or not cancel():
+                raise
+            self.logger.info(f"Stopped {request.label}: comment limit reached")
+            raise RequestCancelled(comments)
+        except RequestCancelled:
+            self.logger.info(f"Stopped {request.label}: comment limit reached")
+            raise
+        except Exception as e:
+            self.logger.error(f"Error analyzing {request.label}: {e}")
+            return None
+
+    def _annotate_hunks(self, hunks: Iterable[Hunk]) -> str:
+        """
+        Render hunks with new-file line numbers so the LLM can report
+        issues against real lines rather than diff offsets.
+        """
+        # LLMs are good at raw diffs, but to be precise about line numbers for comments
+        # we need to map diff lines to file lines. The LLM only sees the diff snippet,
+        # so it needs to know the starting line number of each hunk.
         annotated_diff = []
-        for hunk in diff_changes:
+        for hunk in hunks:
             annotated_diff.append(f"Hunk starting at line {hunk.new_line_start}:")
-            for line, line_num in hunk.lines:
+            for line, line_num in hunk.iter_lines():
                 prefix = f"{line_num}:" if line_num else "   "
                 annotated_diff.append(f"{prefix} {line}")
-        
-        full_diff_text = "\n".join(annotated_diff)
-        
-        comments = self.llm_client.analyze_diff(file.filename, full_diff_text)
-        return comments
 
-    def _should_ignore_file(self, filename: str) -> bool:
-        """Check if file should be ignored based on settings."""
-        for pattern in self.settings.rules.ignore_files:
-            if filename.endswith(pattern):
-                return True
-        return False
+        return "\n".join(annotated_diff)
+
+    def _should_ignore_file(self, filename: str, rules: Optional[PathRules] = None) -> bool:
+        """Check if file should be ignored based on the path rules."""
+        return (rules or self.path_rules).is_ignored(filename)
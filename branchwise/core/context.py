@@ -0,0 +1,204 @@
+"""
+Surrounding code for the hunks sent to the LLM.
+
+`ContextProvider` fetches the new version of each changed file through the
+VCS client and cuts out the lines around every hunk, plus the definition
+that encloses it, so the model sees the code the diff refers to.
+File contents are kept in a `BlobCache` addressed by git blob id, so a
+file is only downloaded again when its content changed.
+"""
+import hashlib
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from branchwise.config import Settings
+from branchwise.core.review_state import HunkRecord
+from branchwise.integrations.base import PullRequestDetails, PullRequestFile, VCSClient
+from branchwise.utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# Lines that usually open the function, method or type a hunk sits in
+DEFINITION_RE = re.compile(
+    r"^\s*(?:(?:export|public|private|protected|internal|static|abstract|final|async|override|pub)\s+)*"
+    r"(?:def|class|func|function|fn|interface|struct|enum|impl|trait|module|type)\b"
+)
+DEFINITION_SEARCH_LINES = 200  # How far above a hunk to look for its enclosing definition
+
+
+def git_blob_sha(content: bytes) -> str:
+    """The id git gives a blob with this content."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class BlobCache:
+    """
+    Content-addressed store of file contents, keyed by git blob id.
+    `(repository, commit, path)` aliases point at blobs, so the same content
+    reached through different commits or paths is stored once.
+    """
+
+    def __init__(self, store: DiskCache):
+        self.store = store
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "BlobCache":
+        cache = settings.cache
+        # Blobs and aliases never change, so only size-based eviction applies
+        return cls(DiskCache(directory=cache.directory / "blobs", max_bytes=cache.blob_max_size_mb * 1024 * 1024))
+
+    @staticmethod
+    def _alias_key(repo: str, ref: str, path: str) -> str:
+        return f"ref:{repo}@{ref}:{path}"
+
+    def get(self, blob_sha: str) -> Optional[bytes]:
+        return self.store.get(f"blob:{blob_sha}")
+
+    def put(self, data: bytes) -> str:
+        """Store raw file content and return its blob id."""
+        blob_sha = git_blob_sha(data)
+        self.store.set(f"blob:{blob_sha}", data)
+        return blob_sha
+
+    def resolve(self, repo: str, ref: str, path: str) -> Optional[str]:
+        data = self.store.get(self._alias_key(repo, ref, path))
+        return data.decode("ascii") if data is not None else None
+
+    def alias(self, repo: str, ref: str, path: str, blob_sha: str):
+        self.store.set(self._alias_key(repo, ref, path), blob_sha.encode("ascii"))
+
+
+class ContextProvider:
+    """Fetches head versions of the files of one pull request and renders hunk context."""
+
+    def __init__(
+        self,
+        client: VCSClient,
+        repo_name: str,
+        pr_details: PullRequestDetails,
+        cache: Optional[BlobCache] = None,
+        context_lines: int = 20,
+        max_tokens: int = 2000,
+    ):
+        self.client = client
+        self.repo_name = repo_name
+        # Keys cached aliases, so the same repository name on another host never collides
+        self.repo = f"{client.host}/{repo_name}"
+        self.head_sha = pr_details.head_sha
+        self.files: Dict[str, PullRequestFile] = {file.filename: file for file in pr_details.files}
+        self.cache = cache
+        self.context_lines = context_lines
+        self.max_chars = max_tokens * 4
+        self._contents: Dict[str, Optional[List[str]]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(
+        cls,
+        settings: Settings,
+        client: VCSClient,
+        repo_name: str,
+        pr_details: PullRequestDetails,
+    ) -> Optional["ContextProvider"]:
+        """None when context is disabled (`llm.context_lines = 0`)."""
+        if settings.llm.context_lines <= 0:
+            return None
+        return cls(
+            client,
+            repo_name,
+            pr_details,
+            cache=BlobCache.from_settings(settings) if settings.cache.enabled else None,
+            context_lines=settings.llm.context_lines,
+            max_tokens=settings.llm.context_token_budget,
+        )
+
+    def add_file(self, file: PullRequestFile):
+        """Register a file that arrived after the provider was created."""
+        self.files[file.filename] = file
+
+    def file_lines(self, filename: str) -> Optional[List[str]]:
+        """Lines of the file at the head commit, from memory, the blob cache or the provider."""
+        with self._lock:
+            if filename in self._contents:
+                return self._contents[filename]
+        content = self._load(filename)
+        lines = content.splitlines() if content is not None else None
+        with self._lock:
+            self._contents[filename] = lines
+        return lines
+
+    def _load(self, filename: str) -> Optional[str]:
+        data = self._load_bytes(filename)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+
+    def _load_bytes(self, filename: str) -> Optional[bytes]:
+        file = self.files.get(filename)
+        blob_sha = file.blob_sha if file else None
+        if self.cache:
+            blob_sha = blob_sha or self.cache.resolve(self.repo, self.head_sha, filename)
+            data = self.cache.get(blob_sha) if blob_sha else None
+            if data is not None:
+                return data
+
+        try:
+            data = self.client.get_file_bytes(self.repo_name, filename, self.head_sha)
+        except Exception as e:
+            logger.warning(f"Could not fetch {filename} for context: {e}")
+            return None
+        # Hashed as fetched, so the id matches the blob id git reports for the file
+        if data is not None and self.cache:
+            self.cache.alias(self.repo, self.head_sha, filename, self.cache.put(data))
+        return data
+
+    def context_for(self, filename: str, hunks: List[HunkRecord]) -> Optional[str]:
+        """
+        Numbered lines around the given hunks, each window headed by its
+        enclosing definition. None for new files, whose diff already holds
+        everything, and when the file cannot be fetched.
+        """
+        file = self.files.get(filename)
+        if not hunks or (file and file.status == "added"):
+            return None
+        lines = self.file_lines(filename)
+        if not lines:
+            return None
+
+        windows: List[Tuple[int, int]] = []
+        for hunk in sorted(hunks, key=lambda record: record.new_line_start):
+            start = max(1, hunk.new_line_start - self.context_lines)
+            end = min(len(lines), hunk.new_line_end + self.context_lines)
+            if start > end:
+                continue
+            if windows and start <= windows[-1][1] + 1:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+            else:
+                windows.append((start, end))
+
+        rendered: List[str] = []
+        size = 0
+        for start, end in windows:
+            block = []
+            header = self._enclosing_definition(lines, start)
+            if header is not None:
+                block.append(f"{header}: {lines[header - 1]}")
+                if header < start - 1:
+                    block.append("...")
+            block.extend(f"{number}: {lines[number - 1]}" for number in range(start, end + 1))
+            block.append("...")
+            for line in block:
+                size += len(line) + 1
+                if size > self.max_chars:
+                    rendered.append("... (truncated)")
+                    return "\n".join(rendered)
+                rendered.append(line)
+        return "\n".join(rendered) if rendered else None
+
+    @staticmethod
+    def _enclosing_definition(lines: List[str], start: int) -> Optional[int]:
+        """Line number of the nearest definition at or above `start`, if one is close enough."""
+        for number in range(start, max(0, start - DEFINITION_SEARCH_LINES), -1):
+            if DEFINITION_RE.match(lines[number - 1]):
+                return number if number < start else None
+        return None
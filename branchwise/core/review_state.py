@@ -0,0 +1,104 @@
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+from branchwise.config import Settings
+from branchwise.llm.client import ReviewComment
+from branchwise.utils.diff_parser import Hunk
+from branchwise.utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+
+class HunkRecord(BaseModel):
+    """A hunk that has been reviewed, identified by the content it changes."""
+    fingerprint: str
+    new_line_start: int
+    new_line_end: int
+
+    def contains(self, line_number: int) -> bool:
+        return self.new_line_start <= line_number <= self.new_line_end
+
+
+class ReviewState(BaseModel):
+    """What was reviewed at a given head commit, and what was found."""
+    head_sha: str
+    files: Dict[str, List[HunkRecord]] = {}
+    comments: List[ReviewComment] = []
+
+
+def hunk_fingerprint(filename: str, hunk: Hunk) -> str:
+    """
+    Fingerprint a hunk by its added and removed lines only.
+    Context lines and line numbers shift as other parts of the file change,
+    so they are left out to keep the fingerprint stable across pushes.
+    """
+    digest = hashlib.sha256(filename.encode("utf-8"))
+    for line, _ in hunk.iter_lines():
+        if line.startswith(("+", "-")):
+            digest.update(b"\n")
+            digest.update(line.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def hunk_record(filename: str, hunk: Hunk) -> HunkRecord:
+    line_numbers = [num for num in hunk.numbers if num]
+    return HunkRecord(
+        fingerprint=hunk_fingerprint(filename, hunk),
+        new_line_start=hunk.new_line_start,
+        new_line_end=max(line_numbers) if line_numbers else hunk.new_line_start,
+    )
+
+
+def carry_forward(
+    previous: List[HunkRecord],
+    current: List[HunkRecord],
+    comments: List[ReviewComment],
+) -> List[ReviewComment]:
+    """
+    Re-anchor earlier comments on hunks that are still part of the diff.
+    Comments on hunks that changed or disappeared are dropped.
+    """
+    current_by_fingerprint = {record.fingerprint: record for record in current}
+    carried = []
+    for comment in comments:
+        for record in previous:
+            if not record.contains(comment.line_number):
+                continue
+            match = current_by_fingerprint.get(record.fingerprint)
+            if match:
+                shift = match.new_line_start - record.new_line_start
+                carried.append(comment.model_copy(update={"line_number": comment.line_number + shift}))
+            break
+    return carried
+
+
+class ReviewStateStore:
+    """Persists the `ReviewState` of each pull request between runs."""
+
+    def __init__(self, store: DiskCache):
+        self.store = store
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ReviewStateStore":
+        cache = settings.cache
+        return cls(DiskCache(
+            directory=cache.directory / "reviews",
+            max_bytes=cache.max_size_mb * 1024 * 1024,
+            ttl_seconds=cache.ttl_hours * 3600,
+        ))
+
+    def load(self, pr_key: str) -> Optional[ReviewState]:
+        data = self.store.get(pr_key)
+        if data is None:
+            return None
+        try:
+            return ReviewState.model_validate_json(data)
+        except ValidationError as e:
+            logger.warning(f"Ignoring unreadable review state for {pr_key}: {e}")
+            return None
+
+    def save(self, pr_key: str, state: ReviewState):
+        self.store.set(pr_key, state.model_dump_json().encode("utf-8"))
@@ -0,0 +1,110 @@
+import logging
+import time
+from typing import Optional, Tuple
+
+from pydantic import BaseModel
+
+from branchwise.config import Settings
+from branchwise.core.analyzer import AnalysisResult, Analyzer, CommentCallback, format_summary_comment
+from branchwise.core.context import ContextProvider
+from branchwise.core.review_state import ReviewState, ReviewStateStore
+from branchwise.core.rules import load_path_rules
+from branchwise.integrations.base import PullRequestDetails, StreamingVCSClient
+from branchwise.integrations.factory import ClientPool, PullRequestRef
+
+logger = logging.getLogger(__name__)
+
+
+class ReviewOutcome(BaseModel):
+    pr_details: PullRequestDetails
+    result: AnalysisResult
+    posted: bool = False
+    previous_head_sha: Optional[str] = None  # Head of the earlier review this one was incremental to
+
+
+def load_review_state(settings: Settings, pr_url: str) -> Tuple[Optional[ReviewStateStore], Optional[ReviewState]]:
+    """Load the state of the last review of this PR. State problems never fail a review."""
+    try:
+        store = ReviewStateStore.from_settings(settings)
+        return store, store.load(pr_url.rstrip("/"))
+    except Exception as e:
+        logger.warning(f"Could not load previous review state: {e}")
+        return None, None
+
+
+def save_review_state(store: ReviewStateStore, pr_url: str, state: ReviewState):
+    try:
+        store.save(pr_url.rstrip("/"), state)
+    except Exception as e:
+        logger.warning(f"Could not save review state: {e}")
+
+
+class PullRequestReviewer:
+    """
+    Fetches, analyzes and posts reviews with long-lived clients.
+    The one implementation behind the `review`, batch and server commands;
+    safe to call from several threads.
+    """
+
+    def __init__(self, settings: Settings, analyzer: Analyzer, clients: ClientPool):
+        self.settings = settings
+        self.analyzer = analyzer
+        self.clients = clients
+
+    def review(
+        self,
+        ref: PullRequestRef,
+        post: bool = True,
+        full: bool = False,
+        on_comment: Optional[CommentCallback] = None,
+    ) -> ReviewOutcome:
+        """
+        Review one PR. Review state is only saved once the review is posted.
+        `on_comment` streams comments as in `Analyzer.analyze_pr`.
+        """
+        client = self.clients.get(ref)
+        started = time.perf_counter()
+        files = None
+        if isinstance(client, StreamingVCSClient):
+            # Files are fetched while the first ones are already being analyzed
+            pr_details, files = client.stream_pr_details(ref.repo_name, ref.pr_number)
+        else:
+            pr_details = client.get_pr_details(ref.repo_name, ref.pr_number)
+        path_rules = load_path_rules(self.settings, client, ref.repo_name, pr_details.base_ref)
+        fetch_seconds = time.perf_counter() - started
+
+        previous_state = state_store = None
+        if self.settings.rules.incremental and not full:
+            state_store, previous_state = load_review_state(self.settings, ref.url)
+        options = dict(
+            previous_state=previous_state,
+            on_comment=on_comment,
+            path_rules=path_rules,
+            context_provider=ContextProvider.from_settings(self.settings, client, ref.repo_name, pr_details),
+        )
+        if files is not None:
+            result = self.analyzer.analyze_pr_stream(pr_details, files, **options)
+        else:
+            result = self.analyzer.analyze_pr(pr_details, **options)
+        result.metrics.stages["fetch"] = fetch_seconds
+
+        posted = False
+        # Carried comments are already on the PR; only this run's findings are posted
+        if post and result.new_comments:
+            started = time.perf_counter()
+            client.post_review(
+                ref.repo_name, ref.pr_number, format_summary_comment(result), result.new_comments, pr_details.head_sha
+            )
+            result.metrics.stages["post"] = time.perf_counter() - started
+            posted = True
+
+        # State describes what is on the PR, so it only advances once the review is posted
+        if post and state_store and result.state:
+            save_review_state(state_store, ref.url, result.state)
+
+        return ReviewOutcome(
+            pr_details=pr_details,
+            result=result,
+            posted=posted,
+            previous_head_sha=previous_state.head_sha if previous_state else None,
+        )
@@ -0,0 +1,52 @@
+"""
+Risk scores used to order files for review.
+
+Within each focus group (see `PathRules.priority`), files with a higher
+score are sent to the LLM first, so that when the comment budget
+(`rules.max_comments`) ends a review early, the changes most likely to
+hold real problems have already been looked at.
+"""
+import math
+import re
+from typing import List
+
+from branchwise.utils.diff_parser import Hunk
+
+DOC_SUFFIXES = (".md", ".rst", ".txt", ".adoc", ".svg", ".csv")
+CONFIG_SUFFIXES = (".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".xml", ".properties", ".lock")
+TEST_PATH_RE = re.compile(r"(?:^|/)(?:tests?|spec|__tests__)/|(?:^|/)test_[^/]*$|_test\.[^/]+$|\.(?:spec|test)\.[^/]+$")
+# Path segments of code that guards access, secrets, money or data
+SECURITY_PATH_RE = re.compile(
+    r"(?<![a-z])(?:auth|login|passw|secret|credential|crypt|token|session|permission|acl|oauth|jwt|saml"
+    r"|sanitiz|escape|payment|billing|security|admin|sql|migration)",
+    re.IGNORECASE,
+)
+
+DOC_WEIGHT = 0.25
+CONFIG_WEIGHT = 0.5
+TEST_WEIGHT = 0.5
+SECURITY_WEIGHT = 2.0
+
+
+def churn(hunks: List[Hunk]) -> int:
+    """Number of added and removed lines in the hunks."""
+    return sum(1 for hunk in hunks for text in hunk.texts if text[:1] in ("+", "-"))
+
+
+def risk_score(filename: str, changed_lines: int) -> float:
+    """
+    Higher for code than for docs, configuration and tests, for larger
+    changes (logarithmically) and for security-sensitive paths.
+    """
+    name = filename.lower()
+    if name.endswith(DOC_SUFFIXES):
+        weight = DOC_WEIGHT
+    elif name.endswith(CONFIG_SUFFIXES):
+        weight = CONFIG_WEIGHT
+    elif TEST_PATH_RE.search(name):
+        weight = TEST_WEIGHT
+    else:
+        weight = 1.0
+    if SECURITY_PATH_RE.search(filename):
+        weight *= SECURITY_WEIGHT
+    return weight * (1 + math.log1p(changed_lines))
@@ -0,0 +1,197 @@
+"""
+Path rules: which files are reviewed, and in what order.
+
+Ignore patterns use gitignore syntax (`*`, `**`, `?`, `[...]`, a leading
+`/` to anchor, a trailing `/` for directories and `!` to re-include) and
+come from `rules.ignore_files` and `.branchwiseignore` files. Focus
+patterns (`rules.focus_files`) do not filter anything: files matching an
+earlier focus pattern are sent to the LLM first.
+
+All patterns are compiled once into a few regular expressions, so
+matching cost does not grow with the number of patterns per file.
+"""
+import logging
+import re
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from branchwise.config import Settings
+
+if TYPE_CHECKING:
+    from branchwise.integrations.base import AsyncVCSClient, VCSClient
+
+logger = logging.getLogger(__name__)
+
+IGNORE_FILE_NAME = ".branchwiseignore"
+
+_GLOB_CHARS = set("*?[")
+
+
+def _translate_glob(glob: str) -> str:
+    """Translate the path part of a gitignore pattern into a regex body."""
+    out = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if c == "*":
+            if glob.startswith("**/", i):
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if glob.startswith("**", i):
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = glob.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(glob[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def compile_pattern(pattern: str) -> Optional[Tuple[bool, str]]:
+    """
+    Turn one gitignore-style line into `(negated, regex)`, or None for
+    blank lines and comments. The regex matches the path itself or any path
+    below it, relative to the repository root.
+    """
+    pattern = pattern.rstrip("\n\r")
+    if not pattern.strip() or pattern.startswith("#"):
+        return None
+    if not pattern.endswith("\\ "):
+        pattern = pattern.rstrip()
+    negated = pattern.startswith("!")
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+        pattern = pattern[1:]
+
+    # Legacy `ignore_files` entries such as ".lock" are file suffixes
+    if pattern.startswith(".") and "/" not in pattern and not _GLOB_CHARS & set(pattern):
+        pattern = "*" + pattern
+
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    if not pattern:
+        return None
+
+    prefix = "" if anchored else "(?:.*/)?"
+    suffix = "/.*" if dir_only else "(?:/.*)?"
+    return negated, prefix + _translate_glob(pattern) + suffix
+
+
+def _legacy_suffix(pattern: str) -> str:
+    """
+    `ignore_files` entries used to be file name suffixes (`lock.json` matched
+    `package-lock.json`). Entries without a `/`, wildcards or negation keep
+    that meaning; anything else is a gitignore pattern.
+    """
+    plain = pattern.strip()
+    if plain and "/" not in plain and not _GLOB_CHARS & set(plain) and plain[0] not in "!#\\":
+        return "*" + plain
+    return pattern
+
+
+class PathRules:
+    """Compiled ignore and focus rules for one review."""
+
+    def __init__(self, ignore_patterns: Optional[List[str]] = None, focus_patterns: Optional[List[str]] = None):
+        """
+        `ignore_patterns` are in precedence order: as in gitignore, the last
+        matching pattern decides.
+        """
+        self.ignore_patterns = list(ignore_patterns or [])
+        self.focus_patterns = list(focus_patterns or [])
+        self._ignore_runs = self._compile_ignore(self.ignore_patterns)
+        self._focus = self._compile_focus(self.focus_patterns)
+
+    @classmethod
+    def from_settings(cls, settings: Settings, ignore_file: Optional[str] = None) -> "PathRules":
+        """Rules from the settings, followed by the contents of a root `.branchwiseignore`."""
+        patterns = [_legacy_suffix(pattern) for pattern in settings.rules.ignore_files]
+        if ignore_file:
+            patterns.extend(ignore_file.splitlines())
+        return cls(patterns, settings.rules.focus_files)
+
+    @staticmethod
+    def _compile_ignore(patterns: List[str]) -> List[Tuple[bool, "re.Pattern[str]"]]:
+        # Consecutive patterns of the same polarity share one alternation,
+        # so the common case without negations is a single regex.
+        runs: List[Tuple[bool, List[str]]] = []
+        for pattern in patterns:
+            compiled = compile_pattern(pattern)
+            if compiled is None:
+                continue
+            negated, regex = compiled
+            if runs and runs[-1][0] == negated:
+                runs[-1][1].append(regex)
+            else:
+                runs.append((negated, [regex]))
+        return [(negated, re.compile("|".join(f"(?:{r})" for r in regexes))) for negated, regexes in runs]
+
+    @staticmethod
+    def _compile_focus(patterns: List[str]) -> Optional["re.Pattern[str]"]:
+        # One capturing group per pattern; `lastindex` names the first pattern that matched
+        groups = []
+        for pattern in patterns:
+            compiled = compile_pattern(pattern)
+            groups.append(f"({compiled[1]})" if compiled and not compiled[0] else "($.^)")
+        return re.compile("|".join(groups)) if groups else None
+
+    def is_ignored(self, path: str) -> bool:
+        for negated, regex in reversed(self._ignore_runs):
+            if regex.fullmatch(path):
+                return not negated
+        return False
+
+    def priority(self, path: str) -> int:
+        """Index of the first focus pattern matching the path; unfocused files sort last."""
+        if self._focus is None:
+            return 0
+        match = self._focus.fullmatch(path)
+        return match.lastindex - 1 if match else len(self.focus_patterns)
+
+
+def load_path_rules(settings: Settings, client: "VCSClient", repo_name: str, ref: Optional[str]) -> PathRules:
+    """
+    Rules from the settings plus the repository's root `.branchwiseignore`
+    at `ref`. A missing or unreadable file is not an error.
+
+    `ref` should be the PR's base (`PullRequestDetails.base_ref`), never its
+    head: a PR must not be able to exclude its own files from review.
+    Without a ref the file is not read.
+    """
+    content = None
+    if settings.rules.ignore_file and ref:
+        try:
+            content = client.get_file_content(repo_name, IGNORE_FILE_NAME, ref)
+        except Exception as e:
+            logger.warning(f"Could not read {IGNORE_FILE_NAME}: {e}")
+    return PathRules.from_settings(settings, content)
+
+
+async def load_path_rules_async(settings: Settings, client: "AsyncVCSClient", repo_name: str, ref: Optional[str]) -> PathRules:
+    """Async counterpart of `load_path_rules`."""
+    content = None
+    if settings.rules.ignore_file and ref:
+        try:
+            content = await client.get_file_content(repo_name, IGNORE_FILE_NAME, ref)
+        except Exception as e:
+            logger.warning(f"Could not read {IGNORE_FILE_NAME}: {e}")
+    return PathRules.from_settings(settings, content)
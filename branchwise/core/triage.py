@@ -0,0 +1,149 @@
+"""
+Cheap local triage run before any diff is sent to the LLM.
+
+Each `TriageRule` looks at a file and its parsed hunks and may give a reason
+to skip the file. Whitespace-only hunks of files that are still reviewed
+are dropped from what the LLM sees.
+"""
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from branchwise.config import Settings
+from branchwise.integrations.base import PullRequestFile
+from branchwise.utils.diff_parser import Hunk
+
+LOCKFILE_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+    "poetry.lock", "Pipfile.lock", "uv.lock", "pdm.lock", "Cargo.lock", "go.sum",
+    "Gemfile.lock", "composer.lock", "mix.lock", "pubspec.lock", "packages.lock.json",
+}
+GENERATED_SUFFIXES = ("_pb2.py", "_pb2_grpc.py", ".pb.go", ".pb.cc", ".pb.h", ".g.dart", ".designer.cs")
+MINIFIED_SUFFIXES = (".min.js", ".min.css", ".js.map", ".css.map")
+GENERATED_MARKER_RE = re.compile(
+    r"@generated|do not edit|auto-?generated|automatically generated|(?:code|file) (?:is |was )?generated by",
+    re.IGNORECASE,
+)
+HEADER_LINES = 10  # Generated-file markers are only looked for this close to the top of a file
+# Languages where re-indenting code changes what it does
+INDENT_SENSITIVE_SUFFIXES = (".py", ".pyi", ".yaml", ".yml", ".coffee", ".haml", ".pug", ".sass", ".nim", ".fs")
+INDENT_SENSITIVE_NAMES = {"Makefile", "GNUmakefile"}
+
+
+def _basename(filename: str) -> str:
+    return filename.rsplit("/", 1)[-1]
+
+
+def _changed_texts(hunk: Hunk, prefix: str) -> List[str]:
+    return [text[1:] for text in hunk.texts if text.startswith(prefix)]
+
+
+def _indent_sensitive(filename: str) -> bool:
+    name = _basename(filename)
+    return name in INDENT_SENSITIVE_NAMES or name.endswith(INDENT_SENSITIVE_SUFFIXES)
+
+
+def _normalize(texts: List[str], keep_indent: bool) -> List[str]:
+    if keep_indent:
+        return [text.rstrip() for text in texts if text.strip()]
+    # Runs of whitespace, including line breaks, compare equal; removing a separator does not
+    return " ".join(texts).split()
+
+
+def is_whitespace_only(hunk: Hunk, filename: str = "") -> bool:
+    """
+    True when the hunk only changes whitespace: blank lines, trailing spaces,
+    and (except in indentation-sensitive languages) indentation and line wrapping.
+    """
+    keep_indent = _indent_sensitive(filename)
+    return _normalize(_changed_texts(hunk, "-"), keep_indent) == _normalize(_changed_texts(hunk, "+"), keep_indent)
+
+
+class TriageRule(ABC):
+    """A local heuristic that can rule a file out of LLM review."""
+
+    @abstractmethod
+    def check(self, file: PullRequestFile, hunks: List[Hunk]) -> Optional[str]:
+        """Return why the file should be skipped, or None to review it."""
+        pass
+
+
+class PureRenameRule(TriageRule):
+    def check(self, file: PullRequestFile, hunks: List[Hunk]) -> Optional[str]:
+        if file.status in ("renamed", "copied") and not hunks:
+            return f"{file.status} without changes"
+        return None
+
+
+class GeneratedFileRule(TriageRule):
+    """Lockfiles, well-known generated file names and files with a generated-code header."""
+
+    def check(self, file: PullRequestFile, hunks: List[Hunk]) -> Optional[str]:
+        name = _basename(file.filename)
+        if name in LOCKFILE_NAMES:
+            return "lockfile"
+        if name.endswith(GENERATED_SUFFIXES):
+            return "generated file"
+        for hunk in hunks:
+            if hunk.new_line_start > HEADER_LINES:
+                break
+            for text, number in hunk.iter_lines():
+                if number and number <= HEADER_LINES and not text.startswith("-") and GENERATED_MARKER_RE.search(text):
+                    return "generated file"
+        return None
+
+
+class MinifiedFileRule(TriageRule):
+    """Files whose added code is mostly in very long lines, as in minified bundles."""
+
+    def __init__(self, max_line_length: int = 400):
+        self.max_line_length = max_line_length
+
+    def check(self, file: PullRequestFile, hunks: List[Hunk]) -> Optional[str]:
+        if _basename(file.filename).endswith(MINIFIED_SUFFIXES):
+            return "minified file"
+        total = long = 0
+        for hunk in hunks:
+            for text in _changed_texts(hunk, "+"):
+                total += len(text)
+                if len(text) > self.max_line_length:
+                    long += len(text)
+        if total and long * 2 > total:
+            return "minified file"
+        return None
+
+
+class WhitespaceOnlyRule(TriageRule):
+    def check(self, file: PullRequestFile, hunks: List[Hunk]) -> Optional[str]:
+        if hunks and all(is_whitespace_only(hunk, file.filename) for hunk in hunks):
+            return "whitespace-only changes"
+        return None
+
+
+class Triage:
+    """Runs triage rules in order; the first rule giving a reason decides."""
+
+    def __init__(self, rules: List[TriageRule], skip_whitespace_hunks: bool = True):
+        self.rules = rules
+        self.skip_whitespace_hunks = skip_whitespace_hunks
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "Triage":
+        if not settings.rules.triage:
+            return cls([], skip_whitespace_hunks=False)
+        return cls([
+            PureRenameRule(),
+            GeneratedFileRule(),
+            MinifiedFileRule(settings.rules.max_line_length),
+            WhitespaceOnlyRule(),
+        ])
+
+    def classify(self, file: PullRequestFile, hunks: List[Hunk]) -> Optional[str]:
+        for rule in self.rules:
+            reason = rule.check(file, hunks)
+            if reason:
+                return reason
+        return None
+
+    def skip_hunk(self, file: PullRequestFile, hunk: Hunk) -> bool:
+        return self.skip_whitespace_hunks and is_whitespace_only(hunk, file.filename)
@@ -1,14 +1,64 @@
+import asyncio
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Generic, Hashable, Iterator, List, Optional, Tuple, TypeVar
 
 from pydantic import BaseModel
 
+from branchwise.llm.client import ReviewComment
+
+if TYPE_CHECKING:
+    # Loads `requests`, which only the clients that use it should pay for
+    from branchwise.integrations.rate_limit import HostQuota
+
+T = TypeVar("T")
+
+
+class HandleCache(Generic[T]):
+    """
+    Bounded, thread-safe map of SDK handles (repositories, pull requests,
+    commits) that a long-lived client shares between reviews. The least
+    recently used handles are dropped first.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, T]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable, load: Callable[[], T], refresh: bool = False) -> T:
+        """The cached handle, or a freshly loaded one when missing or `refresh` is set."""
+        with self._lock:
+            if not refresh and key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = load()
+        self.put(key, value)
+        return value
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def put(self, key: Hashable, value: T):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
 
 class PullRequestFile(BaseModel):
     filename: str
     status: str
     patch: Optional[str] = None
     blob_url: str
+    previous_filename: Optional[str] = None  # Set for renamed and copied files
+    blob_sha: Optional[str] = None  # Git blob id of the new version, when the provider reports it
 
 class PullRequestDetails(BaseModel):
     number: int
@@ -17,9 +67,12 @@ class PullRequestDetails(BaseModel):
     author: str
     head_sha: str
     files: List[PullRequestFile]
+    base_ref: Optional[str] = None  # Branch or commit the PR merges into; repository settings are read there
 
 class VCSClient(ABC):
     """Abstract base class for Version Control System clients."""
+
+    host: str = ""  # Host the client talks to; namespaces data cached per repository
     
     @abstractmethod
     def get_pr_details(self, repo_name: str, pr_number: int) -> PullRequestDetails:
@@ -30,3 +83,106 @@ class VCSClient(ABC):
     def post_comment(self, repo_name: str, pr_number: int, body: str):
         """Post a general comment on the PR."""
         pass
+
+    def quota(self) -> Optional["HostQuota"]:
+        """Remaining API quota for this client's host, if the provider reports one."""
+        return None
+
+    def get_file_content(self, repo_name: str, path: str, ref: str) -> Optional[str]:
+        """Text of a file at a commit, or None if it does not exist or the provider cannot fetch it."""
+        return None
+
+    def get_file_bytes(self, repo_name: str, path: str, ref: str) -> Optional[bytes]:
+        """
+        Raw content of a file at a commit, as stored in git. Providers that
+        only return text fall back to its UTF-8 encoding.
+        """
+        content = self.get_file_content(repo_name, path, ref)
+        return content.encode("utf-8") if content is not None else None
+
+    def post_review(self, repo_name: str, pr_number: int, body: str, comments: List[ReviewComment], commit_id: str):
+        """
+        Post the summary and all findings in as few API calls as possible.
+        Providers without a batched review endpoint get a single comment
+        listing every finding.
+        """
+        self.post_comment(repo_name, pr_number, body + format_findings(comments))
+
+
+class StreamingVCSClient(VCSClient):
+    """
+    A client that hands out a pull request's files while later pages are
+    still being downloaded, so analysis of the first files can start early.
+    """
+
+    @abstractmethod
+    def stream_pr_details(self, repo_name: str, pr_number: int) -> Tuple[PullRequestDetails, Iterator[PullRequestFile]]:
+        """Details with an empty file list, and an iterator that fetches the files as it is consumed."""
+        pass
+
+    def get_pr_details(self, repo_name: str, pr_number: int) -> PullRequestDetails:
+        details, files = self.stream_pr_details(repo_name, pr_number)
+        details.files.extend(files)
+        return details
+
+
+def format_findings(comments: List[ReviewComment]) -> str:
+    """Render findings as a markdown list to append to a summary comment."""
+    if not comments:
+        return ""
+    lines = ["", "", "#### Findings"]
+    for comment in comments:
+        lines.append(
+            f"- `{comment.file_path}:{comment.line_number}` "
+            f"({comment.type}, {comment.severity}): {comment.content}"
+        )
+    return "\n".join(lines)
+
+
+def format_inline_comment(comment: ReviewComment) -> str:
+    """Body of an inline comment anchored on the commented line."""
+    return f"**{comment.severity.capitalize()} {comment.type}**: {comment.content}"
+
+
+class AsyncVCSClient(ABC):
+    """Asyncio variant of `VCSClient` for running many reviews on one event loop."""
+
+    @abstractmethod
+    async def get_pr_details(self, repo_name: str, pr_number: int) -> PullRequestDetails:
+        """Fetch details of a pull request."""
+        pass
+
+    @abstractmethod
+    async def post_comment(self, repo_name: str, pr_number: int, body: str):
+        """Post a general comment on the PR."""
+        pass
+
+    async def post_review(self, repo_name: str, pr_number: int, body: str, comments: List[ReviewComment], commit_id: str):
+        """Post the summary and all findings in as few API calls as possible."""
+        await self.post_comment(repo_name, pr_number, body + format_findings(comments))
+
+    async def get_file_content(self, repo_name: str, path: str, ref: str) -> Optional[str]:
+        """Text of a file at a commit, or None if it does not exist or the provider cannot fetch it."""
+        return None
+
+
+class ThreadedVCSClient(AsyncVCSClient):
+    """
+    Exposes a blocking `VCSClient` through the async interface.
+    The provider SDKs are synchronous, so each call runs in the default executor.
+    """
+
+    def __init__(self, client: VCSClient):
+        self.client = client
+
+    async def get_pr_details(self, repo_name: str, pr_number: int) -> PullRequestDetails:
+        return await asyncio.to_thread(self.client.get_pr_details, repo_name, pr_number)
+
+    async def post_comment(self, repo_name: str, pr_number: int, body: str):
+        return await asyncio.to_thread(self.client.post_comment, repo_name, pr_number, body)
+
+    async def post_review(self, repo_name: str, pr_number: int, body: str, comments: List[ReviewComment], commit_id: str):
+        return await asyncio.to_thread(self.client.post_review, repo_name, pr_number, body, comments, commit_id)
+
+    async def get_file_content(self, repo_name: str, path: str, ref: str) -> Optional[str]:
+        return await asyncio.to_thread(self.client.get_file_content, repo_name, path, ref)
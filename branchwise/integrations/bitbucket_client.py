@@ -1,9 +1,15 @@
 import logging
+from typing import Optional
+from urllib.parse import urlparse
+
 from atlassian import Bitbucket
-from typing import List
+from requests import HTTPError
 
 from branchwise.config import Settings
-from branchwise.integrations.base import PullRequestDetails, PullRequestFile, VCSClient
+from branchwise.integrations.base import PullRequestDetails, VCSClient
+from branchwise.integrations.http import get_session
+from branchwise.integrations.rate_limit import HostQuota, get_scheduler
+from branchwise.utils.diff_parser import DiffParser
 
 logger = logging.getLogger(__name__)
 
@@ -16,48 +22,62 @@ class BitbucketClient(VCSClient):
         
         # Atlassian python api handles authentication via token or basicauth.
         # Assuming token is a personal access token.
-        self.client = Bitbucket(url=url, token=token)
+        self.url = url.rstrip("/")
+        self.client = Bitbucket(url=url, token=token, session=get_session(url, settings))
+        self.host = urlparse(url).netloc
+
+    def quota(self) -> Optional[HostQuota]:
+        return get_scheduler().quota(self.host)
 
     def get_pr_details(self, repo_name: str, pr_number: int) -> PullRequestDetails:
         """Fetch details of a PR. Repo name format: PROJECT/REPO"""
         try:
             project_key, repo_slug = repo_name.split("/")
             pr = self.client.get_pull_request(project_key, repo_slug, pr_number)
-            diff = self.client.get_pull_request_diff(project_key, repo_slug, pr_number)
-            
-            # Bitbucket diff output is raw diff, need to parse.
-            # However, `atlassian-python-api` might return dict for some calls.
-            # `get_pull_request_diff` returns the raw diff string usually.
-            
-            # Simple simulation as diff parsing logic is complex
-            # We would need to implement robust diff parsing for Bitbucket as it doesn't give clean file objects like GitHub/GitLab APIs sometimes do directly.
-            # For this MVP, we will rely on our DiffParser if we get a raw diff.
-            
-            # Actually, `atlassian-python-api` might not make it easy to list files with their individual diffs without parsing the global diff.
-            # We will assume `get_pull_request_diff` returns the full diff and we use DiffParser later.
-            # But `PullRequestDetails` expects list of files.
-            
-            # Let's inspect changes
-            changes = self.client.get_pull_request_changes(project_key, repo_slug, pr_number)
-            
-            files = []
-            for change in changes:
-                # This depends on API response structure
-                pass
+            head_sha = pr['fromRef']['latestCommit']
+
+            # Bitbucket has no per-file patch listing, so download the whole
+            # raw diff once and split it into files locally.
+            response = self.client.get(
+                f"rest/api/1.0/projects/{project_key}/repos/{repo_slug}/pull-requests/{pr_number}.diff",
+                advanced_mode=True,
+            )
+            response.raise_for_status()
+            browse_url = f"{self.url}/projects/{project_key}/repos/{repo_slug}/browse"
+            # Split on newlines only: str.splitlines would also break lines at form feeds and other separators
+            lines = (line.decode("utf-8", errors="replace") for line in response.iter_lines(delimiter=b"\n"))
+            files = list(DiffParser.iter_files(
+                lines,
+                blob_url=lambda path: f"{browse_url}/{path}?at={head_sha}",
+            ))
 
-            # Placeholder for complex bitbucket implementation
             return PullRequestDetails(
                 number=pr['id'],
                 title=pr['title'],
                 description=pr.get('description', ""),
                 author=pr['author']['user']['name'],
-                head_sha=pr['fromRef']['latestCommit'],
-                files=files
+                head_sha=head_sha,
+                files=files,
+                base_ref=pr['toRef']['latestCommit'],
             )
         except Exception as e:
             logger.error(f"Error fetching Bitbucket PR details: {e}")
             raise
 
+    def get_file_content(self, repo_name: str, path: str, ref: str) -> Optional[str]:
+        data = self.get_file_bytes(repo_name, path, ref)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+
+    def get_file_bytes(self, repo_name: str, path: str, ref: str) -> Optional[bytes]:
+        project_key, repo_slug = repo_name.split("/")
+        try:
+            content = self.client.get_content_of_file(project_key, repo_slug, path, at=ref)
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+        return content.encode("utf-8") if isinstance(content, str) else content
+
     def post_comment(self, repo_name: str, pr_number: int, body: str):
         """Post a general comment on the PR."""
         try:
@@ -0,0 +1,130 @@
+"""
+Pull request URL parsing and VCS client construction.
+"""
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+
+from branchwise.config import Settings
+from branchwise.integrations.base import VCSClient
+
+
+class PullRequestRef(BaseModel):
+    """A pull request identified from its URL."""
+    url: str
+    provider: str  # "github", "gitlab", "bitbucket" or "local"
+    host: str
+    repo_name: str
+    pr_number: int
+    rev_range: Optional[str] = None  # Commit range of a local review
+
+
+def detect_provider(pr_url: str, settings: Settings) -> str:
+    """Work out which provider hosts `pr_url`; raises ValueError if none does."""
+    if "github.com" in pr_url:
+        return "github"
+    if "gitlab.com" in pr_url or (settings.gitlab.url and settings.gitlab.url in pr_url):
+        return "gitlab"
+    if "bitbucket.org" in pr_url:
+        return "bitbucket"
+    raise ValueError("Unsupported URL. Only GitHub, GitLab, and Bitbucket are supported.")
+
+
+def parse_pr_url(pr_url: str, settings: Settings) -> PullRequestRef:
+    """Parse a pull request URL; raises ValueError if it is not one."""
+    provider = detect_provider(pr_url, settings)
+    url = pr_url.strip().rstrip("/")
+    parts = url.split("/")
+    try:
+        if provider == "gitlab":
+            # https://gitlab.com/group/subgroup/project/-/merge_requests/123
+            if "/-/merge_requests/" not in url:
+                raise ValueError("URL does not look like a merge request URL")
+            path_only = url.split("://")[-1].split("/", 1)[1]
+            repo_name, mr_part = path_only.split("/-/merge_requests/")
+            pr_number = int(mr_part.split("/")[0])
+        else:
+            # https://github.com/owner/repo/pull/123
+            # https://bitbucket.org/owner/repo/pull-requests/123
+            pr_number = int(parts[-1])
+            repo_name = f"{parts[-4]}/{parts[-3]}"
+    except (IndexError, ValueError) as e:
+        raise ValueError(f"Invalid PR URL format: {pr_url} ({e})") from e
+
+    return PullRequestRef(
+        url=url,
+        provider=provider,
+        host=urlparse(url).netloc,
+        repo_name=repo_name,
+        pr_number=pr_number,
+    )
+
+
+def is_local_target(target: str) -> bool:
+    """True for a local repository path or a commit range, rather than a PR URL."""
+    return "://" not in target and (os.path.isdir(target) or ".." in target)
+
+
+def parse_local_ref(target: str, rev_range: Optional[str] = None) -> PullRequestRef:
+    """
+    Reference to a local review: `target` is a repository path, or a commit
+    range in the current directory. The range defaults to the commits not
+    yet pushed to the upstream branch.
+    """
+    from branchwise.integrations.local_git import DEFAULT_RANGE
+
+    if not os.path.isdir(target):
+        target, rev_range = ".", rev_range or target
+    path = os.path.abspath(target)
+    rev_range = rev_range or DEFAULT_RANGE
+    return PullRequestRef(
+        url=f"file://{path}#{rev_range}",
+        provider="local",
+        host="local",
+        repo_name=path,
+        pr_number=0,
+        rev_range=rev_range,
+    )
+
+
+def create_client(provider: str, settings: Settings, rev_range: Optional[str] = None) -> VCSClient:
+    """
+    Build the client for `provider`. Provider SDKs are only imported when needed.
+    `rev_range` is the commit range reviewed by a local client.
+    """
+    if provider == "github":
+        from branchwise.integrations.github import GitHubClient
+        return GitHubClient(settings)
+    if provider == "gitlab":
+        from branchwise.integrations.gitlab_client import GitLabClient
+        return GitLabClient(settings)
+    if provider == "bitbucket":
+        from branchwise.integrations.bitbucket_client import BitbucketClient
+        return BitbucketClient(settings)
+    if provider == "local":
+        from branchwise.integrations.local_git import DEFAULT_RANGE, LocalGitClient
+        return LocalGitClient(rev_range or DEFAULT_RANGE)
+    raise ValueError(f"Unknown provider: {provider}")
+
+
+class ClientPool:
+    """
+    Creates one VCS client per provider and host, and shares it between
+    reviews. Local clients are bound to a commit range, so each range gets its own.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._clients: Dict[Tuple[str, str, Optional[str]], VCSClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self, ref: PullRequestRef) -> VCSClient:
+        key = (ref.provider, ref.host, ref.rev_range)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = create_client(ref.provider, self.settings, ref.rev_range)
+            return client
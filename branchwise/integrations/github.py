@@ -1,34 +1,209 @@
 import logging
-from typing import List
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, TypeVar
 
-from github import Github, GithubException, Auth
+from github import Github, GithubException, Auth, RateLimitExceededException, UnknownObjectException
+from github.Commit import Commit
+from github.PullRequest import PullRequest
+from github.Repository import Repository
 
 from branchwise.config import Settings
-from branchwise.integrations.base import PullRequestDetails, PullRequestFile, VCSClient
+from branchwise.llm.client import ReviewComment
+from branchwise.integrations.base import (
+    HandleCache,
+    PullRequestDetails,
+    PullRequestFile,
+    VCSClient,
+    format_findings,
+    format_inline_comment,
+)
+from branchwise.integrations.http import POOL_SIZE, get_session
+from branchwise.integrations.rate_limit import HostQuota, RateLimitExceeded, get_scheduler
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+API_HOST = "api.github.com"
+API_URL = f"https://{API_HOST}"
+REQUEST_TIMEOUT = 30  # Seconds per GraphQL or REST request made outside PyGithub
+FILES_PER_PAGE = 100  # The most the pull request files endpoint returns per page
+MAX_LISTED_FILES = 3000  # GitHub lists no more files than this for a pull request
+MAX_PAGE_WORKERS = 8
+
+PULL_REQUEST_QUERY = """
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      number
+      title
+      body
+      headRefOid
+      baseRefName
+      changedFiles
+      author { login }
+    }
+  }
+}
+"""
+
+
 class GitHubClient(VCSClient):
+    host = API_HOST
+
     def __init__(self, settings: Settings):
         token = settings.github.token.get_secret_value() if settings.github.token else None
         auth = Auth.Token(token) if token else None
         if not auth:
             logger.warning("GitHub token not provided. GitHub integration will be limited.")
-        self.client = Github(auth=auth)
+        # PyGithub keeps one persistent, pooled connection per client
+        self.client = Github(auth=auth, pool_size=POOL_SIZE)
+        self.scheduler = get_scheduler(settings)
+        self.token = token
+        self.use_graphql = settings.github.graphql
+        # Used for GraphQL and parallel file pages; paced by the same scheduler
+        self.session = get_session(API_URL, settings)
+
+        # Handles reused by the post phase of a review. A PR is fetched again
+        # at the start of every review, so posting never sees an old head.
+        self._repos: HandleCache[Repository] = HandleCache()
+        self._pulls: HandleCache[PullRequest] = HandleCache()
+        self._commits: HandleCache[Commit] = HandleCache()
+
+    def quota(self) -> Optional[HostQuota]:
+        return self.scheduler.quota(API_HOST)
+
+    def _call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run a PyGithub call under the shared rate-limit scheduler.
+        PyGithub does not take an external session, so pacing happens here.
+        """
+        def attempt() -> T:
+            try:
+                return fn(*args, **kwargs)
+            except RateLimitExceededException as e:
+                raise RateLimitExceeded(str(e), e.headers) from e
+            finally:
+                self._record_quota()
+
+        return self.scheduler.call(API_HOST, attempt)
+
+    def _record_quota(self):
+        rate_limiting = getattr(self.client.requester, "rate_limiting", None)
+        # PyGithub reports (-1, -1) until the first response has been read
+        if not isinstance(rate_limiting, tuple) or rate_limiting[0] < 0:
+            return
+        remaining, limit = rate_limiting
+        self.scheduler.update(API_HOST, {
+            "x-ratelimit-remaining": str(remaining),
+            "x-ratelimit-limit": str(limit),
+            "x-ratelimit-reset": str(self.client.requester.rate_limiting_resettime),
+        })
+
+    def _get_repo(self, repo_name: str) -> Repository:
+        return self._repos.get(repo_name, lambda: self._call(self.client.get_repo, repo_name))
+
+    def _get_pull(self, repo_name: str, pr_number: int, refresh: bool = False) -> PullRequest:
+        return self._pulls.get(
+            (repo_name, pr_number),
+            lambda: self._call(self._get_repo(repo_name).get_pull, pr_number),
+            refresh=refresh,
+        )
+
+    def _get_commit(self, repo_name: str, sha: str) -> Commit:
+        return self._commits.get((repo_name, sha), lambda: self._call(self._get_repo(repo_name).get_commit, sha))
 
     def get_pr_details(self, repo_name: str, pr_number: int) -> PullRequestDetails:
-        """Fetch details of a pull request."""
+        """
+        Fetch details of a pull request: metadata in one GraphQL query, then
+        all file pages in parallel. Falls back to REST through PyGithub
+        without a token, when GraphQL is disabled, or if the fast path fails.
+        """
+        # A handle from an earlier review may carry an old head
+        self._pulls.discard((repo_name, pr_number))
+        if self.token and self.use_graphql:
+            try:
+                return self._get_pr_details_graphql(repo_name, pr_number)
+            except Exception as e:
+                logger.warning(f"GraphQL fetch of {repo_name}#{pr_number} failed ({e}); falling back to REST")
+        return self._get_pr_details_rest(repo_name, pr_number)
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}", "Accept": "application/vnd.github+json"}
+
+    def _get_pr_details_graphql(self, repo_name: str, pr_number: int) -> PullRequestDetails:
+        owner, name = repo_name.split("/", 1)
+        response = self.session.post(
+            f"{API_URL}/graphql",
+            json={"query": PULL_REQUEST_QUERY, "variables": {"owner": owner, "name": name, "number": pr_number}},
+            headers=self._headers(),
+            timeout=REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("errors"):
+            raise ValueError(payload["errors"][0].get("message", "GraphQL error"))
+        pr = ((payload.get("data") or {}).get("repository") or {}).get("pullRequest")
+        if pr is None:
+            raise ValueError(f"Pull request {repo_name}#{pr_number} not found")
+
+        listed = min(pr["changedFiles"], MAX_LISTED_FILES)
+        if pr["changedFiles"] > MAX_LISTED_FILES:
+            logger.warning(f"{repo_name}#{pr_number} changes {pr['changedFiles']} files; GitHub lists only {MAX_LISTED_FILES}")
+        pages = max(1, math.ceil(listed / FILES_PER_PAGE))
+        fetch_page = partial(self._get_files_page, repo_name, pr_number)
+        if pages == 1:
+            results = [fetch_page(1)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(pages, MAX_PAGE_WORKERS), thread_name_prefix="branchwise-github") as executor:
+                results = list(executor.map(fetch_page, range(1, pages + 1)))
+
+        return PullRequestDetails(
+            number=pr["number"],
+            title=pr["title"],
+            description=pr["body"] or "",
+            author=(pr.get("author") or {}).get("login", "ghost"),
+            head_sha=pr["headRefOid"],
+            files=[file for page in results for file in page],
+            base_ref=pr["baseRefName"],
+        )
+
+    def _get_files_page(self, repo_name: str, pr_number: int, page: int) -> List[PullRequestFile]:
+        response = self.session.get(
+            f"{API_URL}/repos/{repo_name}/pulls/{pr_number}/files",
+            params={"per_page": FILES_PER_PAGE, "page": page},
+            headers=self._headers(),
+            timeout=REQUEST_TIMEOUT,
+        )
+        response.raise_for_status()
+        return [
+            PullRequestFile(
+                filename=item["filename"],
+                status=item["status"],
+                patch=item.get("patch"),
+                blob_url=item.get("blob_url") or "",
+                previous_filename=item.get("previous_filename") if item["status"] in ("renamed", "copied") else None,
+                blob_sha=item.get("sha"),
+            )
+            for item in response.json()
+        ]
+
+    def _get_pr_details_rest(self, repo_name: str, pr_number: int) -> PullRequestDetails:
+        """Fetch a pull request through PyGithub, paging through its files one request at a time."""
         try:
-            repo = self.client.get_repo(repo_name)
-            pr = repo.get_pull(pr_number)
+            pr = self._get_pull(repo_name, pr_number)
             
             files = []
-            for file in pr.get_files():
+            for file in self._call(lambda: list(pr.get_files())):
                 files.append(PullRequestFile(
                     filename=file.filename,
                     status=file.status,
                     patch=file.patch,
-                    blob_url=file.blob_url
+                    blob_url=file.blob_url,
+                    previous_filename=file.previous_filename if file.status in ("renamed", "copied") else None,
+                    blob_sha=file.sha,
                 ))
             
             return PullRequestDetails(
@@ -37,18 +212,31 @@ class GitHubClient(VCSClient):
                 description=pr.body or "",
                 author=pr.user.login,
                 head_sha=pr.head.sha,
-                files=files
+                files=files,
+                base_ref=pr.base.ref,
             )
         except GithubException as e:
             logger.error(f"Error fetching PR details: {e}")
             raise
 
+    def get_file_content(self, repo_name: str, path: str, ref: str) -> Optional[str]:
+        data = self.get_file_bytes(repo_name, path, ref)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+
+    def get_file_bytes(self, repo_name: str, path: str, ref: str) -> Optional[bytes]:
+        try:
+            content = self._call(self._get_repo(repo_name).get_contents, path, ref=ref)
+        except UnknownObjectException:
+            return None
+        if isinstance(content, list):  # A directory
+            return None
+        return content.decoded_content
+
     def post_comment(self, repo_name: str, pr_number: int, body: str):
         """Post a general comment on the PR."""
         try:
-            repo = self.client.get_repo(repo_name)
-            pr = repo.get_pull(pr_number)
-            pr.create_issue_comment(body)
+            pr = self._get_pull(repo_name, pr_number)
+            self._call(pr.create_issue_comment, body)
         except GithubException as e:
             logger.error(f"Error posting comment: {e}")
             raise
@@ -57,11 +245,37 @@ class GitHubClient(VCSClient):
         """Post a specific review comment on a line of code."""
         # Note: GitHub API requires the commit_id to be the latest commit of the PR for the comment to be valid.
         try:
-            repo = self.client.get_repo(repo_name)
-            pr = repo.get_pull(pr_number)
+            pr = self._get_pull(repo_name, pr_number)
             # We need to find the correct commit object
-            commit = repo.get_commit(commit_id)
-            pr.create_review_comment(body, commit, path, line)
+            commit = self._get_commit(repo_name, commit_id)
+            self._call(pr.create_review_comment, body, commit, path, line)
         except GithubException as e:
             logger.error(f"Error posting review comment: {e}")
             raise
+
+    def post_review(self, repo_name: str, pr_number: int, body: str, comments: List[ReviewComment], commit_id: str):
+        """Submit the summary and every inline comment as a single pull request review."""
+        review_comments = [
+            {
+                "path": comment.file_path,
+                "line": comment.line_number,
+                "side": "RIGHT",
+                "body": format_inline_comment(comment),
+            }
+            for comment in comments
+        ]
+        try:
+            pr = self._get_pull(repo_name, pr_number)
+            commit = self._get_commit(repo_name, commit_id)
+            self._call(pr.create_review, commit=commit, body=body, event="COMMENT", comments=review_comments)
+        except GithubException as e:
+            if e.status != 422:
+                logger.error(f"Error posting review: {e}")
+                raise
+            # GitHub rejects the whole review if any line is outside the diff
+            logger.warning(f"Inline comments rejected ({e.data}); posting findings in the review body")
+            try:
+                self._call(pr.create_review, commit=commit, body=body + format_findings(comments), event="COMMENT")
+            except GithubException as e:
+                logger.error(f"Error posting review: {e}")
+                raise
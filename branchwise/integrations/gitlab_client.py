@@ -1,57 +1,202 @@
 import logging
 import gitlab
-from typing import List
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlparse
 
 from branchwise.config import Settings
-from branchwise.integrations.base import PullRequestDetails, PullRequestFile, VCSClient
+from branchwise.llm.client import ReviewComment
+from branchwise.integrations.base import (
+    HandleCache,
+    PullRequestDetails,
+    PullRequestFile,
+    StreamingVCSClient,
+    format_findings,
+    format_inline_comment,
+)
+from branchwise.integrations.http import get_session
+from branchwise.integrations.rate_limit import HostQuota, get_scheduler
+from branchwise.utils.diff_parser import DiffParser
 
 logger = logging.getLogger(__name__)
 
-class GitLabClient(VCSClient):
+DIFFS_PER_PAGE = 100
+
+class GitLabClient(StreamingVCSClient):
     def __init__(self, settings: Settings):
         token = settings.gitlab.token.get_secret_value() if settings.gitlab.token else None
         url = settings.gitlab.url
         if not token:
             logger.warning("GitLab token not provided. GitLab integration will be limited.")
         
-        self.client = gitlab.Gitlab(url=url, private_token=token)
+        self.client = gitlab.Gitlab(url=url, private_token=token, session=get_session(url, settings))
+
+        # Handles reused by the post phase of a review. A merge request is fetched
+        # again at the start of every review, so its head and diff_refs are current.
+        self._projects: HandleCache[object] = HandleCache()
+        self._merge_requests: HandleCache[object] = HandleCache()
+        self.host = urlparse(url).netloc
+
+    def quota(self) -> Optional[HostQuota]:
+        return get_scheduler().quota(self.host)
 
-    def get_pr_details(self, repo_name: str, pr_number: int) -> PullRequestDetails:
-        """Fetch details of a merge request."""
+    def _get_project(self, repo_name: str):
+        return self._projects.get(repo_name, lambda: self.client.projects.get(repo_name))
+
+    def _get_merge_request(self, repo_name: str, pr_number: int, refresh: bool = False):
+        return self._merge_requests.get(
+            (repo_name, pr_number),
+            lambda: self._get_project(repo_name).mergerequests.get(pr_number),
+            refresh=refresh,
+        )
+
+    def stream_pr_details(self, repo_name: str, pr_number: int) -> Tuple[PullRequestDetails, Iterator[PullRequestFile]]:
+        """
+        Fetch details of a merge request; its files are read page by page
+        from the merge request diffs API as the iterator is consumed.
+        """
         try:
             # GitLab uses project ID or namespace/project_name
-            project = self.client.projects.get(repo_name)
-            mr = project.mergerequests.get(pr_number)
-            
-            files = []
-            # Fetch changes
-            changes = mr.changes()
-            for change in changes['changes']:
-                files.append(PullRequestFile(
-                    filename=change['new_path'],
-                    status="added" if change['new_file'] else "modified" if not change['deleted_file'] else "removed",
-                    patch=change['diff'],
-                    blob_url=f"{project.web_url}/-/blob/{mr.sha}/{change['new_path']}"
-                ))
-            
-            return PullRequestDetails(
-                number=mr.iid,
-                title=mr.title,
-                description=mr.description or "",
-                author=mr.author['username'],
-                head_sha=mr.sha,
-                files=files
-            )
+            project = self._get_project(repo_name)
+            mr = self._get_merge_request(repo_name, pr_number, refresh=True)
         except Exception as e:
             logger.error(f"Error fetching GitLab MR details: {e}")
             raise
 
+        details = PullRequestDetails(
+            number=mr.iid,
+            title=mr.title,
+            description=mr.description or "",
+            author=mr.author['username'],
+            head_sha=mr.sha,
+            files=[],
+            base_ref=mr.target_branch,
+        )
+        return details, self._iter_files(project, mr)
+
+    def _iter_files(self, project, mr) -> Iterator[PullRequestFile]:
+        """
+        Files in API order. Diffs GitLab leaves out for being too large are
+        filled in from the raw diff once every page has been read.
+        """
+        path = f"/projects/{project.id}/merge_requests/{mr.iid}"
+        overflowed = []
+        for change in self._iter_changes(path, mr):
+            if not change.get('diff') and (change.get('too_large') or change.get('collapsed') or change.get('overflow')):
+                overflowed.append(change)
+                continue
+            yield self._to_file(project, mr, change)
+
+        if overflowed:
+            patches = self._raw_patches(path, {change['new_path'] for change in overflowed})
+            for change in overflowed:
+                file = self._to_file(project, mr, change)
+                file.patch = patches.get(file.filename) or file.patch
+                yield file
+
+    def _iter_changes(self, path: str, mr) -> Iterator[dict]:
+        try:
+            # Pages are requested lazily, one at a time
+            changes = self.client.http_list(f"{path}/diffs", iterator=True, per_page=DIFFS_PER_PAGE)
+        except gitlab.exceptions.GitlabHttpError as e:
+            if e.response_code != 404:
+                raise
+            # Before GitLab 15.7 there is only the single, truncating changes response
+            logger.info("Merge request diffs API not available; loading all changes at once")
+            result = mr.changes()
+            for change in result['changes']:
+                yield {**change, 'overflow': bool(result.get('overflow'))}
+            return
+        yield from changes
+
+    def _raw_patches(self, path: str, filenames: Set[str]) -> Dict[str, Optional[str]]:
+        """Patches of the given files, cut out of the streamed raw diff of the whole merge request."""
+        try:
+            response = self.client.http_get(f"{path}/raw_diffs", streamed=True, raw=True)
+        except gitlab.exceptions.GitlabError as e:
+            logger.warning(f"Could not fetch the raw diff for {len(filenames)} oversized files: {e}")
+            return {}
+        lines = (line.decode("utf-8", errors="replace") for line in response.iter_lines(delimiter=b"\n"))
+        return {file.filename: file.patch for file in DiffParser.iter_files(lines) if file.filename in filenames}
+
+    @staticmethod
+    def _to_file(project, mr, change: dict) -> PullRequestFile:
+        if change['new_file']:
+            status = "added"
+        elif change['deleted_file']:
+            status = "removed"
+        elif change.get('renamed_file'):
+            status = "renamed"
+        else:
+            status = "modified"
+        return PullRequestFile(
+            filename=change['new_path'],
+            status=status,
+            patch=change['diff'],
+            blob_url=f"{project.web_url}/-/blob/{mr.sha}/{change['new_path']}",
+            previous_filename=change.get('old_path') if status == "renamed" else None,
+        )
+
+    def get_file_content(self, repo_name: str, path: str, ref: str) -> Optional[str]:
+        data = self.get_file_bytes(repo_name, path, ref)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+
+    def get_file_bytes(self, repo_name: str, path: str, ref: str) -> Optional[bytes]:
+        try:
+            return self._get_project(repo_name).files.raw(file_path=path, ref=ref)
+        except gitlab.exceptions.GitlabGetError as e:
+            if e.response_code == 404:
+                return None
+            raise
+
     def post_comment(self, repo_name: str, pr_number: int, body: str):
         """Post a general comment on the MR."""
         try:
-            project = self.client.projects.get(repo_name)
-            mr = project.mergerequests.get(pr_number)
+            mr = self._get_merge_request(repo_name, pr_number)
             mr.notes.create({'body': body})
         except Exception as e:
             logger.error(f"Error posting comment to GitLab: {e}")
             raise
+
+    def post_review(self, repo_name: str, pr_number: int, body: str, comments: List[ReviewComment], commit_id: str):
+        """
+        Stage the findings as draft notes and publish them together with the
+        summary in one bulk publish, so the MR gets a single review event.
+        GitLab has no batch endpoint for drafts: this takes one call per
+        finding plus two. If any call fails, the drafts staged so far are
+        deleted, so a later publish cannot post them a second time.
+        """
+        staged = []
+        try:
+            mr = self._get_merge_request(repo_name, pr_number)
+            diff_refs = mr.diff_refs or {}
+            unplaced = []
+            for comment in comments:
+                position = {
+                    "position_type": "text",
+                    "base_sha": diff_refs.get("base_sha"),
+                    "start_sha": diff_refs.get("start_sha"),
+                    "head_sha": diff_refs.get("head_sha") or commit_id,
+                    "new_path": comment.file_path,
+                    "new_line": comment.line_number,
+                }
+                try:
+                    staged.append(mr.draft_notes.create({"note": format_inline_comment(comment), "position": position}))
+                except gitlab.exceptions.GitlabCreateError as e:
+                    # Lines outside the diff cannot carry a positioned note
+                    logger.debug(f"Could not place comment on {comment.file_path}:{comment.line_number}: {e}")
+                    unplaced.append(comment)
+
+            staged.append(mr.draft_notes.create({"note": body + format_findings(unplaced)}))
+            mr.draft_notes.bulk_publish()
+        except Exception as e:
+            logger.error(f"Error posting review to GitLab: {e}")
+            self._discard_drafts(staged)
+            raise
+
+    @staticmethod
+    def _discard_drafts(drafts):
+        for draft in drafts:
+            try:
+                draft.delete()
+            except Exception as e:
+                logger.warning(f"Could not delete draft note {getattr(draft, 'id', '?')}: {e}")
@@ -0,0 +1,41 @@
+"""
+Process-wide pooled HTTP sessions for the VCS integrations.
+
+Every client talking to the same host shares one `requests.Session`, so the
+fetch and post phases of a review (and consecutive reviews in one process)
+reuse warm keep-alive connections instead of opening new ones.
+"""
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from branchwise.config import Settings
+from branchwise.integrations.rate_limit import RateLimitedAdapter, get_scheduler
+
+# Connections kept alive per host; sized for concurrent analysis and batch reviews
+POOL_SIZE = 32
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def get_session(url: str, settings: Optional[Settings] = None) -> requests.Session:
+    """
+    Return the shared session for the host of `url`, creating it on first use.
+    Requests made through it are paced by the shared rate-limit scheduler.
+    """
+    parsed = urlparse(url)
+    key = f"{parsed.scheme}://{parsed.netloc}"
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = RateLimitedAdapter(
+                get_scheduler(settings), pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[key] = session
+        return session
@@ -0,0 +1,116 @@
+"""
+Reviews of a local checkout, without a hosting API.
+
+`LocalGitClient` builds `PullRequestDetails` from a commit range of a
+local repository. All patches come from a single `git diff`, whose output
+is split into files while git is still writing it.
+"""
+import logging
+import os
+import subprocess
+import tempfile
+from typing import Iterator, Optional, Tuple
+
+from branchwise.integrations.base import PullRequestDetails, PullRequestFile, StreamingVCSClient
+from branchwise.utils.diff_parser import DiffParser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RANGE = "@{upstream}...HEAD"
+
+# Print non-ASCII paths as they are rather than as quoted octal escapes
+GIT = ("git", "-c", "core.quotepath=false")
+
+
+def split_range(rev_range: str) -> Tuple[str, str, str]:
+    """
+    Split `base..head` or `base...head` into (base, separator, head).
+    A single revision is taken as the base of `<rev>...HEAD`; an empty side means HEAD.
+    """
+    for separator in ("...", ".."):
+        if separator in rev_range:
+            base, head = rev_range.split(separator, 1)
+            return base or "HEAD", separator, head or "HEAD"
+    return rev_range, "...", "HEAD"
+
+
+class LocalGitClient(StreamingVCSClient):
+    """
+    Reads pull request details from a local repository.
+    `repo_name` is the repository path and `pr_number` is ignored. The
+    diff uses `base...head` (changes since the merge base) unless the range
+    was given with two dots.
+    """
+
+    host = "local"
+
+    def __init__(self, rev_range: str = DEFAULT_RANGE):
+        self.rev_range = rev_range
+
+    def _git(self, repo_path: str, *args: str) -> str:
+        return self._git_bytes(repo_path, *args).decode("utf-8", errors="replace")
+
+    def _git_bytes(self, repo_path: str, *args: str) -> bytes:
+        result = subprocess.run([*GIT, "-C", repo_path, *args], capture_output=True)
+        if result.returncode != 0:
+            stderr = result.stderr.decode("utf-8", errors="replace")
+            raise RuntimeError(f"git {args[0]} failed: {stderr.strip()}")
+        return result.stdout
+
+    def stream_pr_details(self, repo_name: str, pr_number: int) -> Tuple[PullRequestDetails, Iterator[PullRequestFile]]:
+        """Details of the range, with files parsed from the `git diff` output as it is read."""
+        base, separator, head = split_range(self.rev_range)
+        head_sha = self._git(repo_name, "rev-parse", "--verify", f"{head}^{{commit}}").strip()
+        base_sha = self._git(repo_name, "rev-parse", "--verify", f"{base}^{{commit}}").strip()
+        # Subject, author and body of the head commit stand in for the PR title and description
+        subject, author, body = self._git(repo_name, "log", "-1", "--format=%s%x00%an%x00%b", head_sha).split("\0", 2)
+
+        details = PullRequestDetails(
+            number=pr_number,
+            title=subject.strip(),
+            description=body.strip(),
+            author=author.strip(),
+            head_sha=head_sha,
+            files=[],
+            base_ref=base_sha,
+        )
+        return details, self._iter_files(repo_name, f"{base_sha}{separator}{head_sha}")
+
+    def _iter_files(self, repo_path: str, diff_range: str) -> Iterator[PullRequestFile]:
+        root = os.path.abspath(repo_path)
+        # Pin the output format against user config: no textconv filters or custom prefixes, paths from the root
+        # stderr goes to a file: a pipe nobody reads while stdout streams can fill and stall git
+        stderr = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            [
+                *GIT, "-C", repo_path, "diff", "--no-color", "--no-ext-diff", "--no-textconv", "--no-relative",
+                "--src-prefix=a/", "--dst-prefix=b/", "--find-renames", "--full-index", diff_range,
+            ],
+            stdout=subprocess.PIPE, stderr=stderr, text=True, encoding="utf-8", errors="replace",
+        )
+        try:
+            yield from DiffParser.iter_files(process.stdout, blob_url=lambda name: os.path.join(root, name))
+            if process.wait() != 0:
+                stderr.seek(0)
+                message = stderr.read().decode("utf-8", errors="replace")
+                raise RuntimeError(f"git diff failed: {message.strip()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            stderr.close()
+
+    def get_file_content(self, repo_name: str, path: str, ref: str) -> Optional[str]:
+        data = self.get_file_bytes(repo_name, path, ref)
+        return data.decode("utf-8", errors="replace") if data is not None else None
+
+    def get_file_bytes(self, repo_name: str, path: str, ref: str) -> Optional[bytes]:
+        try:
+            return self._git_bytes(repo_name, "show", f"{ref}:{path}")
+        except RuntimeError:
+            return None
+
+    def post_comment(self, repo_name: str, pr_number: int, body: str):
+        """There is nowhere to post to; the review is only printed."""
+        logger.info(f"Not posting to local repository {repo_name}")
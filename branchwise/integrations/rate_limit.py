@@ -0,0 +1,215 @@
+"""
+Rate-limit-aware pacing for the VCS APIs.
+
+A single `RateLimitScheduler` is shared by every client in the process. It
+keeps a token bucket per host, learns the remaining quota from the
+providers' rate-limit headers and retries throttled calls with jittered
+exponential backoff, so concurrent reviews slow down instead of failing.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional, TypeVar
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from branchwise.config import RateLimitSettings, Settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Below this many remaining calls, requests are spread evenly until the quota resets
+LOW_QUOTA = 50
+
+
+class HostQuota(BaseModel):
+    """Rate-limit quota last reported by a host."""
+    limit: Optional[int] = None
+    remaining: Optional[int] = None
+    reset_at: Optional[float] = None  # Unix timestamp
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call is still throttled after all retries."""
+
+    def __init__(self, message: str, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.headers = dict(headers or {})
+
+
+def _header(headers: Mapping[str, str], *names: str) -> Optional[str]:
+    lowered = {key.lower(): value for key, value in headers.items()}
+    for name in names:
+        value = lowered.get(name)
+        if value is not None:
+            return value
+    return None
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_rate_limited(status: int, headers: Mapping[str, str]) -> bool:
+    """Whether a response means "slow down" rather than a real error."""
+    if status == 429:
+        return True
+    # GitHub signals both primary and secondary limits with a 403
+    return status == 403 and (
+        _header(headers, "retry-after") is not None
+        or _header(headers, "x-ratelimit-remaining", "ratelimit-remaining") == "0"
+    )
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "quota")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.quota = HostQuota()
+
+
+class RateLimitScheduler:
+    def __init__(
+        self,
+        settings: RateLimitSettings,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.settings = settings
+        self._clock = clock
+        self.sleep = sleep
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host: str) -> _Bucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = _Bucket(self.settings.burst, self._clock())
+        return bucket
+
+    def quota(self, host: str) -> HostQuota:
+        """Remaining quota last reported by `host` (fields are None until known)."""
+        with self._lock:
+            return self._bucket(host).quota.model_copy()
+
+    def acquire(self, host: str):
+        """Block until a request to `host` may be sent."""
+        while True:
+            with self._lock:
+                wait = self._reserve(host)
+            if wait <= 0:
+                return
+            if wait > self.settings.max_wait:
+                raise RateLimitExceeded(f"Rate limit for {host} resets in {wait:.0f}s")
+            logger.debug(f"Pacing requests to {host} for {wait:.2f}s")
+            self.sleep(wait)
+
+    def _reserve(self, host: str) -> float:
+        """Take a token if one is available, otherwise return how long to wait."""
+        now = self._clock()
+        bucket = self._bucket(host)
+        rate = self.settings.requests_per_second
+        quota = bucket.quota
+
+        if quota.remaining is not None and quota.reset_at is not None and quota.reset_at > now:
+            if quota.remaining <= 0:
+                return quota.reset_at - now
+            if quota.remaining < LOW_QUOTA:
+                # Stretch what is left over the time until the reset
+                rate = min(rate, quota.remaining / (quota.reset_at - now))
+
+        bucket.tokens = min(self.settings.burst, bucket.tokens + (now - bucket.updated) * rate)
+        bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            if quota.remaining is not None:
+                quota.remaining -= 1
+            return 0.0
+        return (1 - bucket.tokens) / rate
+
+    def update(self, host: str, headers: Mapping[str, str]):
+        """Record the quota reported in a response's rate-limit headers."""
+        remaining = _int(_header(headers, "x-ratelimit-remaining", "ratelimit-remaining"))
+        if remaining is None:
+            return
+        limit = _int(_header(headers, "x-ratelimit-limit", "ratelimit-limit"))
+        reset = _int(_header(headers, "x-ratelimit-reset", "ratelimit-reset"))
+        with self._lock:
+            quota = self._bucket(host).quota
+            quota.remaining = remaining
+            quota.limit = limit if limit is not None else quota.limit
+            if reset is not None:
+                quota.reset_at = float(reset)
+
+    def backoff(self, attempt: int, headers: Optional[Mapping[str, str]] = None) -> float:
+        """Delay before retry `attempt` (0-based), honoring Retry-After when present."""
+        retry_after = _int(_header(headers or {}, "retry-after"))
+        if retry_after is not None:
+            return float(retry_after)
+        delay = min(self.settings.backoff_max, self.settings.backoff_base * (2 ** attempt))
+        # Full jitter keeps concurrent reviews from retrying in lockstep
+        return random.uniform(delay / 2, delay)
+
+    def call(self, host: str, fn: Callable[[], T]) -> T:
+        """
+        Run `fn` under the scheduler. `fn` signals throttling by raising
+        `RateLimitExceeded`; it is retried with backoff up to `max_retries` times.
+        """
+        for attempt in range(self.settings.max_retries + 1):
+            self.acquire(host)
+            try:
+                return fn()
+            except RateLimitExceeded as e:
+                self.update(host, e.headers)
+                if attempt >= self.settings.max_retries:
+                    raise
+                delay = self.backoff(attempt, e.headers)
+                logger.warning(f"Rate limited by {host}; retrying in {delay:.1f}s")
+                self.sleep(delay)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """`requests` transport adapter that routes every request through the scheduler."""
+
+    def __init__(self, scheduler: RateLimitScheduler, **kwargs):
+        self.scheduler = scheduler
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).netloc
+        attempt = 0
+        while True:
+            self.scheduler.acquire(host)
+            response = super().send(request, **kwargs)
+            self.scheduler.update(host, response.headers)
+            if attempt >= self.scheduler.settings.max_retries or not is_rate_limited(
+                response.status_code, response.headers
+            ):
+                return response
+            delay = self.scheduler.backoff(attempt, response.headers)
+            logger.warning(f"Rate limited by {host} (HTTP {response.status_code}); retrying in {delay:.1f}s")
+            response.close()
+            self.scheduler.sleep(delay)
+            attempt += 1
+
+
+_scheduler: Optional[RateLimitScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(settings: Optional[Settings] = None) -> RateLimitScheduler:
+    """The process-wide scheduler, configured by the first caller's settings."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler(settings.rate_limit if settings else RateLimitSettings())
+        return _scheduler
@@ -0,0 +1,44 @@
+import json
+import logging
+from typing import Optional
+
+from branchwise.config import Settings
+from branchwise.utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Persistent cache of raw LLM responses.
+
+    The key covers everything that influences the completion: the model,
+    the full messages (and thus the prompt built by `_construct_prompt`),
+    `max_tokens` and temperature.
+    """
+
+    def __init__(self, store: DiskCache):
+        self.store = store
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ResponseCache":
+        cache = settings.cache
+        return cls(DiskCache(
+            directory=cache.directory / "llm",
+            max_bytes=cache.max_size_mb * 1024 * 1024,
+            ttl_seconds=cache.ttl_hours * 3600,
+        ))
+
+    @staticmethod
+    def key_for(request_params: dict) -> str:
+        return json.dumps(request_params, sort_keys=True, ensure_ascii=False)
+
+    def get(self, request_params: dict) -> Optional[str]:
+        data = self.store.get(self.key_for(request_params))
+        if data is None:
+            return None
+        logger.debug("LLM response cache hit")
+        return data.decode("utf-8")
+
+    def set(self, request_params: dict, content: str):
+        self.store.set(self.key_for(request_params), content.encode("utf-8"))
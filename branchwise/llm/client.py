@@ -1,11 +1,27 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 
-from openai import OpenAI
 from pydantic import BaseModel
 
 from branchwise.config import Settings
+from branchwise.llm.cache import ResponseCache
+from branchwise.llm.parsing import (
+    FINDINGS_SCHEMA,
+    FindingStream,
+    extract_findings,
+    parse_text_findings,
+    validate_findings,
+)
+from branchwise.llm.retry import (
+    AdaptiveLimiter,
+    AsyncAdaptiveLimiter,
+    call_with_retries,
+    call_with_retries_async,
+    retrying,
+    retrying_async,
+)
+from branchwise.utils.metrics import current_llm_call
 
 
 class ReviewComment(BaseModel):
@@ -22,44 +38,132 @@ class LLMClient(ABC):
         """Analyze a file diff and return a list of review comments."""
         pass
 
+    def analyze_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> List[ReviewComment]:
+        """
+        Analyze several (file_name, diff_content) pairs, with an optional
+        context per file. Clients that can review many files in one request
+        should override this.
+        """
+        comments = []
+        for (file_name, diff_content), context in zip(diffs, contexts or [None] * len(diffs)):
+            comments.extend(self.analyze_diff(file_name, diff_content, context))
+        return comments
+
+    def stream_diff(self, file_name: str, diff_content: str, context: Optional[str] = None) -> Iterator[ReviewComment]:
+        """
+        Yield comments as soon as each one is known.
+        Clients that can stream completions should override this.
+        """
+        yield from self.analyze_diff(file_name, diff_content, context)
+
+    def stream_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> Iterator[ReviewComment]:
+        """Streaming counterpart of `analyze_batch`."""
+        yield from self.analyze_batch(diffs, contexts)
+
+
+class AsyncLLMClient(ABC):
+    """Asyncio variant of `LLMClient` for running many reviews on one event loop."""
+
+    @abstractmethod
+    async def analyze_diff(self, file_name: str, diff_content: str, context: Optional[str] = None) -> List[ReviewComment]:
+        """Analyze a file diff and return a list of review comments."""
+        pass
+
+    async def analyze_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> List[ReviewComment]:
+        """Analyze several (file_name, diff_content) pairs, with an optional context per file."""
+        comments = []
+        for (file_name, diff_content), context in zip(diffs, contexts or [None] * len(diffs)):
+            comments.extend(await self.analyze_diff(file_name, diff_content, context))
+        return comments
+
+    async def stream_diff(
+        self, file_name: str, diff_content: str, context: Optional[str] = None
+    ) -> AsyncIterator[ReviewComment]:
+        """Yield comments as soon as each one is known."""
+        for comment in await self.analyze_diff(file_name, diff_content, context):
+            yield comment
+
+    async def stream_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> AsyncIterator[ReviewComment]:
+        """Streaming counterpart of `analyze_batch`."""
+        for comment in await self.analyze_batch(diffs, contexts):
+            yield comment
+
+
+class _OpenAIReviewer:
+    """Prompt construction and response parsing shared by the OpenAI clients."""
 
-class OpenAIClient(LLMClient):
     def __init__(self, settings: Settings):
         self.settings = settings
-        self.client = OpenAI(
-            api_key=settings.llm.api_key.get_secret_value(),
-            base_url=settings.llm.base_url
-        )
         self.model = settings.llm.model
+        self.cache = ResponseCache.from_settings(settings) if settings.cache.enabled else None
 
-    def analyze_diff(self, file_name: str, diff_content: str, context: Optional[str] = None) -> List[ReviewComment]:
-        prompt = self._construct_prompt(file_name, diff_content, context)
-        
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert code reviewer. Analyze the code changes in the git diff provided."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=self.settings.llm.max_tokens,
-                temperature=0.2, # Low temperature for more deterministic and focused output
-            )
-            
-            content = response.choices[0].message.content
-            return self._parse_response(content, file_name)
-        except Exception as e:
-            logging.error(f"Error calling OpenAI API: {e}")
-            return []
+    @staticmethod
+    def _record_call(usage=None, cached: bool = False):
+        """Add usage to the metrics of the request in progress, if it is being recorded."""
+        call = current_llm_call.get()
+        if call is None:
+            return
+        call.cached = call.cached or cached
+        if usage is not None:
+            call.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            call.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
 
-    def _construct_prompt(self, file_name: str, diff_content: str, context: Optional[str]) -> str:
-        return f"""
-        Analyze the following git diff for the file `{file_name}`.
-        Identify potential bugs, security vulnerabilities, performance issues, and code style violations.
+    @property
+    def _json_output(self) -> bool:
+        return self.settings.llm.output_format == "json"
+
+    def _request_params(self, prompt: str) -> dict:
+        params = dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are an expert code reviewer. Analyze the code changes in the git diff provided."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=self.settings.llm.max_tokens,
+            temperature=0.2, # Low temperature for more deterministic and focused output
+        )
+        llm = self.settings.llm
+        response_format = llm.response_format or ("none" if llm.base_url else "json_schema")
+        if self._json_output and response_format == "json_schema":
+            params["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "review_findings", "strict": True, "schema": FINDINGS_SCHEMA},
+            }
+        elif self._json_output and response_format == "json_object":
+            params["response_format"] = {"type": "json_object"}
+        return params
+
+    def _format_instructions(self, batch: bool) -> str:
+        if self._json_output:
+            file_hint = "the file path exactly as given" if batch else "the file path"
+            return f"""
+        Return the response strictly as a JSON object of this shape, with one entry per issue found:
         
-        Return the response strictly in the following format for each issue found:
+        {{"findings": [{{"file": "<{file_hint}>", "line": <line_number>, "type": "<bug|security|performance|style|doc>", "severity": "<critical|major|minor>", "content": "<description of the issue>"}}]}}
         
-        ---
+        If no issues are found, return {{"findings": []}}.
+        """
+        file_field = "\n        File: <file_path>" if batch else ""
+        return f"""
+        Return the response strictly in the following format for each issue found{", using the file path exactly as given" if batch else ""}:
+        
+        ---{file_field}
         Line: <line_number>
         Type: <bug|security|performance|style|doc>
         Severity: <critical|major|minor>
@@ -67,39 +171,280 @@ class OpenAIClient(LLMClient):
         ---
         
         If no issues are found, return "No issues found."
-        
-        Diff:
+        """
+
+    @staticmethod
+    def _context_section(context: Optional[str]) -> str:
+        if not context:
+            return ""
+        return (
+            "Surrounding code from the new version of the file, for reference only"
+            " (comment on the changed lines):\n" + context + "\n\n"
+        )
+
+    def _construct_prompt(self, file_name: str, diff_content: str, context: Optional[str]) -> str:
+        return f"""
+        Analyze the following git diff for the file `{file_name}`.
+        Identify potential bugs, security vulnerabilities, performance issues, and code style violations.
+        {self._format_instructions(batch=False)}
+{self._context_section(context)}        Diff:
         {diff_content}
         """
+        
+    def _construct_batch_prompt(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> str:
+        sections = "\n\n".join(
+            f"File: `{file_name}`\n{self._context_section(context)}Diff:\n{diff_content}"
+            for (file_name, diff_content), context in zip(diffs, contexts or [None] * len(diffs))
+        )
+        return f"""
+        Analyze the following git diffs for {len(diffs)} files.
+        Identify potential bugs, security vulnerabilities, performance issues, and code style violations.
+        {self._format_instructions(batch=True)}
+{sections}
+        """
 
-    def _parse_response(self, content: str, file_path: str) -> List[ReviewComment]:
+    def _parse_response(self, content: str, file_path: str, file_paths: Optional[List[str]] = None) -> List[ReviewComment]:
+        """
+        Parse review comments from a response. When `file_paths` is given the
+        response covers a batch, and each comment is mapped back to its file.
+        """
+        raw_findings = extract_findings(content) if self._json_output else None
+        if raw_findings is None:
+            # Text mode, or a model that ignored the JSON instructions
+            raw_findings = parse_text_findings(content)
+        return self._to_comments(raw_findings, file_path, file_paths)
+
+    def _to_comments(
+        self,
+        raw_findings: List[dict],
+        file_path: str,
+        file_paths: Optional[List[str]] = None,
+    ) -> List[ReviewComment]:
         comments = []
-        if "No issues found" in content:
-            return comments
-            
-        # Very simple parser - can be improved with regex or JSON mode
-        chunks = content.split("---")
-        for chunk in chunks:
-            if not chunk.strip():
-                continue
-            
-            lines = chunk.strip().split("\n")
-            comment_data = {}
-            for line in lines:
-                if ":" in line:
-                    key, value = line.split(":", 1)
-                    comment_data[key.strip().lower()] = value.strip()
-            
-            if "line" in comment_data and "content" in comment_data:
-                try:
-                    comments.append(ReviewComment(
-                        file_path=file_path,
-                        line_number=int(comment_data["line"]),
-                        content=comment_data["content"],
-                        type=comment_data.get("type", "style"),
-                        severity=comment_data.get("severity", "minor")
-                    ))
-                except ValueError:
-                    logging.warning(f"Failed to parse line number: {comment_data['line']}")
-                    
+        for finding in validate_findings(raw_findings):
+            path = file_path
+            if file_paths:
+                path = self._match_file(finding.file or "", file_paths)
+                if path is None:
+                    logging.warning(f"Dropping comment for unknown file: {finding.file}")
+                    continue
+            comments.append(ReviewComment(
+                file_path=path,
+                line_number=finding.line,
+                content=finding.content,
+                type=finding.type,
+                severity=finding.severity,
+            ))
         return comments
+
+    def _stream_params(self, params: dict) -> dict:
+        # Usage arrives in a final chunk without choices
+        return dict(params, stream=True, stream_options={"include_usage": True})
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        if getattr(chunk, "choices", None):
+            return chunk.choices[0].delta.content or ""
+        return ""
+
+    @staticmethod
+    def _match_file(name: str, file_paths: List[str]) -> Optional[str]:
+        """Resolve a file name reported by the LLM to one of the requested paths."""
+        name = name.strip().strip("`'\"")
+        if name in file_paths:
+            return name
+        # Tolerate the model shortening or prefixing the path
+        matches = [path for path in file_paths if name and (path.endswith("/" + name) or name.endswith("/" + path))]
+        return matches[0] if len(matches) == 1 else None
+
+
+class OpenAIClient(_OpenAIReviewer, LLMClient):
+    def __init__(self, settings: Settings, max_concurrency: Optional[int] = None):
+        """`max_concurrency` caps requests in flight (default: `rules.max_workers`)."""
+        super().__init__(settings)
+        # The SDK takes most of a second to import, so it is only loaded when a client is built
+        from openai import OpenAI
+
+        self.client = OpenAI(
+            api_key=settings.llm.api_key.get_secret_value(),
+            base_url=settings.llm.base_url,
+            max_retries=0,  # Retries are paced by `retrying` together with the limiter
+        )
+        self.limiter = AdaptiveLimiter(max_concurrency or settings.rules.max_workers)
+
+    def analyze_diff(self, file_name: str, diff_content: str, context: Optional[str] = None) -> List[ReviewComment]:
+        """Raises `LLMRequestError` if the request still fails after retries."""
+        prompt = self._construct_prompt(file_name, diff_content, context)
+        return self._parse_response(self._complete(prompt), file_name)
+
+    def analyze_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> List[ReviewComment]:
+        file_paths = [file_name for file_name, _ in diffs]
+        prompt = self._construct_batch_prompt(diffs, contexts)
+        return self._parse_response(self._complete(prompt), file_paths[0], file_paths)
+
+    def stream_diff(self, file_name: str, diff_content: str, context: Optional[str] = None) -> Iterator[ReviewComment]:
+        """Like `analyze_diff`, but yields comments while the completion is still streaming."""
+        prompt = self._construct_prompt(file_name, diff_content, context)
+        yield from self._stream(prompt, file_name)
+
+    def stream_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> Iterator[ReviewComment]:
+        file_paths = [file_name for file_name, _ in diffs]
+        yield from self._stream(self._construct_batch_prompt(diffs, contexts), file_paths[0], file_paths)
+
+    def _stream(self, prompt: str, file_path: str, file_paths: Optional[List[str]] = None) -> Iterator[ReviewComment]:
+        params = self._request_params(prompt)
+        cached = self.cache.get(params) if self.cache else None
+        if cached is not None:
+            self._record_call(cached=True)
+            yield from self._parse_response(cached, file_path, file_paths)
+            return
+
+        parser = chunks = usage = None
+
+        def attempt() -> Iterator[ReviewComment]:
+            nonlocal parser, chunks, usage
+            parser, chunks, usage = FindingStream(self._json_output), [], None
+            for chunk in self.client.chat.completions.create(**self._stream_params(params)):
+                usage = getattr(chunk, "usage", None) or usage
+                text = self._chunk_text(chunk)
+                chunks.append(text)
+                yield from self._to_comments(parser.feed(text), file_path, file_paths)
+
+        emitted: List[ReviewComment] = []  # A retried request must not repeat comments
+        for comment in retrying(self.settings.llm, self.limiter, attempt):
+            if comment not in emitted:
+                emitted.append(comment)
+                yield comment
+
+        self._record_call(usage=usage)
+        for comment in self._to_comments(parser.close(), file_path, file_paths):
+            if comment not in emitted:
+                yield comment
+        content = "".join(chunks)
+        if self.cache and content:
+            self.cache.set(params, content)
+
+    def _complete(self, prompt: str) -> str:
+        params = self._request_params(prompt)
+        cached = self.cache.get(params) if self.cache else None
+        if cached is not None:
+            self._record_call(cached=True)
+            return cached
+
+        response = call_with_retries(
+            self.settings.llm, self.limiter, lambda: self.client.chat.completions.create(**params)
+        )
+        self._record_call(usage=response.usage)
+        content = response.choices[0].message.content or ""
+        if self.cache and content:
+            self.cache.set(params, content)
+        return content
+
+
+class AsyncOpenAIClient(_OpenAIReviewer, AsyncLLMClient):
+    def __init__(self, settings: Settings, max_concurrency: Optional[int] = None):
+        super().__init__(settings)
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(
+            api_key=settings.llm.api_key.get_secret_value(),
+            base_url=settings.llm.base_url,
+            max_retries=0,
+        )
+        self.limiter = AsyncAdaptiveLimiter(max_concurrency or settings.rules.max_workers)
+
+    async def analyze_diff(self, file_name: str, diff_content: str, context: Optional[str] = None) -> List[ReviewComment]:
+        """Raises `LLMRequestError` if the request still fails after retries."""
+        prompt = self._construct_prompt(file_name, diff_content, context)
+        return self._parse_response(await self._complete(prompt), file_name)
+
+    async def analyze_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> List[ReviewComment]:
+        file_paths = [file_name for file_name, _ in diffs]
+        prompt = self._construct_batch_prompt(diffs, contexts)
+        return self._parse_response(await self._complete(prompt), file_paths[0], file_paths)
+
+    async def stream_diff(
+        self, file_name: str, diff_content: str, context: Optional[str] = None
+    ) -> AsyncIterator[ReviewComment]:
+        """Like `analyze_diff`, but yields comments while the completion is still streaming."""
+        prompt = self._construct_prompt(file_name, diff_content, context)
+        async for comment in self._stream(prompt, file_name):
+            yield comment
+
+    async def stream_batch(
+        self,
+        diffs: List[Tuple[str, str]],
+        contexts: Optional[List[Optional[str]]] = None,
+    ) -> AsyncIterator[ReviewComment]:
+        file_paths = [file_name for file_name, _ in diffs]
+        async for comment in self._stream(self._construct_batch_prompt(diffs, contexts), file_paths[0], file_paths):
+            yield comment
+
+    async def _stream(
+        self, prompt: str, file_path: str, file_paths: Optional[List[str]] = None
+    ) -> AsyncIterator[ReviewComment]:
+        params = self._request_params(prompt)
+        cached = self.cache.get(params) if self.cache else None
+        if cached is not None:
+            self._record_call(cached=True)
+            for comment in self._parse_response(cached, file_path, file_paths):
+                yield comment
+            return
+
+        parser = chunks = usage = None
+
+        async def attempt() -> AsyncIterator[ReviewComment]:
+            nonlocal parser, chunks, usage
+            parser, chunks, usage = FindingStream(self._json_output), [], None
+            async for chunk in await self.client.chat.completions.create(**self._stream_params(params)):
+                usage = getattr(chunk, "usage", None) or usage
+                text = self._chunk_text(chunk)
+                chunks.append(text)
+                for comment in self._to_comments(parser.feed(text), file_path, file_paths):
+                    yield comment
+
+        emitted: List[ReviewComment] = []  # A retried request must not repeat comments
+        async for comment in retrying_async(self.settings.llm, self.limiter, attempt):
+            if comment not in emitted:
+                emitted.append(comment)
+                yield comment
+
+        self._record_call(usage=usage)
+        for comment in self._to_comments(parser.close(), file_path, file_paths):
+            if comment not in emitted:
+                yield comment
+        content = "".join(chunks)
+        if self.cache and content:
+            self.cache.set(params, content)
+
+    async def _complete(self, prompt: str) -> str:
+        params = self._request_params(prompt)
+        cached = self.cache.get(params) if self.cache else None
+        if cached is not None:
+            self._record_call(cached=True)
+            return cached
+
+        response = await call_with_retries_async(
+            self.settings.llm, self.limiter, lambda: self.client.chat.completions.create(**params)
+        )
+        self._record_call(usage=response.usage)
+        content = response.choices[0].message.content or ""
+        if self.cache and content:
+            self.cache.set(params, content)
+        return content
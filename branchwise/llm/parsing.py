@@ -0,0 +1,216 @@
+"""
+Parsing of LLM review responses into `ReviewComment`s.
+
+The JSON parser is tolerant: it accepts code fences and prose around the
+JSON, and salvages every complete finding from a truncated response. The
+text parser handles the legacy `---`/`Key: value` format. `FindingStream`
+applies either parser incrementally to a streamed response.
+"""
+import json
+import logging
+import re
+from typing import Any, Iterator, List, Optional
+
+from pydantic import BaseModel, ValidationError, field_validator
+
+logger = logging.getLogger(__name__)
+
+COMMENT_TYPES = ["bug", "security", "performance", "style", "doc"]
+SEVERITIES = ["critical", "major", "minor"]
+
+# Schema for `response_format={"type": "json_schema", ...}`; strict mode
+# requires every property to be listed as required.
+FINDINGS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "findings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string"},
+                    "line": {"type": "integer"},
+                    "type": {"type": "string", "enum": COMMENT_TYPES},
+                    "severity": {"type": "string", "enum": SEVERITIES},
+                    "content": {"type": "string"},
+                },
+                "required": ["file", "line", "type", "severity", "content"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["findings"],
+    "additionalProperties": False,
+}
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*$", re.MULTILINE)
+_SEPARATOR_RE = re.compile(r"^\s*-{3,}\s*$", re.MULTILINE)
+_FIELD_RE = re.compile(r"^\s*[*_`]*(file|line|type|severity|content)[*_`]*\s*:\s*(.*)$", re.IGNORECASE)
+_INT_RE = re.compile(r"\d+")
+_FINDINGS_ARRAY_RE = re.compile(r'"findings"\s*:\s*\[')
+
+
+class Finding(BaseModel):
+    """One finding as reported by the model, before it is tied to a requested file."""
+    file: Optional[str] = None
+    line: int
+    type: str = "style"
+    severity: str = "minor"
+    content: str
+
+    @field_validator("line", mode="before")
+    @classmethod
+    def _first_line_number(cls, value: Any) -> Any:
+        # Ranges such as "12-14" or "L12" are anchored on their first line
+        if isinstance(value, str):
+            match = _INT_RE.search(value)
+            return int(match.group()) if match else value
+        return value
+
+    @field_validator("type", "severity", mode="before")
+    @classmethod
+    def _normalize(cls, value: Any) -> Any:
+        return value.strip().lower() if isinstance(value, str) else value
+
+
+def _iter_objects(text: str) -> Iterator[Any]:
+    """Yield every complete JSON object that starts at a `{`, outermost first."""
+    decoder = json.JSONDecoder()
+    index = text.find("{")
+    while index != -1:
+        try:
+            value, end = decoder.raw_decode(text, index)
+        except ValueError:
+            # Truncated or broken: look for complete objects nested inside it
+            index = text.find("{", index + 1)
+            continue
+        yield value
+        index = text.find("{", end)
+
+
+def extract_findings(text: str) -> Optional[List[dict]]:
+    """
+    Pull raw findings out of a JSON response.
+    Returns None when no findings document or finding could be read at all.
+    """
+    text = _FENCE_RE.sub("", text).strip()
+    try:
+        value = json.loads(text)
+    except ValueError:
+        value = None
+
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    if isinstance(value, dict):
+        findings = value.get("findings", value.get("issues", [value] if "line" in value else []))
+        return [item for item in findings if isinstance(item, dict)] if isinstance(findings, list) else []
+
+    # Not a single valid document: salvage the complete findings it contains
+    salvaged = []
+    for value in _iter_objects(text):
+        if isinstance(value, dict) and isinstance(value.get("findings"), list):
+            salvaged.extend(item for item in value["findings"] if isinstance(item, dict))
+        elif isinstance(value, dict) and "line" in value:
+            salvaged.append(value)
+    if salvaged:
+        logger.warning(f"Recovered {len(salvaged)} findings from a malformed JSON response")
+    return salvaged or None
+
+
+def parse_text_findings(text: str) -> List[dict]:
+    """
+    Parse the legacy format: blocks separated by `---` lines, each holding
+    `Key: value` fields. Lines that do not start a known field continue the
+    previous one, so comment text may contain colons and dashes.
+    """
+    findings = []
+    for block in _SEPARATOR_RE.split(text):
+        fields: dict = {}
+        key = None
+        for line in block.splitlines():
+            match = _FIELD_RE.match(line)
+            if match:
+                key = match.group(1).lower()
+                fields[key] = match.group(2).strip()
+            elif key and line.strip():
+                fields[key] += "\n" + line.strip()
+        if "line" in fields and "content" in fields:
+            findings.append(fields)
+    return findings
+
+
+def validate_findings(raw_findings: List[dict]) -> List[Finding]:
+    """Validate raw findings, logging and skipping the malformed ones."""
+    findings = []
+    for raw in raw_findings:
+        try:
+            findings.append(Finding.model_validate(raw))
+        except ValidationError as e:
+            logger.warning(f"Dropping malformed finding {raw!r}: {e.errors()[0]['msg']}")
+    return findings
+
+
+class FindingStream:
+    """
+    Incremental parser for a streamed response.
+
+    `feed` returns the raw findings completed by each chunk; `close` returns
+    whatever the full-response parsers find that was not already returned,
+    so the union matches parsing the whole response at once.
+    """
+
+    def __init__(self, json_output: bool = True):
+        self.json_output = json_output
+        self._buffer = ""
+        self._scan = 0  # Where to look for the next JSON finding or text block
+        self._emitted: List[dict] = []
+
+    def feed(self, chunk: str) -> List[dict]:
+        self._buffer += chunk
+        found = self._scan_json() if self.json_output else self._scan_text()
+        self._emitted.extend(found)
+        return found
+
+    def close(self) -> List[dict]:
+        text = self._buffer
+        findings = extract_findings(text) if self.json_output else None
+        if findings is None:
+            findings = parse_text_findings(text)
+        remaining = [finding for finding in findings if finding not in self._emitted]
+        self._emitted.extend(remaining)
+        return remaining
+
+    def _scan_json(self) -> List[dict]:
+        found = []
+        if self._scan == 0:
+            # Findings are the objects inside the array, not the document itself
+            match = _FINDINGS_ARRAY_RE.search(self._buffer)
+            if not match:
+                return found
+            self._scan = match.end()
+        decoder = json.JSONDecoder()
+        while True:
+            index = self._buffer.find("{", self._scan)
+            if index == -1:
+                return found
+            try:
+                value, end = decoder.raw_decode(self._buffer, index)
+            except ValueError:
+                return found  # Incomplete so far
+            self._scan = end
+            if isinstance(value, dict) and "line" in value:
+                found.append(value)
+
+    def _scan_text(self) -> List[dict]:
+        # Blocks are complete once a whole separator line after them has arrived
+        complete = self._buffer.rfind("\n")
+        separators = [
+            match for match in _SEPARATOR_RE.finditer(self._buffer, self._scan, max(complete, 0))
+            if match.start() > self._scan
+        ]
+        if not separators:
+            return []
+        end = separators[-1].start()
+        found = parse_text_findings(self._buffer[self._scan:end])
+        self._scan = end
+        return found
@@ -0,0 +1,209 @@
+"""
+Retry and adaptive concurrency for LLM calls.
+
+Transient failures (429s, timeouts, 5xx) are retried with jittered
+exponential backoff, honoring Retry-After. An AIMD limiter bounds the
+number of requests in flight: it halves on throttling and grows by about
+one slot per window of successful calls, up to `rules.max_workers`.
+
+`retrying` and `retrying_async` hold the one attempt loop used by every
+LLM request, streaming or not: each attempt runs in a limiter slot,
+failures feed the limiter and are paced by `backoff_delay`, and retries
+are counted on the `current_llm_call` metrics.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from branchwise.config import LLMSettings
+from branchwise.utils.metrics import current_llm_call
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LLMRequestError(Exception):
+    """Raised when an LLM request fails for good, after any retries."""
+
+
+def is_throttled(error: Exception) -> bool:
+    """Whether the provider asked us to slow down (rate limit or timeout)."""
+    import openai
+
+    return isinstance(error, (openai.RateLimitError, openai.APITimeoutError))
+
+
+def is_retryable(error: Exception) -> bool:
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Delay requested by the provider in seconds, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def backoff_delay(settings: LLMSettings, attempt: int, error: Exception) -> float:
+    """Delay before retry `attempt` (0-based)."""
+    requested = retry_after(error)
+    if requested is not None:
+        return requested
+    delay = min(settings.backoff_max, settings.backoff_base * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+class _AIMD:
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+
+    def on_success(self):
+        # Additive increase: about one extra slot per `limit` successful calls
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_throttle(self):
+        # Multiplicative decrease
+        self.limit = max(1.0, self.limit / 2)
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+
+class AdaptiveLimiter(_AIMD):
+    """AIMD concurrency limit shared by the threads of one client."""
+
+    def __init__(self, max_limit: int):
+        super().__init__(max_limit)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            self._cond.wait_for(self._has_slot)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            super().on_success()
+
+    def on_throttle(self):
+        with self._cond:
+            super().on_throttle()
+
+
+class AsyncAdaptiveLimiter(_AIMD):
+    """AIMD concurrency limit for requests made from one event loop."""
+
+    def __init__(self, max_limit: int):
+        super().__init__(max_limit)
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._cond:
+            await self._cond.wait_for(self._has_slot)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+
+def _next_delay(settings: LLMSettings, limiter: _AIMD, attempt: int, error: Exception) -> float:
+    """
+    Account for failed attempt `attempt` (0-based) and return the delay
+    before the next one. Raises `LLMRequestError` when it is not retried.
+    """
+    if is_throttled(error):
+        limiter.on_throttle()
+    if attempt >= settings.max_retries or not is_retryable(error):
+        raise LLMRequestError(f"OpenAI request failed after {attempt + 1} attempt(s): {error}") from error
+    call = current_llm_call.get()
+    if call is not None:
+        call.retries += 1
+    delay = backoff_delay(settings, attempt, error)
+    logger.warning(f"OpenAI request failed ({error}); retrying in {delay:.1f}s")
+    return delay
+
+
+def retrying(settings: LLMSettings, limiter: AdaptiveLimiter, attempt: Callable[[], Iterator[T]]) -> Iterator[T]:
+    """
+    Yield what `attempt()` yields, calling it again after retryable errors.
+    Everything an attempt yields is passed on, so a consumer that must not
+    see repeats after a retry has to drop them itself.
+    """
+    for number in range(settings.max_retries + 1):
+        try:
+            with limiter.slot():
+                yield from attempt()
+        except Exception as e:
+            time.sleep(_next_delay(settings, limiter, number, e))
+            continue
+        limiter.on_success()
+        return
+
+
+async def retrying_async(
+    settings: LLMSettings, limiter: AsyncAdaptiveLimiter, attempt: Callable[[], AsyncIterator[T]]
+) -> AsyncIterator[T]:
+    """Async counterpart of `retrying`."""
+    for number in range(settings.max_retries + 1):
+        try:
+            async with limiter.slot():
+                async for item in attempt():
+                    yield item
+        except Exception as e:
+            await asyncio.sleep(_next_delay(settings, limiter, number, e))
+            continue
+        limiter.on_success()
+        return
+
+
+def call_with_retries(settings: LLMSettings, limiter: AdaptiveLimiter, call: Callable[[], T]) -> T:
+    """`retrying` for a request whose result arrives at once."""
+    def attempt() -> Iterator[T]:
+        yield call()
+
+    (result,) = retrying(settings, limiter, attempt)
+    return result
+
+
+async def call_with_retries_async(
+    settings: LLMSettings, limiter: AsyncAdaptiveLimiter, call: Callable[[], Awaitable[T]]
+) -> T:
+    """Async counterpart of `call_with_retries`."""
+    async def attempt() -> AsyncIterator[T]:
+        yield await call()
+
+    (result,) = [item async for item in retrying_async(settings, limiter, attempt)]
+    return result
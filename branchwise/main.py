@@ -1,35 +1,59 @@
+import json
 import logging
 import sys
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, List, Optional
 
 import typer
 from rich.console import Console
 from rich.logging import RichHandler
+from rich.markup import escape
 from rich.table import Table
+from typer.core import TyperGroup
 
-from branchwise.config import load_settings, Settings
-from branchwise.core.analyzer import Analyzer
-from branchwise.integrations.base import VCSClient
-from branchwise.llm.client import OpenAIClient
+# Everything below the CLI layer (settings, the analyzer, the openai SDK and the
+# provider SDKs) is imported inside the commands, so `--help`, argument errors
+# and short-lived CI runs do not pay for modules they never use.
+if TYPE_CHECKING:
+    from branchwise.config import Settings
+    from branchwise.core.reviewer import PullRequestReviewer
+    from branchwise.integrations.factory import PullRequestRef
 
-# Configure logging
+# Configure logging (on stderr, so stdout stays usable for machine-readable output)
 logging.basicConfig(
     level="INFO",
     format="%(message)s",
     datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True)]
+    handlers=[RichHandler(console=Console(stderr=True), rich_tracebacks=True)]
 )
 
-app = typer.Typer(help="Branchwise - Intelligent Code Review Agent")
+
+class DefaultCommandGroup(TyperGroup):
+    """Runs `review` unless a subcommand is named, so `branchwise <pr_url>` keeps working."""
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = ["review"] + list(args)
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(help="Branchwise - Intelligent Code Review Agent", cls=DefaultCommandGroup)
 console = Console()
 logger = logging.getLogger("branchwise")
 
 
 @app.command()
 def review(
-    pr_url: str = typer.Argument(..., help="URL of the pull request to review"),
+    pr_url: str = typer.Argument(..., help="URL of the pull request to review, or a local repository path or commit range"),
+    rev_range: Optional[str] = typer.Argument(None, help="Commit range to review in a local repository (default: @{upstream}...HEAD)"),
     dry_run: bool = typer.Option(False, "--dry-run", help="Do not post comments to GitHub"),
     verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose logging"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Do not read or write the LLM response cache"),
+    full: bool = typer.Option(False, "--full", help="Re-review every file instead of only what changed since the last review"),
+    metrics_json: Optional[str] = typer.Option(None, "--metrics-json", help="Write stage timings and token usage to this JSON file"),
+    metrics_prom: Optional[str] = typer.Option(None, "--metrics-prom", help="Write metrics to this Prometheus textfile (.prom)"),
+    no_stream: bool = typer.Option(False, "--no-stream", help="Wait for complete LLM responses instead of streaming comments"),
 ):
     """
     Review a pull request and provide intelligent feedback.
@@ -37,6 +61,12 @@ def review(
     if verbose:
         logger.setLevel(logging.DEBUG)
 
+    from branchwise.config import load_settings
+    from branchwise.core.analyzer import Analyzer
+    from branchwise.core.reviewer import PullRequestReviewer
+    from branchwise.integrations.factory import ClientPool, is_local_target, parse_local_ref, parse_pr_url
+    from branchwise.llm.client import OpenAIClient
+
     try:
         # Load settings
         settings = load_settings()
@@ -45,100 +75,55 @@ def review(
             console.print("[bold red]Error:[/bold red] LLM API key not found. Please set BRANCHWISE_LLM_API_KEY.")
             raise typer.Exit(code=1)
 
-        # Detect VCS provider and parse URL
-        client: VCSClient
-        repo_name: str
-        pr_number: int
-        
-        # Simple heuristic for URL parsing
-        if "github.com" in pr_url:
-            from branchwise.integrations.github import GitHubClient
-            
-            if not settings.github.token:
-                 console.print("[yellow]Warning: GitHub token not found. API limits may apply.[/yellow]")
-
-            parts = pr_url.rstrip("/").split("/")
-            try:
-                # https://github.com/owner/repo/pull/123
-                pr_number = int(parts[-1])
-                repo_name = f"{parts[-4]}/{parts[-3]}"
-                client = GitHubClient(settings)
-            except (IndexError, ValueError) as e:
-                console.print(f"[bold red]Error:[/bold red] Invalid GitHub URL format. {e}")
-                raise typer.Exit(code=1)
-                
-        elif "gitlab.com" in pr_url or (settings.gitlab.url and settings.gitlab.url in pr_url):
-            from branchwise.integrations.gitlab_client import GitLabClient
-            
-            if not settings.gitlab.token:
-                console.print("[bold red]Error:[/bold red] GitLab token not found. Please set BRANCHWISE_GITLAB_TOKEN.")
-                raise typer.Exit(code=1)
-
-            # https://gitlab.com/owner/repo/-/merge_requests/123
-            # or custom instance
-            try:
-                # This parsing is brittle and depends on URL structure
-                # Assuming standard GitLab URL: .../project/path/-/merge_requests/ID
-                if "/-/merge_requests/" in pr_url:
-                    base, mr_part = pr_url.split("/-/merge_requests/")
-                    repo_name = base.split("/")[-1] # This might be wrong for nested groups
-                    # Better to take relative path from domain
-                    
-                    # Let's try to extract project namespace/name
-                    # Remove protocol
-                    path_only = pr_url.split("://")[-1].split("/", 1)[1]
-                    project_path, _ = path_only.split("/-/merge_requests/")
-                    repo_name = project_path
-                    pr_number = int(mr_part.split("/")[0])
-                else:
-                    raise ValueError("URL does not look like a merge request URL")
-                
-                client = GitLabClient(settings)
-            except Exception as e:
-                console.print(f"[bold red]Error:[/bold red] Invalid GitLab URL format. {e}")
-                raise typer.Exit(code=1)
-
-        elif "bitbucket.org" in pr_url:
-            from branchwise.integrations.bitbucket_client import BitbucketClient
-            
-            if not settings.bitbucket.token:
-                 console.print("[bold red]Error:[/bold red] Bitbucket token not found.")
-                 raise typer.Exit(code=1)
-            
-            # https://bitbucket.org/owner/repo/pull-requests/123
-            try:
-                parts = pr_url.rstrip("/").split("/")
-                # owner/repo/pull-requests/123
-                # parts[-1] is ID?
-                # bitbucket URLs can be complex.
-                # Assuming standard cloud URL
-                pr_number = int(parts[-1])
-                repo_name = f"{parts[-4]}/{parts[-3]}"
-                client = BitbucketClient(settings)
-            except Exception as e:
-                console.print(f"[bold red]Error:[/bold red] Invalid Bitbucket URL format. {e}")
-                raise typer.Exit(code=1)
-        else:
-             console.print("[bold red]Error:[/bold red] Unsupported URL. Only GitHub, GitLab, and Bitbucket are supported.")
-             raise typer.Exit(code=1)
+        if no_cache:
+            settings.cache.enabled = False
+
+        # Detect VCS provider and parse URL, or review a local commit range
+        try:
+            if is_local_target(pr_url):
+                ref = parse_local_ref(pr_url, rev_range)
+            else:
+                ref = parse_pr_url(pr_url, settings)
+        except ValueError as e:
+            console.print(f"[bold red]Error:[/bold red] {e}")
+            raise typer.Exit(code=1)
+
+        if ref.provider == "github" and not settings.github.token:
+            console.print("[yellow]Warning: GitHub token not found. API limits may apply.[/yellow]")
+        token_error = _missing_token(ref, settings)
+        if token_error:
+            console.print(f"[bold red]Error:[/bold red] {token_error}")
+            raise typer.Exit(code=1)
 
-        console.print(f"[bold blue]Starting review for PR #{pr_number} in {repo_name}...[/bold blue]")
+        if ref.provider == "local":
+            # There is nowhere to post to; comments are only printed
+            dry_run = True
+            console.print(f"[bold blue]Starting review of {ref.rev_range} in {ref.repo_name}...[/bold blue]")
+        else:
+            console.print(f"[bold blue]Starting review for PR #{ref.pr_number} in {ref.repo_name}...[/bold blue]")
 
         # Initialize components
         llm_client = OpenAIClient(settings)
-        analyzer = Analyzer(settings, llm_client)
+        reviewer = PullRequestReviewer(settings, Analyzer(settings, llm_client), ClientPool(settings))
 
-        # Fetch PR details
-        with console.status("[bold green]Fetching PR details...[/bold green]"):
-            pr_details = client.get_pr_details(repo_name, pr_number)
-            
-        console.print(f"Found PR: [bold]{pr_details.title}[/bold] by {pr_details.author}")
-        if hasattr(pr_details, 'files'): # Basic check
-             console.print(f"Files changed: {len(pr_details.files)}")
+        # Show comments as they are streamed in
+        def show_comment(comment):
+            console.print(
+                f"[cyan]{comment.file_path}[/cyan]:[magenta]{comment.line_number}[/magenta] "
+                f"[yellow]{comment.type}[/yellow]/[red]{comment.severity}[/red] {escape(comment.content)}",
+                highlight=False,
+            )
 
-        # Analyze PR
-        with console.status("[bold green]Analyzing code changes...[/bold green]"):
-            result = analyzer.analyze_pr(pr_details)
+        with console.status("[bold green]Reviewing code changes...[/bold green]"):
+            outcome = reviewer.review(
+                ref, post=not dry_run, full=full, on_comment=None if no_stream else show_comment
+            )
+        pr_details, result = outcome.pr_details, outcome.result
+
+        console.print(f"Found PR: [bold]{pr_details.title}[/bold] by {pr_details.author}")
+        console.print(f"Files changed: {len(pr_details.files)}")
+        if outcome.previous_head_sha:
+            console.print(f"Incremental review since {outcome.previous_head_sha[:12]}")
 
         # Output results
         console.print("\n[bold]Review Summary:[/bold]")
@@ -163,25 +148,213 @@ def review(
             
             console.print(table)
             
-            # Post comments if not dry run
-            if not dry_run:
-                with console.status("[bold green]Posting comments to Provider...[/bold green]"):
-                    summary_body = "### Branchwise Code Review\n\n" + result.summary
-                    client.post_comment(repo_name, pr_number, summary_body)
-                    
-                    # Inline comments logic would go here if specialized per provider
-                    
-                    console.print("[bold green]Comments posted successfully![/bold green]")
+            # Only this run's findings are posted; carried ones are already on the PR
+            if not result.new_comments:
+                console.print("[green]No new findings to post.[/green]")
+            elif outcome.posted:
+                console.print("[bold green]Comments posted successfully![/bold green]")
             else:
                 console.print("[yellow]Dry run mode: Comments were not posted.[/yellow]")
-        else:
+        elif not result.failed_files:
             console.print("[green]No issues found![/green]")
 
+        if result.failed_files:
+            console.print(f"[bold yellow]Not analyzed:[/bold yellow] {', '.join(result.failed_files)}")
+        if result.unreviewed_files:
+            console.print(
+                f"[bold yellow]Not reviewed (comment limit reached):[/bold yellow] {', '.join(result.unreviewed_files)}"
+            )
+
+        _export_metrics(result.metrics, ref, metrics_json, metrics_prom)
+
     except Exception as e:
         console.print(f"[bold red]An error occurred:[/bold red] {e}")
         # if verbose:
         logger.exception(e)
         raise typer.Exit(code=1)
 
+@app.command("review-batch")
+def review_batch(
+    source: str = typer.Argument("-", help="File with one PR URL per line, or - to read from stdin"),
+    workers: int = typer.Option(4, "--workers", "-w", min=1, help="Number of PRs reviewed in parallel"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Do not post comments"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Do not read or write the LLM response cache"),
+    full: bool = typer.Option(False, "--full", help="Re-review every file instead of only what changed since the last review"),
+):
+    """
+    Review many pull requests in one process.
+    Clients are shared per host, and one JSON line is printed per PR as it finishes.
+    """
+    from branchwise.config import load_settings
+    from branchwise.core.analyzer import Analyzer
+    from branchwise.core.reviewer import PullRequestReviewer
+    from branchwise.integrations.factory import ClientPool
+    from branchwise.llm.client import OpenAIClient
+
+    settings = load_settings()
+    if no_cache:
+        settings.cache.enabled = False
+
+    urls = _read_pr_urls(sys.stdin if source == "-" else open(source, encoding="utf-8"))
+    # One LLM client for the whole batch, so its concurrency limit covers every PR
+    llm_client = OpenAIClient(settings, max_concurrency=settings.rules.max_workers * workers)
+    reviewer = PullRequestReviewer(settings, Analyzer(settings, llm_client), ClientPool(settings))
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="branchwise-batch") as executor:
+        futures = [executor.submit(_review_batch_item, url, settings, reviewer, dry_run, full) for url in urls]
+        for future in as_completed(futures):
+            record = future.result()
+            if record["status"] != "ok":
+                failures += 1
+            typer.echo(json.dumps(record))
+
+    logger.info(f"Reviewed {len(urls) - failures} of {len(urls)} pull requests")
+    if failures:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def serve(
+    host: Optional[str] = typer.Option(None, "--host", help="Address to bind (default: BRANCHWISE_SERVER__HOST)"),
+    port: Optional[int] = typer.Option(None, "--port", help="Port to listen on (default: BRANCHWISE_SERVER__PORT)"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", min=1, help="Number of PRs reviewed concurrently"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="Review webhook events without posting comments"),
+):
+    """
+    Run a webhook server that reviews pull requests as events arrive.
+    """
+    from branchwise.config import load_settings
+    from branchwise.core.analyzer import Analyzer
+    from branchwise.core.reviewer import PullRequestReviewer
+    from branchwise.integrations.factory import ClientPool
+    from branchwise.llm.client import OpenAIClient
+    from branchwise.server.app import ReviewServer
+
+    settings = load_settings()
+    if host is not None:
+        settings.server.host = host
+    if port is not None:
+        settings.server.port = port
+    if workers is not None:
+        settings.server.workers = workers
+    if not settings.server.webhook_secret:
+        logger.warning("No webhook secret configured; payload signatures will not be verified.")
+
+    llm_client = OpenAIClient(settings, max_concurrency=settings.rules.max_workers * settings.server.workers)
+    reviewer = PullRequestReviewer(settings, Analyzer(settings, llm_client), ClientPool(settings))
+    server = ReviewServer(settings, reviewer, post=not dry_run)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+
+
+@app.command()
+def benchmark(
+    output: Optional[str] = typer.Option(None, "--output", "-o", help="Write results to this JSON file instead of stdout"),
+    only: Optional[List[str]] = typer.Option(None, "--only", help="Run benchmarks whose name contains this (repeatable)"),
+    files: int = typer.Option(50, help="Files in the synthetic PR"),
+    hunks: int = typer.Option(5, help="Hunks per file"),
+    lines: int = typer.Option(20, help="Lines per hunk"),
+    llm_latency: float = typer.Option(0.0, help="Seconds per fake LLM request"),
+    vcs_latency: float = typer.Option(0.0, help="Seconds per fake VCS call"),
+    workers: int = typer.Option(4, help="Value of rules.max_workers for the end-to-end run"),
+    repeat: int = typer.Option(5, min=1, help="Timed repetitions per benchmark"),
+):
+    """
+    Measure parsing, prompt building and end-to-end analysis offline.
+    """
+    from branchwise.benchmarks.suite import BenchmarkConfig, run_suite
+
+    config = BenchmarkConfig(
+        files=files,
+        hunks_per_file=hunks,
+        lines_per_hunk=lines,
+        llm_latency=llm_latency,
+        vcs_latency=vcs_latency,
+        max_workers=workers,
+        repeat=repeat,
+    )
+    report = json.dumps(run_suite(config, only), indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+        console.print(f"Benchmark results written to {output}")
+    else:
+        typer.echo(report)
+
+
+def _read_pr_urls(lines) -> List[str]:
+    """PR URLs from `lines`, skipping blanks, comments and duplicates."""
+    with lines:
+        urls = [line.strip() for line in lines]
+    return list(dict.fromkeys(url for url in urls if url and not url.startswith("#")))
+
+
+def _review_batch_item(
+    pr_url: str,
+    settings: "Settings",
+    reviewer: "PullRequestReviewer",
+    dry_run: bool,
+    full: bool,
+) -> dict:
+    """Review one PR of a batch. Errors are reported in the result instead of raised."""
+    from branchwise.integrations.factory import parse_pr_url
+
+    started = time.monotonic()
+    record = {"url": pr_url}
+    try:
+        ref = parse_pr_url(pr_url, settings)
+        record.update(repo=ref.repo_name, pr_number=ref.pr_number)
+        token_error = _missing_token(ref, settings)
+        if token_error:
+            raise ValueError(token_error)
+
+        outcome = reviewer.review(ref, post=not dry_run, full=full)
+        result = outcome.result
+
+        record.update(
+            status="ok",
+            title=outcome.pr_details.title,
+            summary=result.summary,
+            comments=[comment.model_dump() for comment in result.comments],
+            failed_files=result.failed_files,
+            skipped_files=result.skipped_files,
+            unreviewed_files=result.unreviewed_files,
+            posted=outcome.posted,
+            metrics=result.metrics.model_dump(),
+        )
+    except Exception as e:
+        logger.error(f"Review of {pr_url} failed: {e}")
+        record.update(status="error", error=str(e))
+
+    record["duration_s"] = round(time.monotonic() - started, 3)
+    return record
+
+
+def _export_metrics(metrics, ref: "PullRequestRef", json_path: Optional[str], prom_path: Optional[str]):
+    """Write review metrics where requested. Export problems never fail a review."""
+    from branchwise.utils.metrics import to_prometheus, write_textfile
+
+    try:
+        if json_path:
+            write_textfile(json_path, metrics.model_dump_json(indent=2) + "\n")
+        if prom_path:
+            labels = {"provider": ref.provider, "repo": ref.repo_name, "pr": str(ref.pr_number)}
+            write_textfile(prom_path, to_prometheus(metrics, labels))
+    except OSError as e:
+        logger.warning(f"Could not write metrics: {e}")
+
+
+def _missing_token(ref: "PullRequestRef", settings: "Settings") -> Optional[str]:
+    """Error message if the provider of `ref` needs a token that is not configured."""
+    if ref.provider == "gitlab" and not settings.gitlab.token:
+        return "GitLab token not found. Please set BRANCHWISE_GITLAB_TOKEN."
+    if ref.provider == "bitbucket" and not settings.bitbucket.token:
+        return "Bitbucket token not found."
+    return None
+
+
 if __name__ == "__main__":
     app()
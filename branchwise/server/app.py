@@ -0,0 +1,177 @@
+"""
+Long-running webhook server.
+
+Webhook deliveries are turned into jobs on an in-process queue and reviewed
+by a pool of worker threads that share warm VCS and LLM clients, so each
+event costs neither interpreter startup nor fresh connections. Only
+connections are shared: each job fetches the pull request again, so a
+review is always made and posted against the head of its own push.
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from branchwise.config import Settings
+from branchwise.core.reviewer import PullRequestReviewer
+from branchwise.server.webhooks import WebhookEvent, parse_webhook, verify_signature
+
+logger = logging.getLogger(__name__)
+
+
+class ReviewQueue:
+    """
+    FIFO of review jobs that coalesces duplicate events.
+
+    An event for a PR and head SHA that is already queued or being reviewed
+    is dropped. A newer head SHA replaces the queued job for that PR, and a
+    PR is never reviewed by two workers at once.
+    """
+
+    def __init__(self):
+        self._pending: "OrderedDict[str, WebhookEvent]" = OrderedDict()
+        self._running: Dict[str, str] = {}  # PR key -> head SHA
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def submit(self, event: WebhookEvent) -> bool:
+        """Queue `event`; returns False if it duplicates queued or running work."""
+        with self._cond:
+            queued = self._pending.get(event.key)
+            if self._running.get(event.key) == event.head_sha or (queued and queued.head_sha == event.head_sha):
+                return False
+            if queued:
+                logger.info(f"Superseding queued review of {event.key} at {queued.head_sha[:12]}")
+            self._pending[event.key] = event
+            self._cond.notify()
+            return True
+
+    def get(self) -> Optional[WebhookEvent]:
+        """Block until a job is available; returns None once the queue is closed."""
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                for key, event in self._pending.items():
+                    if key not in self._running:
+                        del self._pending[key]
+                        self._running[key] = event.head_sha
+                        return event
+                self._cond.wait()
+
+    def task_done(self, event: WebhookEvent):
+        with self._cond:
+            self._running.pop(event.key, None)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"pending": len(self._pending), "running": len(self._running)}
+
+
+class ReviewServer:
+    """HTTP webhook endpoint plus the worker pool that drains the review queue."""
+
+    def __init__(self, settings: Settings, reviewer: PullRequestReviewer, post: bool = True):
+        self.settings = settings
+        self.reviewer = reviewer
+        self.post = post
+        self.queue = ReviewQueue()
+        self.httpd = ThreadingHTTPServer((settings.server.host, settings.server.port), _make_handler(self))
+        self._workers: List[threading.Thread] = []
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def start_workers(self):
+        for index in range(max(1, self.settings.server.workers)):
+            worker = threading.Thread(target=self._work, name=f"branchwise-worker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def serve_forever(self):
+        self.start_workers()
+        host, port = self.address[:2]
+        logger.info(f"Listening for webhooks on http://{host}:{port}/ with {len(self._workers)} workers")
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.queue.close()
+        self.httpd.server_close()
+
+    def handle_delivery(self, headers, body: bytes) -> Tuple[int, dict]:
+        """Validate and enqueue one webhook delivery; returns (HTTP status, response body)."""
+        secret = self.settings.server.webhook_secret
+        if secret and not verify_signature(headers, body, secret.get_secret_value()):
+            return 401, {"error": "invalid signature"}
+        try:
+            event = parse_webhook(headers, body)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        if event is None:
+            return 200, {"queued": False, "reason": "ignored event"}
+
+        queued = self.queue.submit(event)
+        if queued:
+            logger.info(f"Queued review of {event.key} at {event.head_sha[:12]}")
+        return 202, {"queued": queued, "pr": event.key, "head_sha": event.head_sha}
+
+    def _work(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+            try:
+                outcome = self.reviewer.review(event.ref, post=self.post)
+                logger.info(f"Reviewed {event.key}: {len(outcome.result.comments)} comments")
+            except Exception as e:
+                logger.error(f"Review of {event.key} failed: {e}")
+            finally:
+                self.queue.task_done(event)
+
+
+def _make_handler(server: ReviewServer):
+    max_bytes = server.settings.server.max_payload_mb * 1024 * 1024
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") in ("", "/healthz"):
+                self._reply(200, {"status": "ok", **server.queue.stats()})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            header = self.headers.get("Content-Length") or "0"
+            length = int(header) if header.isdigit() else -1
+            if length < 0:
+                self._reply(400, {"error": "invalid Content-Length"})
+                return
+            if length > max_bytes:
+                self._reply(413, {"error": "payload too large"})
+                return
+            status, payload = server.handle_delivery(self.headers, self.rfile.read(length))
+            self._reply(status, payload)
+
+        def _reply(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    return WebhookHandler
@@ -0,0 +1,133 @@
+"""
+Pull request webhook payloads from GitHub, GitLab and Bitbucket.
+"""
+import hashlib
+import hmac
+import json
+import logging
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+
+from branchwise.integrations.factory import PullRequestRef
+
+logger = logging.getLogger(__name__)
+
+# Actions after which the pull request has new code to review
+GITHUB_ACTIONS = {"opened", "reopened", "synchronize", "ready_for_review"}
+GITLAB_ACTIONS = {"open", "reopen", "update"}
+# Bitbucket Server / Data Center. Cloud events ("pullrequest:*") are rejected:
+# the Bitbucket client speaks the Server REST API, which Cloud does not serve.
+BITBUCKET_EVENTS = {"pr:opened", "pr:from_ref_updated"}
+BITBUCKET_CLOUD_PREFIX = "pullrequest:"
+
+
+class WebhookEvent(BaseModel):
+    """A pull request that needs a review at a given head commit."""
+    ref: PullRequestRef
+    head_sha: str
+
+    @property
+    def key(self) -> str:
+        return self.ref.url
+
+
+def _header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def detect_provider(headers: Mapping[str, str]) -> Optional[str]:
+    if _header(headers, "X-GitHub-Event"):
+        return "github"
+    if _header(headers, "X-Gitlab-Event"):
+        return "gitlab"
+    if _header(headers, "X-Event-Key"):
+        return "bitbucket"
+    return None
+
+
+def verify_signature(headers: Mapping[str, str], body: bytes, secret: str) -> bool:
+    """
+    Check the payload against the shared secret: an HMAC-SHA256 signature for
+    GitHub and Bitbucket, the secret token itself for GitLab.
+    """
+    token = _header(headers, "X-Gitlab-Token")
+    if token is not None:
+        return hmac.compare_digest(token, secret)
+
+    signature = _header(headers, "X-Hub-Signature-256") or _header(headers, "X-Hub-Signature")
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature, expected)
+
+
+def _ref(provider: str, url: str, repo_name: str, pr_number: int) -> PullRequestRef:
+    url = url.rstrip("/")
+    return PullRequestRef(
+        url=url, provider=provider, host=urlparse(url).netloc, repo_name=repo_name, pr_number=int(pr_number)
+    )
+
+
+def _github_event(event: str, payload: Dict[str, Any]) -> Optional[WebhookEvent]:
+    if event != "pull_request" or payload.get("action") not in GITHUB_ACTIONS:
+        return None
+    pr = payload["pull_request"]
+    if pr.get("draft"):
+        return None
+    ref = _ref("github", pr["html_url"], pr["base"]["repo"]["full_name"], pr["number"])
+    return WebhookEvent(ref=ref, head_sha=pr["head"]["sha"])
+
+
+def _gitlab_event(event: str, payload: Dict[str, Any]) -> Optional[WebhookEvent]:
+    if event != "Merge Request Hook":
+        return None
+    attributes = payload["object_attributes"]
+    action = attributes.get("action")
+    # "update" also fires for title or label edits; only new commits carry `oldrev`
+    if action not in GITLAB_ACTIONS or (action == "update" and not attributes.get("oldrev")):
+        return None
+    ref = _ref("gitlab", attributes["url"], payload["project"]["path_with_namespace"], attributes["iid"])
+    return WebhookEvent(ref=ref, head_sha=attributes["last_commit"]["id"])
+
+
+def _bitbucket_event(event: str, payload: Dict[str, Any]) -> Optional[WebhookEvent]:
+    if event not in BITBUCKET_EVENTS:
+        return None
+    pr = payload["pullRequest"]
+    repository = pr["toRef"]["repository"]
+    repo_name = f"{repository['project']['key']}/{repository['slug']}"
+    ref = _ref("bitbucket", pr["links"]["self"][0]["href"], repo_name, pr["id"])
+    return WebhookEvent(ref=ref, head_sha=pr["fromRef"]["latestCommit"])
+
+
+_PARSERS = {
+    "github": ("X-GitHub-Event", _github_event),
+    "gitlab": ("X-Gitlab-Event", _gitlab_event),
+    "bitbucket": ("X-Event-Key", _bitbucket_event),
+}
+
+
+def parse_webhook(headers: Mapping[str, str], body: bytes) -> Optional[WebhookEvent]:
+    """
+    Turn a webhook delivery into a review job.
+    Returns None for events that do not call for a review; raises ValueError
+    for payloads that cannot be read.
+    """
+    provider = detect_provider(headers)
+    if provider is None:
+        raise ValueError("Unrecognized webhook: no provider event header")
+
+    header, parser = _PARSERS[provider]
+    event = _header(headers, header)
+    if provider == "bitbucket" and event.startswith(BITBUCKET_CLOUD_PREFIX):
+        raise ValueError("Bitbucket Cloud webhooks are not supported; use Bitbucket Server or Data Center")
+    try:
+        return parser(event, json.loads(body))
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise ValueError(f"Malformed {provider} webhook payload: {e}") from e
@@ -1,8 +1,14 @@
 import re
-from typing import List, Optional, Tuple
+from array import array
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
 from pydantic import BaseModel
 
+from branchwise.integrations.base import PullRequestFile
+
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+FULL_BLOB_ID_RE = re.compile(r"[0-9a-f]{40}|[0-9a-f]{64}")
+
 
 class FileChange(BaseModel):
     """Represents a change in a file."""
@@ -10,59 +16,233 @@ class FileChange(BaseModel):
     new_line_start: int
     lines: List[Tuple[str, Optional[int]]]  # (content, new_line_number)
 
+    def iter_lines(self) -> Iterator[Tuple[str, Optional[int]]]:
+        return iter(self.lines)
+
+
+class Hunk:
+    """
+    Compact hunk produced by `DiffParser.iter_hunks`.
+
+    Line contents are kept in a plain list and new-file line numbers in an
+    `array` (0 marks a removed line), instead of a tuple per line.
+    """
+    __slots__ = ("old_line_start", "new_line_start", "texts", "numbers")
+
+    def __init__(self, old_line_start: int, new_line_start: int):
+        self.old_line_start = old_line_start
+        self.new_line_start = new_line_start
+        self.texts: List[str] = []
+        self.numbers = array("l")
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def iter_lines(self) -> Iterator[Tuple[str, Optional[int]]]:
+        """Yield (content, new_line_number) pairs, with None for removed lines."""
+        for text, number in zip(self.texts, self.numbers):
+            yield text, number or None
+
+    @property
+    def lines(self) -> List[Tuple[str, Optional[int]]]:
+        return list(self.iter_lines())
+
+    def to_file_change(self) -> FileChange:
+        return FileChange(
+            old_line_start=self.old_line_start,
+            new_line_start=self.new_line_start,
+            lines=self.lines
+        )
+
+
+def _iter_lines(source: Union[str, IO[str], Iterable[str]]) -> Iterator[str]:
+    """Yield lines without their terminators, without materializing a list."""
+    if isinstance(source, str):
+        start = 0
+        length = len(source)
+        while start < length:
+            end = source.find("\n", start)
+            if end == -1:
+                end = length
+            line = source[start:end]
+            yield line[:-1] if line.endswith("\r") else line
+            start = end + 1
+    else:
+        for line in source:
+            yield line.rstrip("\r\n")
+
+
 class DiffParser:
     """Parses git patches into structured file changes."""
-    
+
+    @staticmethod
+    def iter_hunks(source: Union[str, IO[str], None]) -> Iterator[Hunk]:
+        """
+        Lazily parse a patch from a string or text file-like object.
+        Each hunk is yielded as soon as the next hunk header (or the end of input) is read.
+        """
+        if not source:
+            return
+
+        current_hunk: Optional[Hunk] = None
+        current_new_line_num = 0
+
+        for line in _iter_lines(source):
+            if line.startswith("@@"):
+                match = HUNK_HEADER_RE.match(line)
+                if match:
+                    if current_hunk:
+                        yield current_hunk
+
+                    current_new_line_num = int(match.group(3))
+                    current_hunk = Hunk(int(match.group(1)), current_new_line_num)
+                    continue
+
+            if current_hunk is None:
+                continue
+
+            current_hunk.texts.append(line)
+            if line.startswith("-"):
+                current_hunk.numbers.append(0)
+            else:
+                current_hunk.numbers.append(current_new_line_num)
+                current_new_line_num += 1
+
+        if current_hunk:
+            yield current_hunk
+
     @staticmethod
     def parse(patch: str) -> List[FileChange]:
         """
         Parses a git patch string into a list of FileChange objects.
         Each FileChange corresponds to a hunk in the patch.
         """
-        changes: List[FileChange] = []
-        if not patch:
-            return changes
-            
-        hunk_header_re = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
-        
-        lines = patch.splitlines()
-        current_hunk: Optional[FileChange] = None
-        current_new_line_num = 0
-        
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            match = hunk_header_re.match(line)
-            
-            if match:
-                if current_hunk:
-                    changes.append(current_hunk)
-                
-                old_start = int(match.group(1))
-                new_start = int(match.group(3))
-                current_new_line_num = new_start
-                
-                current_hunk = FileChange(
-                    old_line_start=old_start,
-                    new_line_start=new_start,
-                    lines=[]
-                )
-                i += 1
-                continue
-            
-            if current_hunk:
+        return [hunk.to_file_change() for hunk in DiffParser.iter_hunks(patch)]
+
+    @staticmethod
+    def iter_files(
+        source: Union[str, Iterable[str], None],
+        blob_url: Optional[Callable[[str], str]] = None,
+    ) -> Iterator[PullRequestFile]:
+        """
+        Split a whole-PR unified diff into per-file `PullRequestFile`s in one pass.
+
+        Understands `diff --git` headers, new/deleted file modes, renames and
+        copies, binary markers and `/dev/null` paths, as well as plain unified
+        diffs without git headers. Each file's patch starts at its first hunk
+        header, matching what the hosting APIs return per file. `blob_url`
+        maps a file name to its URL; it defaults to an empty string.
+        """
+        if not source:
+            return
+
+        current: Optional[dict] = None
+        patch_lines: List[str] = []
+        remaining_old = remaining_new = 0
+
+        def build() -> PullRequestFile:
+            filename = current["new"] or current["old"] or ""
+            status = current["status"]
+            return PullRequestFile(
+                filename=filename,
+                status=status,
+                patch="\n".join(patch_lines) if patch_lines else None,
+                blob_url=blob_url(filename) if blob_url else "",
+                previous_filename=current["old"] if status in ("renamed", "copied") else None,
+                blob_sha=current["blob"],
+            )
+
+        def start(old: Optional[str], new: Optional[str]) -> dict:
+            return {"old": old, "new": new, "status": "modified", "blob": None}
+
+        for line in _iter_lines(source):
+            if remaining_old > 0 or remaining_new > 0:
+                # Inside a hunk the header counts say exactly how many lines belong to it
+                patch_lines.append(line)
                 if line.startswith("+"):
-                    current_hunk.lines.append((line, current_new_line_num))
-                    current_new_line_num += 1
+                    remaining_new -= 1
                 elif line.startswith("-"):
-                    current_hunk.lines.append((line, None))
+                    remaining_old -= 1
+                elif not line.startswith("\\"):
+                    remaining_old -= 1
+                    remaining_new -= 1
+                continue
+
+            if line.startswith("diff --git "):
+                if current:
+                    yield build()
+                current = start(*_split_git_header(line[len("diff --git "):]))
+                patch_lines = []
+                continue
+
+            if current is not None and line.startswith("@@"):
+                match = HUNK_HEADER_RE.match(line)
+                if match:
+                    remaining_old = int(match.group(2)) if match.group(2) is not None else 1
+                    remaining_new = int(match.group(4)) if match.group(4) is not None else 1
+                    patch_lines.append(line)
+                    continue
+
+            if line.startswith("\\") and patch_lines:
+                # "\ No newline at end of file" after the last line of a hunk
+                patch_lines.append(line)
+            elif line.startswith("--- "):
+                path = _strip_diff_path(line[4:])
+                if current is None or patch_lines:
+                    # Plain unified diff: the "---" line opens the next file
+                    if current:
+                        yield build()
+                    current = start(path, None)
+                    patch_lines = []
                 else:
-                    current_hunk.lines.append((line, current_new_line_num))
-                    current_new_line_num += 1
-            
-            i += 1
-            
-        if current_hunk:
-            changes.append(current_hunk)
-            
-        return changes
+                    current["old"] = path
+                if path is None:
+                    current["status"] = "added"
+            elif current is None:
+                continue
+            elif line.startswith("+++ "):
+                path = _strip_diff_path(line[4:])
+                if path is None:
+                    current["status"] = "removed"
+                else:
+                    current["new"] = path
+            elif line.startswith("new file mode"):
+                current["status"] = "added"
+            elif line.startswith("deleted file mode"):
+                current["status"] = "removed"
+            elif line.startswith(("rename from ", "copy from ")):
+                current["old"] = line.split(" from ", 1)[1]
+                current["status"] = "renamed" if line.startswith("rename") else "copied"
+            elif line.startswith(("rename to ", "copy to ")):
+                current["new"] = line.split(" to ", 1)[1]
+            elif line.startswith("index "):
+                # Only full ids (`git diff --full-index`) are usable as blob ids
+                new_blob = line[6:].split(" ", 1)[0].partition("..")[2]
+                if FULL_BLOB_ID_RE.fullmatch(new_blob) and new_blob.strip("0"):
+                    current["blob"] = new_blob
+
+        if current:
+            yield build()
+
+
+def _strip_diff_path(path: str) -> Optional[str]:
+    """Normalize a path from a ---/+++ line; None for /dev/null."""
+    path = path.split("\t", 1)[0].strip()
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def _split_git_header(rest: str) -> Tuple[Optional[str], Optional[str]]:
+    """Best-effort split of `a/<old> b/<new>`; ---/+++ and rename lines refine it later."""
+    if rest.startswith('"'):
+        old, _, new = rest[1:].partition('" ')
+        return _strip_diff_path(old), _strip_diff_path(new)
+    index = rest.find(" b/")
+    if index == -1:
+        return None, None
+    return _strip_diff_path(rest[:index]), _strip_diff_path(rest[index + 1:])
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """
+    A small content-addressed key/value store on disk.
+
+    Entries are files named after the SHA-256 of their key. Reads refresh the
+    entry's mtime, so eviction by mtime is least-recently-used. Entries older
+    than `ttl_seconds` are treated as missing, and the oldest entries are
+    removed once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def digest(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        digest = self.digest(key)
+        return self.directory / digest[:2] / digest
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for `key`, or None if missing or expired."""
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if self.ttl_seconds is not None and time.time() - stat.st_mtime > self.ttl_seconds:
+                self._remove(path, stat.st_size)
+                return None
+            data = path.read_bytes()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read cache entry {path}: {e}")
+            return None
+
+    def set(self, key: str, value: bytes):
+        """Store `value` under `key`, evicting old entries if over the size limit."""
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so readers never see partial entries
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp_name, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {path}: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(value)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path: Path, size: int):
+        try:
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self):
+        if not self.directory.exists():
+            return []
+        entries = []
+        for path in self.directory.glob("??/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is at 90% of its limit."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        now = time.time()
+        for mtime, size, path in entries:
+            expired = self.ttl_seconds is not None and now - mtime > self.ttl_seconds
+            if total <= target and not expired:
+                continue
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._size = total
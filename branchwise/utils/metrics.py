@@ -0,0 +1,162 @@
+"""
+Per-review instrumentation.
+
+`MetricsRecorder` collects stage durations and one `LLMCallMetrics` per LLM
+request. The LLM clients add token usage, retries and cache hits to the
+call in progress through the `current_llm_call` context variable, so no
+metrics object has to be threaded through their interfaces.
+"""
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, computed_field
+
+
+class LLMCallMetrics(BaseModel):
+    """One LLM request, covering one or more files."""
+    files: List[str]
+    latency_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    cached: bool = False
+    failed: bool = False
+
+
+class ReviewMetrics(BaseModel):
+    """Where the time and tokens of one review went."""
+    stages: Dict[str, float] = {}  # Stage name -> seconds
+    llm_calls: List[LLMCallMetrics] = []
+    first_comment_s: Optional[float] = None  # From the start of the analysis, when comments are streamed
+
+    @computed_field
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(call.prompt_tokens for call in self.llm_calls)
+
+    @computed_field
+    @property
+    def completion_tokens(self) -> int:
+        return sum(call.completion_tokens for call in self.llm_calls)
+
+    @computed_field
+    @property
+    def retries(self) -> int:
+        return sum(call.retries for call in self.llm_calls)
+
+    def file_latencies(self) -> Dict[str, float]:
+        """LLM latency per file; files sharing a batched request share its latency."""
+        latencies: Dict[str, float] = {}
+        for call in self.llm_calls:
+            for file in call.files:
+                latencies[file] = latencies.get(file, 0.0) + call.latency_s
+        return latencies
+
+
+current_llm_call: ContextVar[Optional[LLMCallMetrics]] = ContextVar("current_llm_call", default=None)
+
+
+class MetricsRecorder:
+    """Thread-safe collector for the metrics of one review."""
+
+    def __init__(self, metrics: Optional[ReviewMetrics] = None):
+        self.metrics = metrics or ReviewMetrics()
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def comment_emitted(self):
+        """Note that a comment was handed out; only the first one is recorded."""
+        with self._lock:
+            if self.metrics.first_comment_s is None:
+                self.metrics.first_comment_s = time.perf_counter() - self._started
+
+    def add_stage(self, name: str, seconds: float):
+        with self._lock:
+            self.metrics.stages[name] = self.metrics.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    @contextmanager
+    def llm_call(self, files: List[str]) -> Iterator[LLMCallMetrics]:
+        """Time one LLM request and make it the `current_llm_call` of this thread or task."""
+        call = LLMCallMetrics(files=files)
+        token = current_llm_call.set(call)
+        start = time.perf_counter()
+        try:
+            yield call
+        except BaseException:
+            call.failed = True
+            raise
+        finally:
+            call.latency_s = time.perf_counter() - start
+            current_llm_call.reset(token)
+            with self._lock:
+                self.metrics.llm_calls.append(call)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def to_prometheus(metrics: ReviewMetrics, labels: Optional[Dict[str, str]] = None) -> str:
+    """Render metrics in the Prometheus text exposition format."""
+    labels = labels or {}
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help_text: str, samples: List[tuple]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for extra, value in samples:
+            lines.append(f"{name}{_labels({**labels, **extra})} {value}")
+
+    calls = metrics.llm_calls
+    family("branchwise_stage_duration_seconds", "gauge", "Time spent in each review stage.",
+           [({"stage": stage}, round(seconds, 6)) for stage, seconds in metrics.stages.items()])
+    family("branchwise_llm_requests", "gauge", "LLM requests made by the review.",
+           [({"outcome": "ok"}, sum(not c.failed and not c.cached for c in calls)),
+            ({"outcome": "cached"}, sum(c.cached for c in calls)),
+            ({"outcome": "failed"}, sum(c.failed for c in calls))])
+    family("branchwise_llm_request_duration_seconds", "gauge", "Total and slowest LLM request latency.",
+           [({"stat": "sum"}, round(sum(c.latency_s for c in calls), 6)),
+            ({"stat": "max"}, round(max((c.latency_s for c in calls), default=0.0), 6))])
+    family("branchwise_llm_tokens", "gauge", "Tokens used by the review.",
+           [({"kind": "prompt"}, metrics.prompt_tokens), ({"kind": "completion"}, metrics.completion_tokens)])
+    family("branchwise_llm_retries", "gauge", "LLM request retries.", [({}, metrics.retries)])
+    if metrics.first_comment_s is not None:
+        family("branchwise_time_to_first_comment_seconds", "gauge", "Time until the first streamed comment.",
+               [({}, round(metrics.first_comment_s, 6))])
+    family("branchwise_review_last_run_timestamp_seconds", "gauge", "When the review finished.",
+           [({}, int(time.time()))])
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: Path, content: str):
+    """Write atomically, so the node exporter never reads a half-written file."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
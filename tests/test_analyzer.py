@@ -57,3 +57,404 @@ def test_analyzer_aggregates_comments():
     assert len(result.comments) == 1
     assert result.comments[0].content == "Fix this"
     assert "foo.py" in result.summary
+
+def test_analyzer_concurrent_keeps_file_order():
+    mock_settings = Settings()
+    mock_settings.rules.max_workers = 4
+    mock_settings.llm.max_files_per_request = 1
+    mock_llm = Mock()
+
+    def analyze_diff(file_name, diff_content, context=None):
+        if file_name == "b.py":
+            raise RuntimeError("boom")
+        return [ReviewComment(file_path=file_name, line_number=1, content="Issue", type="bug", severity="minor")]
+
+    mock_llm.analyze_diff.side_effect = analyze_diff
+
+    analyzer = Analyzer(mock_settings, mock_llm)
+
+    files = [
+        PullRequestFile(filename=name, status="modified", patch="patch", blob_url="url")
+        for name in ["a.py", "b.py", "c.py", "d.py"]
+    ]
+    pr_details = PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha", files=files
+    )
+
+    result = analyzer.analyze_pr(pr_details)
+
+    # A failing file does not cancel the others and order is preserved
+    assert [c.file_path for c in result.comments] == ["a.py", "c.py", "d.py"]
+    assert result.summary.splitlines()[0].startswith("- a.py")
+    # ...and the failure is reported rather than passing as "no issues"
+    assert result.failed_files == ["b.py"]
+    assert "- b.py: could not be analyzed." in result.summary
+
+def test_review_pr_async_fetches_analyzes_and_posts():
+    import asyncio
+    from branchwise.integrations.base import AsyncVCSClient
+    from branchwise.llm.client import AsyncLLMClient
+
+    class FakeLLM(AsyncLLMClient):
+        async def analyze_diff(self, file_name, diff_content, context=None):
+            await asyncio.sleep(0)
+            return [ReviewComment(file_path=file_name, line_number=1, content="Issue", type="bug", severity="minor")]
+
+    class FakeVCS(AsyncVCSClient):
+        def __init__(self):
+            self.posted = []
+
+        async def get_pr_details(self, repo_name, pr_number):
+            files = [
+                PullRequestFile(filename=name, status="modified", patch="patch", blob_url="url")
+                for name in ["a.py", "b.py"]
+            ]
+            return PullRequestDetails(
+                number=pr_number, title="PR", description="", author="User", head_sha="sha", files=files
+            )
+
+        async def post_comment(self, repo_name, pr_number, body):
+            self.posted.append((repo_name, pr_number, body))
+
+    analyzer = Analyzer(Settings(), FakeLLM())
+    vcs = FakeVCS()
+
+    async def run():
+        return await asyncio.gather(*(analyzer.review_pr_async(vcs, "owner/repo", n) for n in (1, 2)))
+
+    results = asyncio.run(run())
+
+    assert [len(r.comments) for r in results] == [2, 2]
+    assert [c.file_path for c in results[0].comments] == ["a.py", "b.py"]
+    assert sorted(p[1] for p in vcs.posted) == [1, 2]
+    assert vcs.posted[0][2].startswith("### Branchwise Code Review")
+
+def test_analyzer_incremental_review_only_sends_new_hunks():
+    mock_settings = Settings()
+    mock_llm = Mock()
+    mock_llm.analyze_diff.return_value = [
+        ReviewComment(file_path="foo.py", line_number=2, content="Old issue", type="bug", severity="major")
+    ]
+    analyzer = Analyzer(mock_settings, mock_llm)
+
+    first_patch = "@@ -1,2 +1,2 @@\n-a\n+b\n c\n"
+    pr_file = PullRequestFile(filename="foo.py", status="modified", patch=first_patch, blob_url="url")
+    first = analyzer.analyze_pr(PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha1", files=[pr_file]
+    ))
+    assert first.state.head_sha == "sha1"
+
+    # The second push adds a hunk above the reviewed one, which now starts at line 8
+    second_patch = "@@ -1,1 +1,4 @@\n+x\n+y\n+z\n d\n@@ -5,2 +8,2 @@\n-a\n+b\n c\n"
+    mock_llm.analyze_diff.reset_mock()
+    mock_llm.analyze_diff.return_value = []
+    pr_file = PullRequestFile(filename="foo.py", status="modified", patch=second_patch, blob_url="url")
+    second = analyzer.analyze_pr(PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha2", files=[pr_file]
+    ), previous_state=first.state)
+
+    mock_llm.analyze_diff.assert_called_once()
+    sent_diff = mock_llm.analyze_diff.call_args.args[1]
+    assert "+x" in sent_diff and "+b" not in sent_diff
+
+    # The earlier comment is carried forward to its new position, but is not posted again
+    assert [(c.content, c.line_number) for c in second.comments] == [("Old issue", 9)]
+    assert len(first.new_comments) == 1 and second.new_comments == []
+
+    # Nothing new to review for the same head
+    mock_llm.analyze_diff.reset_mock()
+    third = analyzer.analyze_pr(PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha2", files=[pr_file]
+    ), previous_state=second.state)
+    mock_llm.analyze_diff.assert_not_called()
+    assert len(third.comments) == 1
+
+def test_planner_batches_small_files_and_splits_large_ones():
+    mock_settings = Settings()
+    mock_settings.llm.request_token_budget = 400
+    mock_settings.llm.context_lines = 0  # No context to reserve room for
+    mock_llm = Mock()
+    mock_llm.analyze_diff.return_value = []
+    mock_llm.analyze_batch.return_value = [
+        ReviewComment(file_path="b.cfg", line_number=1, content="Typo", type="style", severity="minor")
+    ]
+    analyzer = Analyzer(mock_settings, mock_llm)
+
+    small = "@@ -1,1 +1,1 @@\n-a\n+b\n"
+    big_hunk = "\n".join(f"+{'x' * 60}" for _ in range(12))
+    big = f"@@ -1,0 +1,12 @@\n{big_hunk}\n@@ -50,0 +62,12 @@\n{big_hunk}\n"
+    files = [
+        PullRequestFile(filename="a.cfg", status="modified", patch=small, blob_url="url"),
+        PullRequestFile(filename="b.cfg", status="modified", patch=small, blob_url="url"),
+        PullRequestFile(filename="big.py", status="modified", patch=big, blob_url="url"),
+    ]
+    result = analyzer.analyze_pr(PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha", files=files
+    ))
+
+    # Both small files share one request, the big file is split into two
+    mock_llm.analyze_batch.assert_called_once()
+    batched = mock_llm.analyze_batch.call_args.args[0]
+    assert [name for name, _ in batched] == ["a.cfg", "b.cfg"]
+    assert mock_llm.analyze_diff.call_count == 2
+    assert all(call.args[0] == "big.py" for call in mock_llm.analyze_diff.call_args_list)
+    assert [c.file_path for c in result.comments] == ["b.cfg"]
+
+
+def test_planner_reserves_room_for_each_files_context():
+    from branchwise.core.analyzer import RequestPlanner, estimate_tokens
+    settings = Settings()
+    settings.llm.request_token_budget = 12000
+    settings.llm.context_token_budget = 2000
+    settings.llm.max_files_per_request = 8
+    settings.rules.incremental = False
+    analyzer = Analyzer(settings, Mock())
+    patch = "@@ -1,20 +1,20 @@\n" + "".join(f"-{'a' * 40}\n+{'b' * 40}\n" for _ in range(20))
+    prepared = [
+        analyzer._prepare_file(PullRequestFile(filename=f"f{i}.py", status="modified", patch=patch, blob_url="url"), None, analyzer.path_rules)
+        for i in range(8)
+    ]
+
+    planner = RequestPlanner(settings)
+    requests = planner.plan(prepared)
+
+    assert len(requests) > 1
+    for request in requests:
+        diff_tokens = sum(estimate_tokens(segment.diff) for segment in request.segments)
+        assert diff_tokens + 2000 * len(request.segments) <= planner.budget
+
+
+def test_analyzer_streams_comments_to_callback():
+    settings = Settings()
+    settings.cache.enabled = False
+    settings.rules.incremental = False
+    comment = ReviewComment(file_path="foo.py", line_number=1, content="Fix this", type="bug", severity="major")
+    mock_llm = Mock()
+    mock_llm.stream_diff.side_effect = lambda name, diff, context=None: iter([comment])
+
+    pr_details = PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha",
+        files=[PullRequestFile(filename="foo.py", status="modified", patch="@@ -1 +1 @@\n+x", blob_url="url")],
+    )
+    seen = []
+    result = Analyzer(settings, mock_llm).analyze_pr(pr_details, on_comment=seen.append)
+
+    assert seen == [comment]
+    assert result.comments == [comment]
+    assert result.metrics.first_comment_s is not None
+    mock_llm.analyze_diff.assert_not_called()
+
+def test_analyzer_streams_requests_while_files_arrive():
+    import threading
+    settings = Settings()
+    settings.rules.max_workers = 2
+    settings.llm.max_files_per_request = 1
+    first_analyzed = threading.Event()
+    mock_llm = Mock()
+
+    def analyze_diff(file_name, diff_content, context=None):
+        first_analyzed.set()
+        return [ReviewComment(file_path=file_name, line_number=1, content="Issue", type="bug", severity="minor")]
+
+    mock_llm.analyze_diff.side_effect = analyze_diff
+
+    def files():
+        yield PullRequestFile(filename="a.py", status="modified", patch="@@ -1 +1 @@\n-a\n+b", blob_url="url")
+        # The first request is running before the next page has been fetched
+        assert first_analyzed.wait(5)
+        yield PullRequestFile(filename="b.lock", status="modified", patch="@@ -1 +1 @@\n-a\n+b", blob_url="url")
+        yield PullRequestFile(filename="c.py", status="modified", patch="@@ -1 +1 @@\n-a\n+b", blob_url="url")
+
+    settings.rules.ignore_files = [".lock"]
+    pr_details = PullRequestDetails(number=1, title="PR", description="", author="User", head_sha="sha", files=[])
+    result = Analyzer(settings, mock_llm).analyze_pr_stream(pr_details, files())
+
+    assert [c.file_path for c in result.comments] == ["a.py", "c.py"]
+    assert [f.filename for f in pr_details.files] == ["a.py", "b.lock", "c.py"]
+
+def test_streamed_review_holds_back_lower_focus_groups_under_a_comment_limit():
+    settings = Settings()
+    settings.rules.max_workers = 1
+    settings.rules.max_comments = 1
+    settings.rules.focus_files = ["auth/"]
+    settings.llm.max_files_per_request = 1
+    analyzed = []
+    mock_llm = Mock()
+
+    def analyze_diff(file_name, diff_content, context=None):
+        analyzed.append(file_name)
+        return [ReviewComment(file_path=file_name, line_number=1, content="Issue", type="bug", severity="major")]
+
+    mock_llm.analyze_diff.side_effect = analyze_diff
+    patch = "@@ -1 +1 @@\n-a\n+b\n"
+    files = (
+        PullRequestFile(filename=name, status="modified", patch=patch, blob_url="url")
+        for name in ["README.md", "util.py", "auth/login.py"]
+    )
+    pr_details = PullRequestDetails(number=1, title="PR", description="", author="User", head_sha="sha", files=[])
+    result = Analyzer(settings, mock_llm).analyze_pr_stream(pr_details, files)
+
+    # The focused file arrived last but is still reviewed first
+    assert analyzed == ["auth/login.py"]
+    assert "util.py" in result.unreviewed_files
+
+
+def test_analyzer_stops_at_max_comments_and_reports_unreviewed_files():
+    settings = Settings()
+    settings.rules.max_workers = 1
+    settings.rules.max_comments = 2
+    settings.rules.focus_files = []
+    settings.llm.max_files_per_request = 1
+    mock_llm = Mock()
+    mock_llm.analyze_diff.side_effect = lambda file_name, diff, context=None: [
+        ReviewComment(file_path=file_name, line_number=1, content="Issue", type="bug", severity=severity)
+        for severity in ("minor", "major", "critical")
+    ]
+
+    small = "@@ -1 +1 @@\n-a\n+b\n"
+    large = "@@ -1,3 +1,3 @@\n" + "".join(f"-{i}\n+{i}!\n" for i in range(3))
+    files = [
+        PullRequestFile(filename="docs/guide.txt", status="modified", patch=large, blob_url="url"),
+        PullRequestFile(filename="util.py", status="modified", patch=small, blob_url="url"),
+        PullRequestFile(filename="auth/login.py", status="modified", patch=small, blob_url="url"),
+    ]
+    result = Analyzer(settings, mock_llm).analyze_pr(PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha", files=files
+    ))
+
+    # The security-sensitive file goes first and fills the budget on its own
+    mock_llm.analyze_diff.assert_called_once()
+    assert mock_llm.analyze_diff.call_args.args[0] == "auth/login.py"
+    assert [c.severity for c in result.comments] == ["major", "critical"]
+    assert result.unreviewed_files == ["docs/guide.txt", "util.py"]
+    assert "- util.py: not reviewed (comment limit reached)." in result.summary
+    # Unreviewed hunks are left for the next incremental run
+    assert result.state.files["util.py"] == [] and len(result.state.files["auth/login.py"]) == 1
+
+
+def test_analyzer_async_cancels_lower_priority_requests_once_budget_is_full():
+    import asyncio
+    from branchwise.llm.client import AsyncLLMClient
+
+    started = []
+
+    class SlowClient(AsyncLLMClient):
+        async def analyze_diff(self, file_name, diff_content, context=None):
+            started.append(file_name)
+            if file_name != "a.py":
+                await asyncio.sleep(5)
+            return [ReviewComment(file_path=file_name, line_number=1, content="Issue", type="bug", severity="major")]
+
+        async def analyze_batch(self, diffs, contexts=None):
+            raise AssertionError("not batched")
+
+    settings = Settings()
+    settings.rules.max_workers = 2
+    settings.rules.max_comments = 1
+    settings.llm.max_files_per_request = 1
+    files = [
+        PullRequestFile(filename=name, status="modified", patch="@@ -1 +1 @@\n-a\n+b\n", blob_url="url")
+        for name in ["a.py", "b.py", "c.py"]
+    ]
+    pr_details = PullRequestDetails(number=1, title="PR", description="", author="User", head_sha="sha", files=files)
+
+    result = asyncio.run(asyncio.wait_for(Analyzer(settings, SlowClient()).analyze_pr_async(pr_details), 2))
+
+    assert started[0] == "a.py" and "c.py" not in started
+    assert [c.file_path for c in result.comments] == ["a.py"]
+    assert result.unreviewed_files == ["b.py", "c.py"]
+
+
+
+def _issue(file_name, severity="major", line=1):
+    return ReviewComment(file_path=file_name, line_number=line, content="Issue", type="bug", severity=severity)
+
+
+def test_analyzer_async_lets_a_slow_higher_priority_request_finish():
+    import asyncio
+    from branchwise.llm.client import AsyncLLMClient
+
+    class Client(AsyncLLMClient):
+        async def analyze_diff(self, file_name, diff_content, context=None):
+            if file_name == "a.py":
+                await asyncio.sleep(0.2)  # The riskiest request finishes last
+            return [_issue(file_name)]
+
+        async def analyze_batch(self, diffs, contexts=None):
+            raise AssertionError("not batched")
+
+    settings = Settings()
+    settings.rules.max_workers = 2
+    settings.rules.max_comments = 1
+    settings.llm.max_files_per_request = 1
+    files = [
+        PullRequestFile(filename=name, status="modified", patch="@@ -1 +1 @@\n-a\n+b\n", blob_url="url")
+        for name in ["a.py", "b.py", "c.py"]
+    ]
+    pr_details = PullRequestDetails(number=1, title="PR", description="", author="User", head_sha="sha", files=files)
+
+    result = asyncio.run(asyncio.wait_for(Analyzer(settings, Client()).analyze_pr_async(pr_details), 2))
+
+    assert [c.file_path for c in result.new_comments] == ["a.py"]
+    assert result.unreviewed_files == ["c.py"]
+
+
+def test_streaming_budget_stops_only_lower_priority_requests_and_keeps_their_comments():
+    import threading
+    settings = Settings()
+    settings.rules.max_workers = 2
+    settings.rules.max_comments = 2
+    settings.llm.max_files_per_request = 1
+    b_started, a_done = threading.Event(), threading.Event()
+    mock_llm = Mock()
+
+    def stream_diff(file_name, diff_content, context=None):
+        if file_name == "a.py":
+            assert b_started.wait(5)
+            yield _issue("a.py", line=1)
+            yield _issue("a.py", line=2)
+            a_done.set()
+        else:
+            yield _issue("b.py", severity="critical")
+            b_started.set()
+            assert a_done.wait(5)
+            yield _issue("b.py", line=2)
+
+    mock_llm.stream_diff.side_effect = stream_diff
+    files = [
+        PullRequestFile(filename=name, status="modified", patch="@@ -1 +1 @@\n-a\n+b\n", blob_url="url")
+        for name in ["a.py", "b.py"]
+    ]
+    pr_details = PullRequestDetails(number=1, title="PR", description="", author="User", head_sha="sha", files=files)
+
+    result = Analyzer(settings, mock_llm).analyze_pr(pr_details, on_comment=lambda comment: None)
+
+    # b.py was stopped after a.py filled the budget, but its first finding is kept and ranks by severity
+    assert [(c.file_path, c.line_number) for c in result.new_comments] == [("a.py", 1), ("b.py", 1)]
+    assert result.unreviewed_files == ["b.py"]
+
+
+def test_carried_comments_do_not_use_up_the_comment_budget():
+    settings = Settings()
+    settings.rules.max_workers = 1
+    settings.rules.max_comments = 2
+    mock_llm = Mock()
+    mock_llm.analyze_diff.side_effect = lambda file_name, diff, context=None: [
+        ReviewComment(file_path=file_name, line_number=1, content=f"Issue {i}", type="bug", severity="major")
+        for i in range(2)
+    ]
+    analyzer = Analyzer(settings, mock_llm)
+    a = PullRequestFile(filename="a.py", status="modified", patch="@@ -1 +1 @@\n-a\n+b\n", blob_url="url")
+    b = PullRequestFile(filename="b.py", status="modified", patch="@@ -1 +1 @@\n-c\n+d\n", blob_url="url")
+
+    first = analyzer.analyze_pr(PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha1", files=[a]
+    ))
+    second = analyzer.analyze_pr(PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha2", files=[a, b]
+    ), previous_state=first.state)
+
+    assert [call.args[0] for call in mock_llm.analyze_diff.call_args_list] == ["a.py", "b.py"]
+    assert second.unreviewed_files == []
+    assert [c.file_path for c in second.comments] == ["a.py", "a.py", "b.py", "b.py"]
+    assert "2 findings from earlier reviews still apply." in second.summary
@@ -0,0 +1,41 @@
+import json
+
+from branchwise.benchmarks.fakes import FakeLLMClient, FakeVCSClient
+from branchwise.benchmarks.suite import BENCHMARKS, BenchmarkConfig, run_suite
+from branchwise.benchmarks.synthetic import make_pr
+from branchwise.config import Settings
+from branchwise.core.analyzer import Analyzer
+from branchwise.utils.diff_parser import DiffParser
+
+
+def test_synthetic_pr_has_requested_shape():
+    pr = make_pr(files=3, hunks_per_file=4, lines_per_hunk=8, seed=1)
+    assert len(pr.files) == 3
+    hunks = DiffParser.parse(pr.files[0].patch)
+    assert len(hunks) == 4
+    assert all(len(hunk.lines) == 8 for hunk in hunks)
+    # Generation is deterministic
+    assert make_pr(3, 4, 8, seed=1) == pr
+
+
+def test_fakes_drive_an_end_to_end_review():
+    pr = make_pr(files=2, hunks_per_file=2, lines_per_hunk=8)
+    vcs = FakeVCSClient({("bench/repo", 1): pr})
+    settings = Settings()
+    settings.cache.enabled = False
+    result = Analyzer(settings, FakeLLMClient(comments_per_file=1)).analyze_pr(vcs.get_pr_details("bench/repo", 1))
+    assert [c.file_path for c in result.comments] == [f.filename for f in pr.files]
+
+
+def test_run_suite_produces_machine_readable_results():
+    config = BenchmarkConfig(files=2, hunks_per_file=2, lines_per_hunk=8, parse_hunks=10, response_comments=5, repeat=1)
+    report = json.loads(json.dumps(run_suite(config)))
+
+    assert report["schema"] == 1
+    assert [r["name"] for r in report["results"]] == list(BENCHMARKS)
+    for result in report["results"]:
+        assert 0 < result["min_s"] <= result["median_s"]
+        assert result["throughput"]
+    end_to_end = report["results"][-1]
+    assert end_to_end["peak_memory_kb"] > 0
+    assert run_suite(config, only=["parse_response"])["results"][0]["name"] == "openai_client.parse_response"
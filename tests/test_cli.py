@@ -1,15 +1,16 @@
 from unittest.mock import MagicMock, patch
 from typer.testing import CliRunner
 from branchwise.main import app
+from branchwise.core.analyzer import AnalysisResult
 from branchwise.integrations.base import PullRequestDetails, PullRequestFile
 from branchwise.llm.client import ReviewComment
 
 runner = CliRunner()
 
-@patch("branchwise.main.load_settings")
+@patch("branchwise.config.load_settings")
 @patch("branchwise.integrations.github.GitHubClient")
-@patch("branchwise.main.OpenAIClient")
-@patch("branchwise.main.Analyzer")
+@patch("branchwise.llm.client.OpenAIClient")
+@patch("branchwise.core.analyzer.Analyzer")
 def test_review_command_dry_run(mock_analyzer_cls, mock_openai_cls, mock_github_cls, mock_load_settings):
     # Setup Mocks
     mock_settings = MagicMock()
@@ -17,6 +18,8 @@ def test_review_command_dry_run(mock_analyzer_cls, mock_openai_cls, mock_github_
     mock_settings.gitlab.url = "https://gitlab.com"
     mock_settings.bitbucket.url = "https://bitbucket.org"
     mock_settings.llm.api_key = "key"
+    mock_settings.rules.incremental = False
+    mock_settings.llm.context_lines = 0
     mock_load_settings.return_value = mock_settings
 
     mock_github_instance = mock_github_cls.return_value
@@ -33,11 +36,8 @@ def test_review_command_dry_run(mock_analyzer_cls, mock_openai_cls, mock_github_
     mock_github_instance.get_pr_details.return_value = mock_pr_details
 
     mock_analyzer_instance = mock_analyzer_cls.return_value
-    mock_result = MagicMock()
-    mock_result.summary = "Good job!"
-    mock_result.comments = [
-        ReviewComment(file_path="test.py", line_number=1, content="Issue", type="bug", severity="minor")
-    ]
+    finding = ReviewComment(file_path="test.py", line_number=1, content="Issue", type="bug", severity="minor")
+    mock_result = AnalysisResult(summary="Good job!", comments=[finding], new_comments=[finding])
     mock_analyzer_instance.analyze_pr.return_value = mock_result
 
     # Run Command
@@ -58,10 +58,12 @@ def test_review_command_dry_run(mock_analyzer_cls, mock_openai_cls, mock_github_
     # Verify mock interactions
     mock_github_cls.assert_called_once()
     mock_github_instance.get_pr_details.assert_called_with("owner/repo", 123)
-    mock_analyzer_instance.analyze_pr.assert_called_with(mock_pr_details)
+    mock_analyzer_instance.analyze_pr.assert_called_once()
+    assert mock_analyzer_instance.analyze_pr.call_args.args[0] == mock_pr_details
     mock_github_instance.post_comment.assert_not_called()
+    mock_github_instance.post_review.assert_not_called()
 
-@patch("branchwise.main.load_settings")
+@patch("branchwise.config.load_settings")
 def test_review_command_invalid_url(mock_load_settings):
     mock_settings = MagicMock()
     mock_settings.github.token = "token"
@@ -75,3 +77,43 @@ def test_review_command_invalid_url(mock_load_settings):
     # Expect failure due to URL parsing
     assert result.exit_code == 1
     assert "Invalid PR URL format" in result.stdout or "Unsupported URL" in result.stdout
+
+@patch("branchwise.config.load_settings")
+@patch("branchwise.integrations.factory.create_client")
+@patch("branchwise.llm.client.OpenAIClient")
+@patch("branchwise.core.analyzer.Analyzer")
+def test_review_batch_streams_json_lines_and_reuses_clients(mock_analyzer_cls, mock_openai_cls, mock_create_client, mock_load_settings):
+    import json
+
+    mock_settings = MagicMock()
+    mock_settings.rules.incremental = False
+    mock_settings.llm.context_lines = 0
+    mock_settings.rules.max_workers = 2
+    mock_load_settings.return_value = mock_settings
+
+    mock_client = mock_create_client.return_value
+    mock_client.get_pr_details.side_effect = lambda repo, number: PullRequestDetails(
+        number=number, title=f"PR {number}", description="", author="User", head_sha="sha", files=[]
+    )
+    mock_analyzer_cls.return_value.analyze_pr.return_value = AnalysisResult(summary="ok", comments=[])
+
+    stdin = "\n".join([
+        "https://github.com/owner/repo/pull/1",
+        "# skipped",
+        "https://github.com/owner/repo/pull/2",
+        "https://github.com/owner/repo/pull/1",
+        "not-a-pr",
+    ])
+    result = runner.invoke(app, ["review-batch", "-", "--dry-run", "--workers", "2"], input=stdin)
+
+    records = [json.loads(line) for line in result.stdout.splitlines() if line.startswith("{")]
+    assert sorted(r["url"] for r in records) == [
+        "https://github.com/owner/repo/pull/1", "https://github.com/owner/repo/pull/2", "not-a-pr",
+    ]
+    by_url = {r["url"]: r for r in records}
+    assert by_url["https://github.com/owner/repo/pull/2"]["status"] == "ok"
+    assert by_url["not-a-pr"]["status"] == "error"
+    # One client for github.com, one LLM client for the whole batch
+    mock_create_client.assert_called_once()
+    mock_openai_cls.assert_called_once()
+    assert result.exit_code == 1
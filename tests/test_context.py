@@ -0,0 +1,99 @@
+from unittest.mock import Mock
+
+from branchwise.config import Settings
+from branchwise.core.analyzer import Analyzer
+from branchwise.core.context import BlobCache, ContextProvider, git_blob_sha
+from branchwise.core.review_state import HunkRecord
+from branchwise.integrations.base import PullRequestDetails, PullRequestFile
+from branchwise.utils.disk_cache import DiskCache
+
+SOURCE = "\n".join(
+    ["import os", "", "class Store:"]
+    + [f"    value_{index} = {index}" for index in range(40)]
+    + ["    def save(self):", "        return write(self)", "", "    def load(self):", "        return read()"]
+)
+
+
+def _pr(status="modified", blob_sha=None):
+    file = PullRequestFile(filename="store.py", status=status, patch="@@ -46 +46 @@\n-x\n+y", blob_url="", blob_sha=blob_sha)
+    return PullRequestDetails(number=1, title="PR", description="", author="u", head_sha="abc", files=[file])
+
+
+def _hunk(start, end):
+    return HunkRecord(fingerprint="f", new_line_start=start, new_line_end=end)
+
+
+def test_blob_cache_is_content_addressed(tmp_path):
+    cache = BlobCache(DiskCache(tmp_path, max_bytes=1 << 20))
+    blob_sha = cache.put(b"hello\n")
+    assert blob_sha == "ce013625030ba8dba906f756967f9e9ca394464a"  # git hash-object
+    assert git_blob_sha(b"hello\n") == blob_sha
+    cache.alias("host/repo", "c1", "a.txt", blob_sha)
+    cache.alias("host/repo", "c2", "b.txt", cache.put(b"hello\n"))
+    assert cache.resolve("host/repo", "c2", "b.txt") == blob_sha
+    assert cache.get(blob_sha) == b"hello\n"
+    assert cache.resolve("host/repo", "c3", "a.txt") is None
+
+
+def test_context_includes_enclosing_definition_and_is_cached(tmp_path):
+    cache = BlobCache(DiskCache(tmp_path, max_bytes=1 << 20))
+    client = Mock(host="github.com")
+    client.get_file_bytes.return_value = SOURCE.encode("utf-8")
+
+    provider = ContextProvider(client, "org/repo", _pr(), cache=cache, context_lines=2)
+    context = provider.context_for("store.py", [_hunk(45, 45)])
+    lines = context.splitlines()
+    assert lines[0] == "3: class Store:"
+    assert lines[1] == "..."
+    assert "44:     def save(self):" in lines and "47:     def load(self):" in lines
+
+    # A later review of the same commit is served from the blob cache
+    again = ContextProvider(client, "org/repo", _pr(), cache=cache, context_lines=2)
+    assert again.context_for("store.py", [_hunk(45, 45)]) == context
+    client.get_file_bytes.assert_called_once_with("org/repo", "store.py", "abc")
+
+    assert provider.context_for("store.py", []) is None
+    assert ContextProvider(client, "org/repo", _pr(status="added")).context_for("store.py", [_hunk(1, 1)]) is None
+
+
+def test_blob_cache_keeps_non_utf8_files_under_their_git_blob_id(tmp_path):
+    cache = BlobCache(DiskCache(tmp_path, max_bytes=1 << 20))
+    data = "caf\u00e9 = 1\n".encode("latin-1")
+    client = Mock(host="github.com")
+    client.get_file_bytes.return_value = data
+
+    provider = ContextProvider(client, "org/repo", _pr(), cache=cache)
+    assert provider.file_lines("store.py") == ["caf\ufffd = 1"]
+    blob_sha = cache.resolve("github.com/org/repo", "abc", "store.py")
+    assert blob_sha == git_blob_sha(data)
+    assert cache.get(blob_sha) == data
+
+
+def test_blob_cache_aliases_are_namespaced_by_host(tmp_path):
+    cache = BlobCache(DiskCache(tmp_path, max_bytes=1 << 20))
+    public = Mock(host="api.github.com")
+    public.get_file_bytes.return_value = b"public\n"
+    enterprise = Mock(host="git.example.com")
+    enterprise.get_file_bytes.return_value = b"enterprise\n"
+
+    assert ContextProvider(public, "org/repo", _pr(), cache=cache).file_lines("store.py") == ["public"]
+    assert ContextProvider(enterprise, "org/repo", _pr(), cache=cache).file_lines("store.py") == ["enterprise"]
+    enterprise.get_file_bytes.assert_called_once()
+
+
+def test_analyzer_sends_context_with_each_request():
+    settings = Settings()
+    settings.cache.enabled = False
+    settings.rules.incremental = False
+    settings.rules.ignore_files = []
+    client = Mock(host="github.com")
+    client.get_file_bytes.return_value = SOURCE.encode("utf-8")
+    llm = Mock()
+    llm.analyze_diff.return_value = []
+
+    pr_details = _pr()
+    provider = ContextProvider(client, "org/repo", pr_details, context_lines=1)
+    result = Analyzer(settings, llm).analyze_pr(pr_details, context_provider=provider)
+
+    assert "44:     def save(self):" in llm.analyze_diff.call_args.kwargs["context"]
+    assert "context" in result.metrics.stages
@@ -47,3 +47,65 @@ def test_multiple_hunks():
     assert len(changes) == 2
     assert changes[0].new_line_start == 1
     assert changes[1].new_line_start == 10
+
+def test_iter_hunks_streams_from_file_object():
+    import io
+
+    patch = io.StringIO("@@ -1,2 +1,2 @@\r\n-foo\r\n+bar\r\n baz\r\n@@ -10,1 +10,1 @@\n-a\n+b\n")
+    hunks = DiffParser.iter_hunks(patch)
+
+    first = next(hunks)
+    assert (first.old_line_start, first.new_line_start) == (1, 1)
+    assert list(first.iter_lines()) == [("-foo", None), ("+bar", 1), (" baz", 2)]
+    assert not hasattr(first, "__dict__")
+
+    second = next(hunks)
+    assert second.new_line_start == 10
+    assert second.lines == [("-a", None), ("+b", 10)]
+    assert next(hunks, None) is None
+
+def test_iter_files_splits_whole_pr_diff():
+    diff = """diff --git a/src/app.py b/src/app.py
+index 83db48f..bf269f4 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -1,2 +1,2 @@
+--- old separator
++++ new separator
+ keep
+diff --git a/new.txt b/new.txt
+new file mode 100644
+--- /dev/null
++++ b/new.txt
+@@ -0,0 +1 @@
++hello
+\\ No newline at end of file
+diff --git a/gone.py b/gone.py
+deleted file mode 100644
+--- a/gone.py
++++ /dev/null
+@@ -1 +0,0 @@
+-bye
+diff --git a/old name.py b/new name.py
+similarity index 100%
+rename from old name.py
+rename to new name.py
+diff --git a/logo.png b/logo.png
+index 1234567..89abcde 100644
+Binary files a/logo.png and b/logo.png differ
+"""
+    files = list(DiffParser.iter_files(diff, blob_url=lambda path: f"https://host/{path}"))
+
+    assert [(f.filename, f.status) for f in files] == [
+        ("src/app.py", "modified"),
+        ("new.txt", "added"),
+        ("gone.py", "removed"),
+        ("new name.py", "renamed"),
+        ("logo.png", "modified"),
+    ]
+    # Removed lines that look like file headers stay inside their hunk
+    assert files[0].patch.splitlines() == ["@@ -1,2 +1,2 @@", "--- old separator", "+++ new separator", " keep"]
+    assert files[1].patch.endswith("\\ No newline at end of file")
+    assert files[3].previous_filename == "old name.py" and files[3].patch is None
+    assert files[4].patch is None
+    assert files[0].blob_url == "https://host/src/app.py"
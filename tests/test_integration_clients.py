@@ -25,6 +25,116 @@ def test_gitlab_client_init():
     except Exception as e:
         pytest.fail(f"Failed to instantiate GitLabClient: {e}")
 
+def test_gitlab_client_streams_diff_pages_and_fills_in_oversized_diffs():
+    from branchwise.integrations.gitlab_client import GitLabClient
+    client = GitLabClient(Settings())
+    project = MagicMock(id=9, web_url="https://gitlab.com/group/repo")
+    mr = MagicMock(iid=4, title="MR", description=None, sha="head", author={"username": "dev"}, target_branch="main")
+    client.client = MagicMock()
+    client.client.projects.get.return_value = project
+    project.mergerequests.get.return_value = mr
+
+    def change(path, diff, **flags):
+        return {"new_path": path, "old_path": flags.pop("old_path", path), "diff": diff,
+                "new_file": False, "deleted_file": False, "renamed_file": False, **flags}
+
+    requested = []
+
+    def pages():
+        requested.append(1)
+        yield change("a.py", "@@ -1 +1 @@\n-a\n+b\n")
+        yield change("big.py", "", too_large=True)
+        requested.append(2)
+        yield change("new.py", "@@ -1 +1 @@\n-a\n+b\n", old_path="old.py", renamed_file=True)
+
+    client.client.http_list.return_value = pages()
+    raw = "diff --git a/big.py b/big.py\n--- a/big.py\n+++ b/big.py\n@@ -1 +1 @@\n-x\n+y\n"
+    client.client.http_get.return_value.iter_lines.return_value = [line.encode() for line in raw.split("\n")]
+
+    details, files = client.stream_pr_details("group/repo", 4)
+    assert (details.head_sha, details.files) == ("head", [])
+    first = next(files)
+    assert first.filename == "a.py" and requested == [1]
+
+    rest = list(files)
+    assert [f.filename for f in rest] == ["new.py", "big.py"]
+    assert (rest[0].status, rest[0].previous_filename) == ("renamed", "old.py")
+    assert rest[1].patch == "@@ -1 +1 @@\n-x\n+y"
+    assert client.client.http_list.call_args.args[0] == "/projects/9/merge_requests/4/diffs"
+    mr.changes.assert_not_called()
+
+
+def test_gitlab_client_falls_back_to_changes_without_diffs_api():
+    import gitlab
+    from branchwise.integrations.gitlab_client import GitLabClient
+    client = GitLabClient(Settings())
+    client.client = MagicMock()
+    project = client.client.projects.get.return_value = MagicMock(id=9, web_url="https://gitlab.com/group/repo")
+    mr = project.mergerequests.get.return_value = MagicMock(
+        iid=4, title="MR", description="", sha="head", author={"username": "dev"}, target_branch="main"
+    )
+    mr.changes.return_value = {"changes": [
+        {"new_path": "a.py", "old_path": "a.py", "diff": "@@ -1 +1 @@\n-a\n+b\n", "new_file": True, "deleted_file": False},
+    ]}
+    client.client.http_list.side_effect = gitlab.exceptions.GitlabHttpError("Not found", response_code=404)
+
+    details = client.get_pr_details("group/repo", 4)
+
+    assert [(f.filename, f.status) for f in details.files] == [("a.py", "added")]
+
+def test_gitlab_client_refetches_merge_request_for_each_review():
+    from branchwise.integrations.gitlab_client import GitLabClient
+    from branchwise.llm.client import ReviewComment
+    client = GitLabClient(Settings())
+    client.client = MagicMock()
+    client.client.http_list.side_effect = lambda *args, **kwargs: iter([])
+    project = client.client.projects.get.return_value
+    old, new = (
+        MagicMock(iid=4, title="MR", description="", sha=sha, author={"username": "dev"}, diff_refs={"head_sha": sha},
+                  target_branch="main")
+        for sha in ("old", "new")
+    )
+    project.mergerequests.get.side_effect = [old, new]
+
+    assert client.get_pr_details("group/repo", 4).head_sha == "old"
+    assert client.get_pr_details("group/repo", 4).head_sha == "new"
+    comment = ReviewComment(file_path="a.py", line_number=1, content="Issue", type="bug", severity="minor")
+    client.post_review("group/repo", 4, "Summary", [comment], "new")
+
+    # Draft notes are positioned against the head fetched by this review
+    position = new.draft_notes.create.call_args_list[0].args[0]["position"]
+    assert position["head_sha"] == "new"
+    old.draft_notes.create.assert_not_called()
+    client.client.projects.get.assert_called_once()
+
+
+def test_gitlab_review_deletes_its_drafts_when_posting_fails():
+    from branchwise.integrations.gitlab_client import GitLabClient
+    from branchwise.llm.client import ReviewComment
+    client = GitLabClient(Settings())
+    client.client = MagicMock()
+    mr = client.client.projects.get.return_value.mergerequests.get.return_value
+    mr.diff_refs = {"head_sha": "head"}
+    inline = MagicMock()
+    mr.draft_notes.create.side_effect = [inline, RuntimeError("server error")]
+    comment = ReviewComment(file_path="a.py", line_number=1, content="Issue", type="bug", severity="minor")
+
+    with pytest.raises(RuntimeError):
+        client.post_review("group/repo", 4, "Summary", [comment], "head")
+
+    inline.delete.assert_called_once()
+    mr.draft_notes.bulk_publish.assert_not_called()
+
+
+def test_handle_cache_is_bounded():
+    from branchwise.integrations.base import HandleCache
+    cache = HandleCache(max_size=2)
+    for key in "abc":
+        cache.get(key, lambda: key.upper())
+    assert len(cache) == 2
+    assert cache.get("a", lambda: "reloaded") == "reloaded"
+
+
 def test_bitbucket_client_init():
     from branchwise.integrations.bitbucket_client import BitbucketClient
     settings = Settings()
@@ -35,3 +145,269 @@ def test_bitbucket_client_init():
         client = BitbucketClient(settings)
     except Exception as e:
         pytest.fail(f"Failed to instantiate BitbucketClient: {e}")
+
+def test_bitbucket_client_splits_raw_pr_diff():
+    from branchwise.integrations.bitbucket_client import BitbucketClient
+    settings = Settings()
+    client = BitbucketClient(settings)
+    client.client = MagicMock()
+    client.client.get_pull_request.return_value = {
+        "id": 7,
+        "title": "Fix",
+        "description": "",
+        "author": {"user": {"name": "dev"}},
+        "fromRef": {"latestCommit": "abc123"},
+        "toRef": {"latestCommit": "def456"},
+    }
+    response = client.client.get.return_value
+    response.iter_lines.return_value = iter([
+        b"diff --git a/a.py b/a.py",
+        b"--- a/a.py",
+        b"+++ b/a.py",
+        b"@@ -1 +1 @@",
+        b"-x = 1",
+        "+x = '\u00e9\x0c'".encode() + b"\xff",
+    ])
+
+    details = client.get_pr_details("PROJ/repo", 7)
+
+    assert (details.head_sha, details.base_ref) == ("abc123", "def456")
+    assert [f.filename for f in details.files] == ["a.py"]
+    assert details.files[0].patch.startswith("@@ -1 +1 @@")
+    # A form feed stays inside its line and invalid UTF-8 is replaced rather than failing the fetch
+    assert details.files[0].patch.endswith("\n+x = '\u00e9\x0c'\ufffd")
+    response.iter_lines.assert_called_once_with(delimiter=b"\n")
+    assert details.files[0].blob_url.endswith("/projects/PROJ/repos/repo/browse/a.py?at=abc123")
+
+def test_github_client_reuses_pr_handles_between_fetch_and_post():
+    from branchwise.integrations.github import GitHubClient
+    client = GitHubClient(Settings())
+    client.client = MagicMock()
+    repo = client.client.get_repo.return_value
+    pr = repo.get_pull.return_value
+    pr.get_files.return_value = []
+    pr.number, pr.title, pr.body = 1, "PR", None
+    pr.user.login, pr.head.sha, pr.base.ref = "dev", "sha", "main"
+
+    client.get_pr_details("owner/repo", 1)
+    client.post_comment("owner/repo", 1, "Summary")
+    for line in (1, 2, 3):
+        client.post_review_comment("owner/repo", 1, "Issue", "sha", "a.py", line)
+
+    client.client.get_repo.assert_called_once_with("owner/repo")
+    repo.get_pull.assert_called_once_with(1)
+    repo.get_commit.assert_called_once_with("sha")
+    assert pr.create_review_comment.call_count == 3
+
+    # The next review of the same PR fetches it again, so it sees the new head
+    client.get_pr_details("owner/repo", 1)
+    assert repo.get_pull.call_count == 2
+
+
+class _FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def _github_settings():
+    from pydantic import SecretStr
+    settings = Settings()
+    settings.github.token = SecretStr("token")
+    return settings
+
+
+def test_github_graphql_fetch_gets_file_pages_in_parallel():
+    from branchwise.integrations.github import GitHubClient
+    client = GitHubClient(_github_settings())
+    client.client = MagicMock()
+    files = [
+        {"filename": f"f{i}.py", "status": "modified", "patch": "@@ -1 +1 @@\n-a\n+b", "blob_url": "url", "sha": f"s{i}"}
+        for i in range(250)
+    ]
+    files[3].update(status="renamed", previous_filename="old.py")
+    session = client.session = MagicMock()
+    session.post.return_value = _FakeResponse({"data": {"repository": {"pullRequest": {
+        "number": 5, "title": "PR", "body": None, "headRefOid": "head", "baseRefName": "main", "changedFiles": 250, "author": None,
+    }}}})
+    session.get.side_effect = lambda url, params, **kwargs: _FakeResponse(
+        files[(params["page"] - 1) * 100:params["page"] * 100]
+    )
+
+    details = client.get_pr_details("owner/repo", 5)
+
+    assert session.post.call_count == 1
+    assert sorted(call.kwargs["params"]["page"] for call in session.get.call_args_list) == [1, 2, 3]
+    assert [f.filename for f in details.files] == [f"f{i}.py" for i in range(250)]
+    assert (details.head_sha, details.base_ref, details.author, details.description) == ("head", "main", "ghost", "")
+    assert details.files[3].previous_filename == "old.py" and details.files[4].previous_filename is None
+    assert details.files[7].blob_sha == "s7"
+    client.client.get_repo.assert_not_called()
+
+
+def test_github_graphql_errors_fall_back_to_rest():
+    from branchwise.integrations.github import GitHubClient
+    client = GitHubClient(_github_settings())
+    client.session = MagicMock()
+    client.session.post.return_value = _FakeResponse({"errors": [{"message": "Bad credentials"}]})
+    client.client = MagicMock()
+    pr = client.client.get_repo.return_value.get_pull.return_value
+    pr.get_files.return_value = []
+    pr.number, pr.title, pr.body = 5, "PR", "Body"
+    pr.user.login, pr.head.sha, pr.base.ref = "dev", "sha", "main"
+
+    details = client.get_pr_details("owner/repo", 5)
+
+    assert (details.author, details.head_sha, details.base_ref) == ("dev", "sha", "main")
+    client.session.get.assert_not_called()
+
+
+def test_clients_share_one_session_per_host():
+    from branchwise.integrations.gitlab_client import GitLabClient
+    from branchwise.integrations.http import get_session
+    first = GitLabClient(Settings())
+    second = GitLabClient(Settings())
+    assert first.client.session is second.client.session
+    assert first.client.session is get_session("https://gitlab.com/api/v4")
+
+def test_github_post_review_submits_one_review():
+    from github import GithubException
+    from branchwise.integrations.github import GitHubClient
+    from branchwise.llm.client import ReviewComment
+    client = GitHubClient(Settings())
+    client.client = MagicMock()
+    pr = client.client.get_repo.return_value.get_pull.return_value
+    comments = [
+        ReviewComment(file_path="a.py", line_number=n, content="Issue", type="bug", severity="major")
+        for n in (1, 2)
+    ]
+
+    client.post_review("owner/repo", 1, "Summary", comments, "sha")
+
+    pr.create_review.assert_called_once()
+    kwargs = pr.create_review.call_args.kwargs
+    assert kwargs["body"] == "Summary"
+    assert [c["line"] for c in kwargs["comments"]] == [1, 2]
+    pr.create_issue_comment.assert_not_called()
+
+    # A line outside the diff makes GitHub reject the review; findings move to the body
+    pr.create_review.reset_mock()
+    pr.create_review.side_effect = [GithubException(422, {"message": "Unprocessable"}), None]
+    client.post_review("owner/repo", 1, "Summary", comments, "sha")
+    assert pr.create_review.call_count == 2
+    assert "`a.py:2`" in pr.create_review.call_args.kwargs["body"]
+
+def test_parse_pr_url_for_each_provider():
+    from branchwise.integrations.factory import parse_pr_url
+    settings = Settings()
+
+    github = parse_pr_url("https://github.com/owner/repo/pull/12/", settings)
+    assert (github.provider, github.repo_name, github.pr_number) == ("github", "owner/repo", 12)
+
+    gitlab = parse_pr_url("https://gitlab.com/group/sub/project/-/merge_requests/5/diffs", settings)
+    assert (gitlab.provider, gitlab.repo_name, gitlab.pr_number) == ("gitlab", "group/sub/project", 5)
+
+    bitbucket = parse_pr_url("https://bitbucket.org/team/repo/pull-requests/9", settings)
+    assert (bitbucket.provider, bitbucket.repo_name, bitbucket.pr_number) == ("bitbucket", "team/repo", 9)
+
+    with pytest.raises(ValueError):
+        parse_pr_url("https://example.com/owner/repo/pull/1", settings)
+
+
+def _git(path, *args):
+    import subprocess
+    subprocess.run(
+        ["git", "-C", str(path), "-c", "user.name=Dev", "-c", "user.email=dev@example.com", *args],
+        check=True, capture_output=True,
+    )
+
+
+def test_local_git_client_reviews_a_commit_range(tmp_path):
+    import subprocess
+    from branchwise.core.context import git_blob_sha
+    from branchwise.integrations.local_git import LocalGitClient
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "app.py").write_text("a = 1\nb = 2\n")
+    (tmp_path / "old.py").write_text("x = 1\ny = 2\nz = 3\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "Base")
+    _git(tmp_path, "tag", "base")
+    (tmp_path / "app.py").write_text("a = 1\nb = 3\n")
+    (tmp_path / "new.py").write_text("print('hi')\n")
+    _git(tmp_path, "mv", "old.py", "renamed.py")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "Change things\n\nLonger description")
+
+    client = LocalGitClient("base..HEAD")
+    details = client.get_pr_details(str(tmp_path), 0)
+
+    assert (details.title, details.description, details.author) == ("Change things", "Longer description", "Dev")
+    assert details.base_ref == subprocess.check_output(["git", "-C", str(tmp_path), "rev-parse", "base"], text=True).strip()
+    files = {f.filename: f for f in details.files}
+    assert files["app.py"].status == "modified" and "+b = 3" in files["app.py"].patch
+    assert files["new.py"].status == "added"
+    assert (files["renamed.py"].status, files["renamed.py"].previous_filename) == ("renamed", "old.py")
+    assert files["app.py"].blob_sha == git_blob_sha(b"a = 1\nb = 3\n")
+    assert client.get_file_content(str(tmp_path), "app.py", details.head_sha) == "a = 1\nb = 3\n"
+    assert client.get_file_content(str(tmp_path), "missing.py", details.head_sha) is None
+    client.post_review(str(tmp_path), 0, "Summary", [], details.head_sha)  # Nothing to post to, and not an error
+
+
+def test_local_git_diff_ignores_user_diff_config(tmp_path):
+    from branchwise.integrations.local_git import LocalGitClient
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text("a = 1\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "Base")
+    (tmp_path / "src" / "app.py").write_text("a = 2\n")
+    _git(tmp_path, "commit", "-q", "-am", "Change")
+    for key, value in [("diff.noprefix", "true"), ("diff.mnemonicPrefix", "true"), ("diff.relative", "true")]:
+        _git(tmp_path, "config", key, value)
+
+    details = LocalGitClient("HEAD~1..HEAD").get_pr_details(str(tmp_path / "src"), 0)
+
+    assert [f.filename for f in details.files] == ["src/app.py"]
+    assert "+a = 2" in details.files[0].patch
+
+
+def test_local_git_keeps_non_ascii_paths_readable(tmp_path):
+    from branchwise.integrations.local_git import LocalGitClient
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "config", "core.quotepath", "true")
+    (tmp_path / "base.txt").write_text("base\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "Base")
+    (tmp_path / "caf\u00e9.py").write_text("a = 1\n", encoding="utf-8")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "Add")
+
+    client = LocalGitClient("HEAD~1..HEAD")
+    details = client.get_pr_details(str(tmp_path), 0)
+
+    assert [f.filename for f in details.files] == ["caf\u00e9.py"]
+    assert client.get_file_content(str(tmp_path), "caf\u00e9.py", details.head_sha) == "a = 1\n"
+
+
+def test_local_git_reports_diff_errors(tmp_path):
+    from branchwise.integrations.local_git import LocalGitClient
+    _git(tmp_path, "init", "-q")
+    client = LocalGitClient("HEAD~1..HEAD")
+    with pytest.raises(RuntimeError, match="failed"):
+        list(client._iter_files(str(tmp_path), "nope..HEAD"))
+
+
+def test_parse_local_ref_accepts_a_path_or_a_range(tmp_path, monkeypatch):
+    from branchwise.integrations.factory import is_local_target, parse_local_ref
+    assert is_local_target(str(tmp_path)) and is_local_target("main..HEAD")
+    assert not is_local_target("https://github.com/owner/repo/pull/1") and not is_local_target("invalid-url")
+
+    ref = parse_local_ref(str(tmp_path))
+    assert (ref.provider, ref.repo_name, ref.rev_range) == ("local", str(tmp_path), "@{upstream}...HEAD")
+    monkeypatch.chdir(tmp_path)
+    assert parse_local_ref("main...feature").rev_range == "main...feature"
@@ -0,0 +1,53 @@
+import os
+import time
+from unittest.mock import MagicMock
+
+from branchwise.config import Settings
+from branchwise.llm.client import OpenAIClient
+from branchwise.utils.disk_cache import DiskCache
+
+
+def test_disk_cache_roundtrip_and_ttl(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=1024, ttl_seconds=60)
+    cache.set("key", b"value")
+    assert cache.get("key") == b"value"
+    assert cache.get("other") is None
+
+    # Age the entry past its TTL
+    path = next(tmp_path.glob("??/*"))
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert cache.get("key") is None
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=250)
+    for i in range(3):
+        cache.set(f"key{i}", b"x" * 100)
+        path = cache._path(f"key{i}")
+        os.utime(path, (i, i))
+
+    # Total exceeded 250 bytes on the third write, so the oldest entry went first
+    assert cache.get("key0") is None
+    assert cache.get("key2") == b"x" * 100
+
+
+def test_openai_client_reuses_cached_response(tmp_path):
+    settings = Settings()
+    settings.cache.directory = tmp_path
+    client = OpenAIClient(settings)
+    client.client = MagicMock()
+    response = MagicMock()
+    response.choices[0].message.content = "---\nLine: 3\nType: bug\nSeverity: major\nContent: Off by one\n---"
+    client.client.chat.completions.create.return_value = response
+
+    first = client.analyze_diff("foo.py", "3: + x = y")
+    second = client.analyze_diff("foo.py", "3: + x = y")
+
+    assert first == second
+    assert first[0].line_number == 3
+    client.client.chat.completions.create.assert_called_once()
+
+    settings.cache.enabled = False
+    uncached = OpenAIClient(settings)
+    assert uncached.cache is None
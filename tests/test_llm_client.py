@@ -0,0 +1,238 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import openai
+import pytest
+
+from branchwise.config import Settings
+from branchwise.llm.client import OpenAIClient
+from branchwise.llm.retry import AdaptiveLimiter, LLMRequestError
+from branchwise.utils.metrics import MetricsRecorder
+
+
+def _client(**llm_settings):
+    settings = Settings()
+    settings.cache.enabled = False
+    for key, value in llm_settings.items():
+        setattr(settings.llm, key, value)
+    return OpenAIClient(settings)
+
+
+def test_parse_response_maps_batch_comments_to_files():
+    content = """
+---
+File: src/a.py
+Line: 3
+Type: bug
+Severity: major
+Content: Off by one
+---
+File: `b.py`
+Line: 7
+Type: style
+Severity: minor
+Content: Rename this
+---
+File: unknown.py
+Line: 1
+Content: Dropped
+---
+"""
+    comments = _client()._parse_response(content, "src/a.py", ["src/a.py", "lib/b.py"])
+    assert [(c.file_path, c.line_number) for c in comments] == [("src/a.py", 3), ("lib/b.py", 7)]
+
+
+def test_parse_response_reads_fenced_json_and_drops_malformed_findings():
+    content = """Here is the review:
+```json
+{"findings": [
+  {"file": "src/a.py", "line": "12-14", "type": "Bug", "severity": "major", "content": "Uses a: b --- c"},
+  {"file": "src/a.py", "line": "n/a", "type": "bug", "severity": "minor", "content": "Bad line"}
+]}
+```"""
+    comments = _client()._parse_response(content, "src/a.py")
+    assert [(c.line_number, c.type, c.content) for c in comments] == [(12, "bug", "Uses a: b --- c")]
+
+
+def test_parse_response_salvages_complete_findings_from_truncated_json():
+    content = (
+        '{"findings": [{"file": "a.py", "line": 3, "type": "bug", "severity": "major", "content": "First"}, '
+        '{"file": "a.py", "line": 9, "type": "style", "severity": "minor", "content": "Cut o'
+    )
+    comments = _client()._parse_response(content, "a.py")
+    assert [(c.line_number, c.content) for c in comments] == [(3, "First")]
+
+
+def test_parse_response_falls_back_to_text_and_keeps_colons_and_dashes():
+    content = """No issues found in the tests, but:
+---
+Line: 5
+Type: bug
+Severity: major
+Content: Timeout: the retry loop never exits.
+---------- see below
+Also affects the caller.
+---
+"""
+    comments = _client()._parse_response(content, "a.py")
+    assert len(comments) == 1
+    assert comments[0].content == "Timeout: the retry loop never exits.\n---------- see below\nAlso affects the caller."
+    assert comments[0].line_number == 5
+
+    assert _client()._parse_response('{"findings": []}', "a.py") == []
+    assert _client(output_format="text")._parse_response("No issues found.", "a.py") == []
+
+
+def test_request_params_ask_for_structured_output():
+    params = _client()._request_params("prompt")
+    assert params["response_format"]["type"] == "json_schema"
+    assert params["response_format"]["json_schema"]["schema"]["required"] == ["findings"]
+    assert _client(response_format="json_object")._request_params("prompt")["response_format"] == {"type": "json_object"}
+    assert "response_format" not in _client(response_format="none")._request_params("prompt")
+    assert "response_format" not in _client(output_format="text")._request_params("prompt")
+
+
+def test_custom_base_url_defaults_to_unstructured_output():
+    local = "http://localhost:11434/v1"
+    assert "response_format" not in _client(base_url=local)._request_params("prompt")
+    params = _client(base_url=local, response_format="json_schema")._request_params("prompt")
+    assert params["response_format"]["type"] == "json_schema"
+
+
+def _throttled(retry_after="0"):
+    response = SimpleNamespace(status_code=429, headers={"retry-after": retry_after}, request=None)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def _completion(content, prompt_tokens=120, completion_tokens=30):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+
+def test_complete_retries_throttled_requests_and_shrinks_limit(monkeypatch):
+    monkeypatch.setattr("branchwise.llm.retry.time.sleep", lambda seconds: None)
+    client = _client()
+    client.client = MagicMock()
+    client.client.chat.completions.create.side_effect = [_throttled(), _completion("No issues found.")]
+
+    recorder = MetricsRecorder()
+    with recorder.llm_call(["a.py"]):
+        assert client.analyze_diff("a.py", "diff") == []
+    assert client.client.chat.completions.create.call_count == 2
+    assert client.limiter.limit < client.settings.rules.max_workers
+
+    call = recorder.metrics.llm_calls[0]
+    assert (call.retries, call.prompt_tokens, call.completion_tokens) == (1, 120, 30)
+
+
+def test_analyze_diff_raises_after_retries_are_exhausted(monkeypatch):
+    monkeypatch.setattr("branchwise.llm.retry.time.sleep", lambda seconds: None)
+    client = _client()
+    client.settings.llm.max_retries = 1
+    client.client = MagicMock()
+    client.client.chat.completions.create.side_effect = _throttled()
+
+    with pytest.raises(LLMRequestError):
+        client.analyze_diff("a.py", "diff")
+    assert client.client.chat.completions.create.call_count == 2
+
+
+def _chunks(text, size=9):
+    for start in range(0, len(text), size):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[start:start + size]))], usage=None)
+    yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=50, completion_tokens=20))
+
+
+def test_stream_diff_yields_each_comment_before_the_completion_ends():
+    content = (
+        '{"findings": [{"file": "a.py", "line": 3, "type": "bug", "severity": "major", "content": "First"}, '
+        '{"file": "a.py", "line": 9, "type": "style", "severity": "minor", "content": "Second"}]}'
+    )
+    consumed = []
+
+    def stream(**params):
+        assert params["stream"] is True
+        for chunk in _chunks(content):
+            consumed.append(chunk)
+            yield chunk
+
+    client = _client()
+    client.client = MagicMock()
+    client.client.chat.completions.create.side_effect = stream
+
+    recorder = MetricsRecorder()
+    seen = []
+    with recorder.llm_call(["a.py"]):
+        for comment in client.stream_diff("a.py", "diff"):
+            seen.append((comment.line_number, len(consumed)))
+    assert [line for line, _ in seen] == [3, 9]
+    assert seen[0][1] < len(consumed)  # Emitted while chunks were still arriving
+    assert recorder.metrics.llm_calls[0].completion_tokens == 20
+
+
+
+def test_stream_retries_a_broken_stream_without_repeating_comments(monkeypatch):
+    monkeypatch.setattr("branchwise.llm.retry.time.sleep", lambda seconds: None)
+    content = (
+        '{"findings": [{"file": "a.py", "line": 3, "type": "bug", "severity": "major", "content": "First"}, '
+        '{"file": "a.py", "line": 9, "type": "style", "severity": "minor", "content": "Second"}]}'
+    )
+
+    def broken(**params):
+        chunks = list(_chunks(content))
+        yield from chunks[:len(chunks) // 2]
+        raise _throttled()
+
+    client = _client()
+    client.client = MagicMock()
+    client.client.chat.completions.create.side_effect = [broken(), _chunks(content)]
+
+    recorder = MetricsRecorder()
+    with recorder.llm_call(["a.py"]):
+        lines = [comment.line_number for comment in client.stream_diff("a.py", "diff")]
+    assert lines == [3, 9]
+    assert client.limiter.in_flight == 0
+    assert client.limiter.limit < client.settings.rules.max_workers
+    call = recorder.metrics.llm_calls[0]
+    assert (call.retries, call.completion_tokens) == (1, 20)
+
+
+def test_adaptive_limiter_halves_on_throttle_and_recovers():
+    limiter = AdaptiveLimiter(4)
+    limiter.on_throttle()
+    assert limiter.limit == 2
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.limit == 4
+
+
+def test_async_client_retries_through_the_same_loop(monkeypatch):
+    import asyncio
+
+    from branchwise.llm.client import AsyncOpenAIClient
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr("branchwise.llm.retry.asyncio.sleep", no_sleep)
+    settings = Settings()
+    settings.cache.enabled = False
+    client = AsyncOpenAIClient(settings)
+    client.client = MagicMock()
+    responses = iter([_throttled(), _completion("No issues found.")])
+
+    async def create(**params):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    client.client.chat.completions.create.side_effect = create
+
+    recorder = MetricsRecorder()
+    with recorder.llm_call(["a.py"]):
+        assert asyncio.run(client.analyze_diff("a.py", "diff")) == []
+    assert client.limiter.in_flight == 0
+    assert recorder.metrics.llm_calls[0].retries == 1
@@ -0,0 +1,50 @@
+from unittest.mock import Mock
+
+from branchwise.config import Settings
+from branchwise.core.analyzer import Analyzer
+from branchwise.integrations.base import PullRequestDetails, PullRequestFile
+from branchwise.utils.metrics import LLMCallMetrics, ReviewMetrics, to_prometheus, write_textfile
+
+
+def test_analyze_pr_records_stages_and_llm_calls():
+    settings = Settings()
+    settings.cache.enabled = False
+    settings.llm.max_files_per_request = 1
+    mock_llm = Mock()
+    mock_llm.analyze_diff.side_effect = [[], RuntimeError("boom")]
+
+    files = [
+        PullRequestFile(filename=name, status="modified", patch="@@ -1 +1 @@\n-a\n+b", blob_url="url")
+        for name in ["a.py", "b.py"]
+    ]
+    pr_details = PullRequestDetails(number=1, title="PR", description="", author="User", head_sha="sha", files=files)
+
+    metrics = Analyzer(settings, mock_llm).analyze_pr(pr_details).metrics
+
+    assert set(metrics.stages) == {"prepare", "plan", "llm", "aggregate"}
+    calls = sorted(metrics.llm_calls, key=lambda call: call.files)
+    assert [(call.files, call.failed) for call in calls] == [(["a.py"], False), (["b.py"], True)]
+    assert set(metrics.file_latencies()) == {"a.py", "b.py"}
+
+
+def test_prometheus_textfile(tmp_path):
+    metrics = ReviewMetrics(
+        stages={"fetch": 0.5, "llm": 2.0},
+        llm_calls=[
+            LLMCallMetrics(files=["a.py"], latency_s=1.5, prompt_tokens=100, completion_tokens=20, retries=2),
+            LLMCallMetrics(files=["b.py"], cached=True),
+        ],
+    )
+    text = to_prometheus(metrics, {"repo": 'owner/"repo"'})
+
+    assert '# TYPE branchwise_stage_duration_seconds gauge' in text
+    assert 'branchwise_stage_duration_seconds{repo="owner/\\"repo\\"",stage="llm"} 2.0' in text
+    assert 'branchwise_llm_tokens{repo="owner/\\"repo\\"",kind="prompt"} 100' in text
+    assert 'branchwise_llm_requests{repo="owner/\\"repo\\"",outcome="cached"} 1' in text
+    assert 'branchwise_llm_retries{repo="owner/\\"repo\\""} 2' in text
+    assert metrics.model_dump()["completion_tokens"] == 20
+
+    path = tmp_path / "branchwise.prom"
+    write_textfile(path, text)
+    assert path.read_text() == text
+    assert list(tmp_path.iterdir()) == [path]
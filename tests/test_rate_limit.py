@@ -0,0 +1,113 @@
+import io
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from branchwise.config import RateLimitSettings
+from branchwise.integrations.rate_limit import (
+    RateLimitExceeded,
+    RateLimitedAdapter,
+    RateLimitScheduler,
+    is_rate_limited,
+)
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def make_scheduler(**overrides) -> RateLimitScheduler:
+    clock = FakeClock()
+    return RateLimitScheduler(RateLimitSettings(**overrides), clock=clock, sleep=clock.sleep)
+
+
+def test_token_bucket_paces_after_burst():
+    scheduler = make_scheduler(requests_per_second=2.0, burst=2)
+
+    for _ in range(4):
+        scheduler.acquire("api.example.com")
+
+    # Two calls from the burst, then one every half second
+    assert scheduler.sleep.__self__.slept == [pytest.approx(0.5), pytest.approx(0.5)]
+
+
+def test_exhausted_quota_waits_for_reset():
+    scheduler = make_scheduler()
+    clock = scheduler.sleep.__self__
+    scheduler.update("api.github.com", {
+        "X-RateLimit-Remaining": "0",
+        "X-RateLimit-Limit": "5000",
+        "X-RateLimit-Reset": str(int(clock.now) + 30),
+    })
+
+    scheduler.acquire("api.github.com")
+
+    assert clock.slept == [pytest.approx(30)]
+    quota = scheduler.quota("api.github.com")
+    assert quota.limit == 5000
+
+
+def test_wait_beyond_max_wait_raises():
+    scheduler = make_scheduler(max_wait=10)
+    now = scheduler.sleep.__self__.now
+    scheduler.update("gitlab.com", {"RateLimit-Remaining": "0", "RateLimit-Reset": str(int(now) + 600)})
+
+    with pytest.raises(RateLimitExceeded):
+        scheduler.acquire("gitlab.com")
+
+
+def test_call_retries_with_retry_after():
+    scheduler = make_scheduler(max_retries=2)
+    fn = MagicMock(side_effect=[RateLimitExceeded("slow down", {"Retry-After": "7"}), "ok"])
+
+    assert scheduler.call("api.github.com", fn) == "ok"
+    assert fn.call_count == 2
+    assert scheduler.sleep.__self__.slept == [7.0]
+
+
+def test_call_gives_up_after_max_retries():
+    scheduler = make_scheduler(max_retries=1, backoff_base=1.0)
+    fn = MagicMock(side_effect=RateLimitExceeded("slow down"))
+
+    with pytest.raises(RateLimitExceeded):
+        scheduler.call("api.github.com", fn)
+    assert fn.call_count == 2
+
+
+def test_is_rate_limited():
+    assert is_rate_limited(429, {})
+    assert is_rate_limited(403, {"x-ratelimit-remaining": "0"})
+    assert not is_rate_limited(403, {"x-ratelimit-remaining": "12"})
+    assert not is_rate_limited(500, {})
+
+
+def test_adapter_retries_throttled_responses(monkeypatch):
+    scheduler = make_scheduler()
+    adapter = RateLimitedAdapter(scheduler)
+
+    def response(status, headers):
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers.update(headers)
+        resp.raw = io.BytesIO(b"")
+        return resp
+
+    responses = [response(429, {"Retry-After": "2"}), response(200, {"RateLimit-Remaining": "99"})]
+    monkeypatch.setattr(requests.adapters.HTTPAdapter, "send", lambda self, request, **kwargs: responses.pop(0))
+
+    request = requests.Request("GET", "https://gitlab.example.com/api/v4/projects").prepare()
+    result = adapter.send(request)
+
+    assert result.status_code == 200
+    assert scheduler.sleep.__self__.slept == [2.0]
+    assert scheduler.quota("gitlab.example.com").remaining == 99
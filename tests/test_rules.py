@@ -0,0 +1,109 @@
+import time
+from unittest.mock import Mock
+
+from branchwise.config import Settings
+from branchwise.core.analyzer import Analyzer
+from branchwise.core.rules import PathRules, load_path_rules
+from branchwise.integrations.base import PullRequestDetails, PullRequestFile
+
+
+def _rules(*patterns, focus=()):
+    return PathRules(list(patterns), list(focus))
+
+
+def test_gitignore_style_patterns():
+    rules = _rules(".lock", "*.min.js", "/build/", "docs/**/*.png", "vendor", "!vendor/keep.py", "tmp?/")
+    assert rules.is_ignored("yarn.lock")
+    assert rules.is_ignored("web/static/app.min.js")
+    assert rules.is_ignored("build/out.py")
+    assert not rules.is_ignored("src/build/out.py")  # Anchored to the root
+    assert rules.is_ignored("docs/a/b/c.png") and rules.is_ignored("docs/c.png")
+    assert rules.is_ignored("third_party/vendor/lib.py")
+    assert not rules.is_ignored("vendor/keep.py")  # Re-included by the later negation
+    assert rules.is_ignored("tmp1/x.py")
+    assert not rules.is_ignored("src/app.py")
+
+
+def test_ignore_file_patterns_follow_the_settings():
+    settings = Settings()
+    settings.rules.ignore_files = ["*.log", "lock.json"]
+    rules = PathRules.from_settings(settings, "# generated\nfixtures/\n!important.log\n")
+    assert rules.is_ignored("tests/fixtures/data.json") and rules.is_ignored("debug.log")
+    assert not rules.is_ignored("tests/important.log")
+    # Plain entries in the settings are still file name suffixes
+    assert rules.is_ignored("web/package-lock.json")
+    assert not rules.is_ignored("lock.json.py")
+
+
+def test_focus_priority_follows_pattern_order():
+    rules = _rules(focus=["src/core/", ".py", ".js"])
+    assert rules.priority("src/core/engine.go") == 0
+    assert rules.priority("src/app.py") == 1
+    assert rules.priority("web/app.js") == 2
+    assert rules.priority("README") == 3
+
+
+def test_matching_stays_fast_for_large_pull_requests():
+    rules = _rules(*[f"generated_{index}/" for index in range(200)], "*.snap", focus=[".py", ".ts"])
+    paths = [f"pkg_{index % 50}/module_{index}.py" for index in range(10_000)]
+    start = time.perf_counter()
+    for path in paths:
+        rules.is_ignored(path)
+        rules.priority(path)
+    assert time.perf_counter() - start < 2.0
+
+
+def test_repository_ignore_file_and_focus_order_drive_the_review():
+    settings = Settings()
+    settings.cache.enabled = False
+    settings.rules.incremental = False
+    settings.rules.max_workers = 1
+    settings.rules.ignore_files = []
+    settings.rules.focus_files = ["src/"]
+    client = Mock()
+    client.get_file_content.return_value = "legacy/\n"
+    rules = load_path_rules(settings, client, "org/repo", "sha")
+    client.get_file_content.assert_called_once_with("org/repo", ".branchwiseignore", "sha")
+
+    llm = Mock()
+    llm.analyze_batch.return_value = []
+    files = [
+        PullRequestFile(filename=name, status="modified", patch="@@ -1 +1 @@\n-a\n+b", blob_url="")
+        for name in ["tests/test_a.py", "legacy/old.py", "src/a.py"]
+    ]
+    pr_details = PullRequestDetails(number=1, title="PR", description="", author="u", head_sha="sha", files=files)
+    Analyzer(settings, llm).analyze_pr(pr_details, path_rules=rules)
+
+    batch = llm.analyze_batch.call_args[0][0]
+    assert [name for name, _ in batch] == ["src/a.py", "tests/test_a.py"]
+
+
+def test_reviewer_reads_ignore_file_from_the_base_not_the_pr_head():
+    from branchwise.core.analyzer import AnalysisResult
+    from branchwise.core.reviewer import PullRequestReviewer
+    from branchwise.integrations.factory import PullRequestRef
+
+    settings = Settings()
+    settings.rules.incremental = False
+    client = Mock()
+    client.get_pr_details.return_value = PullRequestDetails(
+        number=1, title="PR", description="", author="dev", head_sha="head", files=[], base_ref="main"
+    )
+    client.get_file_content.return_value = None
+    analyzer = Mock()
+    analyzer.analyze_pr.return_value = AnalysisResult(summary="", comments=[])
+    clients = Mock()
+    clients.get.return_value = client
+    ref = PullRequestRef(url="https://github.com/org/repo/pull/1", provider="github", host="github.com",
+                         repo_name="org/repo", pr_number=1)
+
+    PullRequestReviewer(settings, analyzer, clients).review(ref, post=False)
+
+    ignore_reads = [c for c in client.get_file_content.call_args_list if c.args[1] == ".branchwiseignore"]
+    assert [c.args[2] for c in ignore_reads] == ["main"]
+
+
+def test_ignore_file_is_not_read_without_a_base_ref():
+    client = Mock()
+    load_path_rules(Settings(), client, "org/repo", None)
+    client.get_file_content.assert_not_called()
@@ -0,0 +1,244 @@
+import hashlib
+import hmac
+import json
+import threading
+import urllib.request
+from unittest.mock import MagicMock
+
+import pytest
+from pydantic import SecretStr
+
+from branchwise.config import Settings
+from branchwise.integrations.factory import PullRequestRef
+from branchwise.server.app import ReviewQueue, ReviewServer
+from branchwise.server.webhooks import WebhookEvent, parse_webhook, verify_signature
+
+
+def github_payload(sha="abc123", action="synchronize"):
+    return json.dumps({
+        "action": action,
+        "pull_request": {
+            "number": 7,
+            "html_url": "https://github.com/owner/repo/pull/7",
+            "draft": False,
+            "head": {"sha": sha},
+            "base": {"repo": {"full_name": "owner/repo"}},
+        },
+    }).encode()
+
+
+def event(url="https://github.com/owner/repo/pull/7", sha="abc123"):
+    ref = PullRequestRef(url=url, provider="github", host="github.com", repo_name="owner/repo", pr_number=7)
+    return WebhookEvent(ref=ref, head_sha=sha)
+
+
+def test_parse_webhook_for_each_provider():
+    github = parse_webhook({"X-GitHub-Event": "pull_request"}, github_payload())
+    assert (github.ref.repo_name, github.ref.pr_number, github.head_sha) == ("owner/repo", 7, "abc123")
+
+    gitlab = parse_webhook({"X-Gitlab-Event": "Merge Request Hook"}, json.dumps({
+        "project": {"path_with_namespace": "group/project"},
+        "object_attributes": {
+            "action": "update", "oldrev": "old", "iid": 3,
+            "url": "https://gitlab.com/group/project/-/merge_requests/3",
+            "last_commit": {"id": "def456"},
+        },
+    }).encode())
+    assert (gitlab.ref.provider, gitlab.ref.repo_name, gitlab.ref.pr_number) == ("gitlab", "group/project", 3)
+
+    bitbucket = parse_webhook({"X-Event-Key": "pr:from_ref_updated"}, json.dumps({
+        "pullRequest": {
+            "id": 9,
+            "fromRef": {"latestCommit": "fed789"},
+            "toRef": {"repository": {"slug": "repo", "project": {"key": "PROJ"}}},
+            "links": {"self": [{"href": "https://bitbucket.example.com/projects/PROJ/repos/repo/pull-requests/9"}]},
+        },
+    }).encode())
+    assert (bitbucket.ref.repo_name, bitbucket.head_sha) == ("PROJ/repo", "fed789")
+
+    with pytest.raises(ValueError, match="Bitbucket Cloud"):
+        parse_webhook({"X-Event-Key": "pullrequest:updated"}, json.dumps({"pullrequest": {"id": 9}}).encode())
+
+    # Events that do not change the code are ignored
+    assert parse_webhook({"X-GitHub-Event": "pull_request"}, github_payload(action="labeled")) is None
+    with pytest.raises(ValueError):
+        parse_webhook({"X-GitHub-Event": "pull_request"}, b'{"action": "opened"}')
+
+
+def test_verify_signature():
+    body = github_payload()
+    signature = "sha256=" + hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    assert verify_signature({"X-Hub-Signature-256": signature}, body, "secret")
+    assert not verify_signature({"X-Hub-Signature-256": signature}, body, "other")
+    assert verify_signature({"X-Gitlab-Token": "secret"}, b"{}", "secret")
+
+
+def test_review_queue_coalesces_events():
+    queue = ReviewQueue()
+    assert queue.submit(event(sha="a"))
+    assert not queue.submit(event(sha="a"))
+    # A newer head replaces the queued one
+    assert queue.submit(event(sha="b"))
+    assert queue.stats()["pending"] == 1
+
+    running = queue.get()
+    assert running.head_sha == "b"
+    # Same PR and SHA is being reviewed: dropped; a newer SHA waits for it
+    assert not queue.submit(event(sha="b"))
+    assert queue.submit(event(sha="c"))
+    assert queue.submit(event(url="https://github.com/owner/repo/pull/8"))
+    assert queue.get().ref.url.endswith("/8")
+
+    queue.task_done(running)
+    assert queue.get().head_sha == "c"
+
+
+def test_server_queues_signed_webhooks_and_reviews_them():
+    settings = Settings()
+    settings.server.port = 0
+    settings.server.workers = 1
+    settings.server.webhook_secret = SecretStr("secret")
+    reviewed = threading.Event()
+    reviewer = MagicMock()
+    reviewer.review.side_effect = lambda ref, post: reviewed.set()
+
+    server = ReviewServer(settings, reviewer, post=False)
+    server.start_workers()
+    thread = threading.Thread(target=server.httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.address[:2]
+        body = github_payload()
+
+        def deliver(signature):
+            request = urllib.request.Request(f"http://{host}:{port}/", data=body, method="POST", headers={
+                "X-GitHub-Event": "pull_request",
+                "X-Hub-Signature-256": signature,
+                "Content-Type": "application/json",
+            })
+            try:
+                with urllib.request.urlopen(request) as response:
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        assert deliver("sha256=bad") == 401
+        assert deliver("sha256=" + hmac.new(b"secret", body, hashlib.sha256).hexdigest()) == 202
+        assert reviewed.wait(5)
+        reviewer.review.assert_called_once()
+        assert reviewer.review.call_args.args[0].pr_number == 7
+    finally:
+        server.httpd.shutdown()
+        server.shutdown()
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_server_rejects_an_invalid_content_length(length):
+    import socket
+
+    settings = Settings()
+    settings.server.port = 0
+    server = ReviewServer(settings, MagicMock(), post=False)
+    thread = threading.Thread(target=server.httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.address[:2]
+        with socket.create_connection((host, port), timeout=5) as connection:
+            connection.sendall(
+                f"POST / HTTP/1.1\r\nHost: {host}\r\nX-GitHub-Event: pull_request\r\n"
+                f"Content-Length: {length}\r\nConnection: close\r\n\r\n".encode()
+            )
+            response = connection.makefile("rb").readline()
+        assert response.split()[1] == b"400"
+    finally:
+        server.httpd.shutdown()
+        server.shutdown()
+
+
+def test_server_reviews_each_push_against_its_own_head():
+    from branchwise.core.analyzer import AnalysisResult
+    from branchwise.core.reviewer import PullRequestReviewer
+    from branchwise.integrations.factory import ClientPool
+    from branchwise.integrations.github import GitHubClient
+    from branchwise.llm.client import ReviewComment
+
+    settings = Settings()
+    settings.server.port = 0
+    settings.server.workers = 1
+    settings.rules.incremental = False
+    settings.rules.ignore_file = False
+
+    # One long-lived client for both jobs, as in `serve`; each fetch sees the PR's current head
+    client = GitHubClient(settings)
+    client.client = MagicMock()
+    repo = client.client.get_repo.return_value
+    pulls = []
+    for sha in ("sha1", "sha2"):
+        pr = MagicMock(number=7, title="PR", body=None)
+        pr.user.login, pr.head.sha, pr.base.ref = "dev", sha, "main"
+        pr.get_files.return_value = []
+        pulls.append(pr)
+    repo.get_pull.side_effect = pulls
+    repo.get_commit.side_effect = lambda sha: f"commit {sha}"
+    pool = ClientPool(settings)
+    pool._clients[("github", "github.com", None)] = client
+
+    analyzer = MagicMock()
+    finding = ReviewComment(file_path="a.py", line_number=1, content="Issue", type="bug", severity="major")
+    analyzer.analyze_pr.side_effect = lambda pr_details, **options: AnalysisResult(
+        summary="Summary", comments=[finding], new_comments=[finding]
+    )
+    reviewed = threading.Semaphore(0)
+    reviewer = PullRequestReviewer(settings, analyzer, pool)
+    review = reviewer.review
+    reviewer.review = lambda ref, post: (review(ref, post=post), reviewed.release())
+
+    server = ReviewServer(settings, reviewer)
+    server.start_workers()
+    try:
+        for sha in ("sha1", "sha2"):
+            assert server.queue.submit(event(sha=sha))
+            assert reviewed.acquire(timeout=5)
+    finally:
+        server.shutdown()
+
+    assert repo.get_pull.call_count == 2
+    posted = [pr.create_review.call_args.kwargs["commit"] for pr in pulls]
+    assert posted == ["commit sha1", "commit sha2"]
+
+
+def test_reviewer_saves_state_only_after_posting(monkeypatch):
+    from branchwise.core.analyzer import AnalysisResult
+    from branchwise.core.review_state import ReviewState
+    from branchwise.core.reviewer import PullRequestReviewer
+    from branchwise.integrations.base import PullRequestDetails
+    from branchwise.llm.client import ReviewComment
+
+    settings = Settings()
+    settings.rules.ignore_file = False
+    store = MagicMock()
+    monkeypatch.setattr("branchwise.core.reviewer.load_review_state", lambda settings, url: (store, None))
+    client = MagicMock()
+    client.get_pr_details.return_value = PullRequestDetails(
+        number=7, title="PR", description="", author="dev", head_sha="sha1", files=[]
+    )
+    finding = ReviewComment(file_path="a.py", line_number=1, content="Issue", type="bug", severity="major")
+    analyzer = MagicMock()
+    analyzer.analyze_pr.side_effect = lambda pr_details, **options: AnalysisResult(
+        summary="", comments=[finding], new_comments=[finding], state=ReviewState(head_sha="sha1")
+    )
+    clients = MagicMock()
+    clients.get.return_value = client
+    reviewer = PullRequestReviewer(settings, analyzer, clients)
+
+    reviewer.review(event().ref, post=False)
+    store.save.assert_not_called()
+
+    client.post_review.side_effect = RuntimeError("forbidden")
+    with pytest.raises(RuntimeError):
+        reviewer.review(event().ref)
+    store.save.assert_not_called()
+
+    client.post_review.side_effect = None
+    assert reviewer.review(event().ref).posted
+    store.save.assert_called_once()
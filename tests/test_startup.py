@@ -0,0 +1,29 @@
+import json
+import subprocess
+import sys
+
+# SDKs that only the code paths using them may import
+HEAVY_MODULES = ["openai", "github", "gitlab", "atlassian", "requests"]
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+
+def _loaded_after(code: str) -> list:
+    probe = f"{code}\nimport json, sys\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    return json.loads(_run(probe).stdout.strip().splitlines()[-1])
+
+
+def test_cli_import_does_not_load_sdks():
+    assert _loaded_after("import branchwise.main") == []
+
+
+def test_help_does_not_load_sdks():
+    code = "from branchwise.main import app\ntry:\n    app(['--help'])\nexcept SystemExit:\n    pass"
+    assert _loaded_after(code) == []
+
+
+def test_analyzer_import_does_not_load_sdks():
+    assert _loaded_after("import branchwise.core.analyzer, branchwise.integrations.factory") == []
+
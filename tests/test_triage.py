@@ -0,0 +1,60 @@
+from unittest.mock import Mock
+
+from branchwise.config import Settings
+from branchwise.core.analyzer import Analyzer
+from branchwise.core.triage import Triage, is_whitespace_only
+from branchwise.integrations.base import PullRequestDetails, PullRequestFile
+from branchwise.utils.diff_parser import DiffParser
+
+
+def _file(filename, patch, status="modified"):
+    return PullRequestFile(filename=filename, status=status, patch=patch, blob_url="")
+
+
+def _hunk(patch):
+    return next(DiffParser.iter_hunks(patch))
+
+
+def _classify(file):
+    return Triage.from_settings(Settings()).classify(file, list(DiffParser.iter_hunks(file.patch)))
+
+
+def test_whitespace_only_respects_indentation_sensitive_languages():
+    reindent = "@@ -1,2 +1,2 @@\n-if x:\n-  y()\n+if x:\n+    y()"
+    assert is_whitespace_only(_hunk(reindent), "main.js")
+    assert not is_whitespace_only(_hunk(reindent), "main.py")
+    assert is_whitespace_only(_hunk("@@ -1 +1,2 @@\n x = 1\n+"), "main.py")
+    assert is_whitespace_only(_hunk("@@ -1 +1,2 @@\n-call(a, b)\n+call(a,\n+     b)"), "main.go")
+    assert not is_whitespace_only(_hunk("@@ -1 +1 @@\n-int x;\n+intx;"), "main.c")
+
+
+def test_triage_classifies_files_that_need_no_review():
+    assert _classify(_file("web/package-lock.json", "@@ -1 +1 @@\n-a\n+b")) == "lockfile"
+    assert _classify(_file("api/service_pb2.py", "@@ -1 +1 @@\n-a\n+b")) == "generated file"
+    assert _classify(_file("gen.go", "@@ -1,2 +1,2 @@\n // Code generated by stringer. DO NOT EDIT.\n-a\n+b")) == "generated file"
+    assert _classify(_file("static/app.js", "@@ -1 +1 @@\n-a\n+" + "x=1;" * 200)) == "minified file"
+    assert _classify(_file("new/name.py", None, status="renamed")) == "renamed without changes"
+    assert _classify(_file("src/app.py", "@@ -1 +1 @@\n-a = 1\n+a = 2")) is None
+
+
+def test_analyzer_reports_skipped_files_and_drops_whitespace_hunks():
+    settings = Settings()
+    settings.cache.enabled = False
+    settings.rules.incremental = False
+    settings.rules.ignore_files = []
+    llm = Mock()
+    llm.analyze_diff.return_value = []
+
+    patch = "@@ -1,2 +1,2 @@\n-a = 1\n+a = 2\n b()\n@@ -20 +20 @@\n-c = 3   \n+c = 3"
+    pr_details = PullRequestDetails(
+        number=1, title="PR", description="", author="User", head_sha="sha",
+        files=[_file("yarn.lock", "@@ -1 +1 @@\n-a\n+b"), _file("src/app.py", patch)],
+    )
+    result = Analyzer(settings, llm).analyze_pr(pr_details)
+
+    assert result.skipped_files == {"yarn.lock": "lockfile"}
+    assert "yarn.lock: skipped (lockfile)" in result.summary
+    llm.analyze_diff.assert_called_once()
+    name, diff = llm.analyze_diff.call_args[0]
+    assert name == "src/app.py"
+    assert "a = 2" in diff and "c = 3" not in diff